@@ -0,0 +1,208 @@
+﻿"""
+Local stub DNS server for benchmarks and offline tests
+"""
+import hashlib
+import heapq
+import socket
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+import dns.flags
+import dns.message
+import dns.query
+import dns.rcode
+import dns.rdatatype
+import dns.resolver
+import dns.rrset
+
+
+class FakeDNSServer:
+    """UDP DNS server answering MX queries for any domain
+
+    The outcome for a domain is derived from a hash of its name, so it is
+    stable between queries: a share of domains (nxdomain_ratio) answers
+    NXDOMAIN, another share (noanswer_ratio) answers with no records, a share
+    (nullmx_ratio) publishes the null MX "0 .", a share (implicit_ratio) has
+    no MX but A/AAAA records for the domain itself, and the rest get a single
+    MX record "10 mx.<domain>". Every reply is delayed by `latency` seconds
+    without blocking other queries.
+
+    For transport tests, a share of MX domains (truncate_ratio) gets an empty
+    UDP reply with the TC flag and the full answer over TCP on the same port,
+    and the first UDP query of another share (drop_ratio) is silently dropped.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, nxdomain_ratio=0.0,
+                 noanswer_ratio=0.0, ttl=300, truncate_ratio=0.0, drop_ratio=0.0,
+                 nullmx_ratio=0.0, implicit_ratio=0.0):
+        self.latency = latency
+        self.nxdomain_ratio = nxdomain_ratio
+        self.noanswer_ratio = noanswer_ratio
+        self.nullmx_ratio = nullmx_ratio
+        self.implicit_ratio = implicit_ratio
+        self.truncate_ratio = truncate_ratio
+        self.drop_ratio = drop_ratio
+        self.ttl = ttl
+        self.queries = 0
+        self.tcp_queries = 0
+        self._dropped = set()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # Large receive buffer: bursts of thousands of queries must not be dropped
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self._sock.bind((host, port))
+        self._sock.settimeout(0.05)
+        self.host, self.port = self._sock.getsockname()
+        self._tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._tcp.bind((self.host, self.port))
+        self._tcp.listen(16)
+        self._tcp.settimeout(0.05)
+        self._pending = []
+        self._cond = threading.Condition()
+        self._running = False
+        self._threads = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._running = True
+        for target in (self._receive_loop, self._send_loop, self._tcp_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self._sock.close()
+        self._tcp.close()
+
+    def outcome(self, domain):
+        """Return 'nxdomain', 'noanswer', 'nullmx', 'implicit' or 'mx' for a domain"""
+        point = zlib.crc32(domain.lower().rstrip('.').encode()) / 2 ** 32
+        for outcome, ratio in (('nxdomain', self.nxdomain_ratio),
+                               ('noanswer', self.noanswer_ratio),
+                               ('nullmx', self.nullmx_ratio),
+                               ('implicit', self.implicit_ratio)):
+            if point < ratio:
+                return outcome
+            point -= ratio
+        return 'mx'
+
+    def _share(self, domain, salt):
+        """Stable point in [0, 1) for a domain, independent of outcome()"""
+        digest = hashlib.md5(f"{salt}:{domain.lower().rstrip('.')}".encode()).digest()
+        return int.from_bytes(digest[:4], 'big') / 2 ** 32
+
+    def truncated(self, domain):
+        """Whether UDP replies for the domain are truncated"""
+        return self.outcome(domain) == 'mx' and self._share(domain, 'tc') < self.truncate_ratio
+
+    def make_response(self, query, tcp=False):
+        """Build the reply for a parsed query"""
+        response = dns.message.make_response(query)
+        question = query.question[0]
+        outcome = self.outcome(question.name.to_text())
+        if outcome == 'nxdomain':
+            response.set_rcode(dns.rcode.NXDOMAIN)
+        elif not tcp and self.truncated(question.name.to_text()):
+            response.flags |= dns.flags.TC
+        elif outcome == 'mx' and question.rdtype == dns.rdatatype.MX:
+            response.answer.append(dns.rrset.from_text(
+                question.name, self.ttl, 'IN', 'MX', f"10 mx.{question.name}"))
+        elif outcome == 'nullmx' and question.rdtype == dns.rdatatype.MX:
+            response.answer.append(dns.rrset.from_text(
+                question.name, self.ttl, 'IN', 'MX', "0 ."))
+        elif outcome == 'implicit' and question.rdtype in (dns.rdatatype.A,
+                                                             dns.rdatatype.AAAA):
+            address = '127.0.0.1' if question.rdtype == dns.rdatatype.A else '::1'
+            response.answer.append(dns.rrset.from_text(
+                question.name, self.ttl, 'IN', dns.rdatatype.to_text(question.rdtype),
+                address))
+        return response
+
+    def resolver(self, lifetime=5.0):
+        """Return a dnspython Resolver pointed at this server"""
+        resolver = dns.resolver.Resolver(configure=False)
+        resolver.nameservers = [self.host]
+        resolver.port = self.port
+        resolver.lifetime = lifetime
+        return resolver
+
+    @contextmanager
+    def as_default_resolver(self):
+        """Temporarily route dns.resolver.resolve() to this server"""
+        previous = dns.resolver.default_resolver
+        dns.resolver.default_resolver = self.resolver()
+        try:
+            yield self
+        finally:
+            dns.resolver.default_resolver = previous
+
+    def _receive_loop(self):
+        while self._running:
+            try:
+                data, addr = self._sock.recvfrom(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            try:
+                query = dns.message.from_wire(data)
+            except Exception:
+                continue
+            self.queries += 1
+            name = query.question[0].name.to_text() if query.question else ''
+            if name not in self._dropped and self._share(name, 'drop') < self.drop_ratio:
+                self._dropped.add(name)
+                continue
+            wire = self.make_response(query).to_wire()
+            with self._cond:
+                heapq.heappush(self._pending, (time.monotonic() + self.latency,
+                                               self.queries, wire, addr))
+                self._cond.notify()
+
+    def _send_loop(self):
+        while self._running:
+            with self._cond:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                due, _, wire, addr = self._pending[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._pending)
+            try:
+                self._sock.sendto(wire, addr)
+            except OSError:
+                return
+
+    def _tcp_loop(self):
+        while self._running:
+            try:
+                conn, _ = self._tcp.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            with conn:
+                conn.settimeout(1.0)
+                try:
+                    query, _ = dns.query.receive_tcp(conn)
+                    self.tcp_queries += 1
+                    dns.query.send_tcp(conn, self.make_response(query, tcp=True))
+                except Exception:
+                    continue
@@ -0,0 +1,165 @@
+﻿#!/usr/bin/env python3
+"""
+Throughput benchmark for the validation hot path against a local stub DNS server
+
+Usage:
+    python benchmarks/run_benchmark.py --addresses 20000 --domains 500 --latency 0.005
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_dns import FakeDNSServer
+from src import check_email as validator
+from src.dns_cache import DomainCache
+from src.udp_engine import UDPEngine
+
+
+def make_addresses(count, domains, invalid_ratio=0.02, seed=42):
+    """Generate a reproducible address list spread over `domains` domains"""
+    rng = random.Random(seed)
+    names = [f"domain{i}.test" for i in range(domains)]
+    addresses = []
+    for i in range(count):
+        if rng.random() < invalid_ratio:
+            addresses.append(f"broken-address-{i}")
+        else:
+            addresses.append(f"user{i}@{rng.choice(names)}")
+    return addresses
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def measure(name, count, func, trace_memory):
+    """Run func once and collect wall time and, optionally, peak memory"""
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    latencies = func()
+    elapsed = time.perf_counter() - started
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {
+        'scenario': name,
+        'addresses': count,
+        'seconds': elapsed,
+        'rate': count / elapsed if elapsed else float('inf'),
+        'p50_ms': percentile(latencies, 0.50) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None,
+        'peak_mb': peak / 2 ** 20 if peak is not None else None,
+    }
+
+
+def bench_check_email(addresses):
+    """check_email per address with a shared cache, recording per-call latency"""
+    cache = DomainCache()
+    latencies = []
+    for email in addresses:
+        started = time.perf_counter()
+        validator.check_email(email, cache)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def bench_file(path, workers):
+    """Streaming file processing through validate_many"""
+    cache = DomainCache()
+    for _ in validator.validate_many(validator.iter_emails(path), workers, None, cache):
+        pass
+    return []
+
+
+def bench_engine(path, server, outstanding):
+    """validate_many with the pipelined UDP engine instead of worker threads"""
+    cache = DomainCache()
+    with UDPEngine([server.host], server.port, max_outstanding=outstanding) as engine:
+        emails = validator.iter_emails(path)
+        for _ in validator.validate_many(emails, cache=cache, batch_size=outstanding * 10,
+                                         engine=engine):
+            pass
+    return []
+
+
+def bench_cli(path, workers, output):
+    """The email-validator CLI end to end, stdout discarded"""
+    argv = sys.argv
+    sys.argv = ['email-validator', '--file', path, '--workers', str(workers),
+                '--output', output]
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            validator.main()
+    finally:
+        sys.argv = argv
+    return []
+
+
+def format_row(row):
+    def cell(value, fmt):
+        return format(value, fmt) if value is not None else f"{'-':>8}"
+    return (f"{row['scenario']:<12} {row['addresses']:>9} {row['seconds']:>9.2f} "
+            f"{row['rate']:>11.0f} {cell(row['p50_ms'], '>8.2f')} "
+            f"{cell(row['p99_ms'], '>8.2f')} {cell(row['peak_mb'], '>8.1f')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the email validator hot path')
+    parser.add_argument('--addresses', type=int, default=10000)
+    parser.add_argument('--domains', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.002,
+                        help='Stub DNS reply delay in seconds')
+    parser.add_argument('--nxdomain-ratio', type=float, default=0.1)
+    parser.add_argument('--noanswer-ratio', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=20)
+    parser.add_argument('--outstanding', type=int, default=200,
+                        help='In-flight queries for the udp scenario')
+    parser.add_argument('--memory', action='store_true',
+                        help='Track peak memory with tracemalloc (slows the run)')
+    parser.add_argument('--scenario', action='append',
+                        choices=['check_email', 'file', 'udp', 'cli'],
+                        help='Scenario to run (default: all)')
+    args = parser.parse_args()
+
+    scenarios = args.scenario or ['check_email', 'file', 'udp', 'cli']
+    addresses = make_addresses(args.addresses, args.domains)
+    server = FakeDNSServer(latency=args.latency, nxdomain_ratio=args.nxdomain_ratio,
+                           noanswer_ratio=args.noanswer_ratio)
+
+    with tempfile.TemporaryDirectory() as tmp, server, server.as_default_resolver():
+        path = os.path.join(tmp, 'emails.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(addresses) + "\n")
+
+        runs = {
+            'check_email': lambda: bench_check_email(addresses),
+            'file': lambda: bench_file(path, args.workers),
+            'udp': lambda: bench_engine(path, server, args.outstanding),
+            'cli': lambda: bench_cli(path, args.workers, os.path.join(tmp, 'out.txt')),
+        }
+        rows = [measure(name, len(addresses), runs[name], args.memory) for name in scenarios]
+
+    print(f"{args.addresses} addresses, {args.domains} domains, latency "
+          f"{args.latency * 1000:.1f} ms, {args.workers} workers, {server.queries} DNS queries")
+    print(f"{'scenario':<12} {'addresses':>9} {'seconds':>9} {'addr/sec':>11} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'peak MB':>8}")
+    for row in rows:
+        print(format_row(row))
+    return rows
+
+
+if __name__ == "__main__":
+    main()
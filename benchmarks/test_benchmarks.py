@@ -0,0 +1,60 @@
+﻿"""
+pytest-benchmark suite for the validation hot path
+
+Run with: pytest benchmarks/ --benchmark-only -p no:cov
+"""
+import sys
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from benchmarks.fake_dns import FakeDNSServer
+from benchmarks.run_benchmark import make_addresses, bench_cli
+from src.check_email import check_email, validate_syntax, validate_many, iter_emails
+from src.dns_cache import DomainCache
+
+
+@pytest.fixture(scope="module")
+def dns_server():
+    with FakeDNSServer(latency=0.001, nxdomain_ratio=0.1, noanswer_ratio=0.05) as server:
+        with server.as_default_resolver():
+            yield server
+
+
+@pytest.fixture(scope="module")
+def addresses():
+    return make_addresses(2000, 100)
+
+
+@pytest.fixture
+def email_file(tmp_path, addresses):
+    path = tmp_path / "emails.txt"
+    path.write_text("\n".join(addresses) + "\n")
+    return str(path)
+
+
+def test_validate_syntax(benchmark, addresses):
+    benchmark(lambda: [validate_syntax(email) for email in addresses])
+
+
+def test_check_email_warm_cache(benchmark, dns_server, addresses):
+    cache = DomainCache()
+    benchmark(lambda: [check_email(email, cache) for email in addresses])
+
+
+def test_check_email_cold(benchmark, dns_server):
+    emails = [f"user@cold{i}.test" for i in range(200)]
+    benchmark.pedantic(lambda: [check_email(email) for email in emails], rounds=3)
+
+
+@pytest.mark.parametrize("workers", [1, 20])
+def test_file_processing(benchmark, dns_server, email_file, workers):
+    def run():
+        for _ in validate_many(iter_emails(email_file), workers, None, DomainCache()):
+            pass
+    benchmark.pedantic(run, rounds=3)
+
+
+def test_cli(benchmark, dns_server, email_file, tmp_path):
+    output = str(tmp_path / "out.txt")
+    benchmark.pedantic(bench_cli, args=(email_file, 20, output), rounds=3)
@@ -0,0 +1,118 @@
+﻿#!/usr/bin/env python3
+"""
+Адаптивное число одновременных DNS-запросов (AIMD)
+"""
+
+import threading
+import time
+
+import dns.exception
+import dns.resolver
+
+
+def is_overload(error):
+    """Признак перегрузки резолвера: таймаут или отказ всех серверов (SERVFAIL)"""
+    return isinstance(error, (dns.exception.Timeout, dns.resolver.NoNameservers))
+
+
+class AIMDController:
+    """Лимит одновременных запросов по схеме AIMD, как окно в TCP
+
+    Пока ответы приходят быстрее target_latency секунд, лимит растёт: в
+    начале на 1 за каждый ответ (удвоение за круг запросов), после первого
+    снижения - примерно на increase за круг. Таймаут или SERVFAIL умножает
+    лимит на decrease, но не чаще одного раза на круг: запросы, отправленные
+    до последнего снижения, его уже не уменьшают. Ответ медленнее
+    target_latency оставляет лимит как есть.
+    Потоки ограничиваются через acquire/release; однопоточный код (UDPEngine)
+    читает limit и сообщает итоги через record.
+    """
+
+    def __init__(self, initial=10, minimum=1, maximum=1000, target_latency=0.2,
+                 increase=1.0, decrease=0.5, clock=time.monotonic):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease = decrease
+        self._clock = clock
+        self._window = float(min(max(initial, self.minimum), self.maximum))
+        self._slow_start = True
+        self._last_cut = float('-inf')
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._shards = []
+        self._counters = {'peak': int(self._window), 'low': int(self._window),
+                          'increases': 0, 'decreases': 0}
+
+    @property
+    def limit(self):
+        """Текущий лимит одновременных запросов"""
+        return int(self._window)
+
+    def settings(self):
+        """Параметры конструктора, чтобы создать такой же контроллер в другом процессе"""
+        return {'initial': self.limit, 'minimum': self.minimum, 'maximum': self.maximum,
+                'target_latency': self.target_latency, 'increase': self.increase,
+                'decrease': self.decrease}
+
+    def acquire(self):
+        """Ждёт, пока число запросов в полёте станет меньше лимита"""
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, started, failed=False):
+        """Освобождает место запроса, начатого в момент started (по clock)"""
+        with self._cond:
+            self._in_flight -= 1
+            self._update(started, failed)
+            self._cond.notify_all()
+
+    def record(self, started, failed=False):
+        """Учитывает итог запроса без acquire/release"""
+        with self._cond:
+            self._update(started, failed)
+
+    def _update(self, started, failed):
+        now = self._clock()
+        previous = self.limit
+        if failed:
+            if started < self._last_cut:
+                return
+            self._last_cut = now
+            self._slow_start = False
+            self._window = max(self.minimum, self._window * self.decrease)
+        elif self.target_latency is None or now - started <= self.target_latency:
+            step = 1.0 if self._slow_start else self.increase / self._window
+            self._window = min(self.maximum, self._window + step)
+        limit = self.limit
+        if limit > previous:
+            self._counters['increases'] += 1
+            self._counters['peak'] = max(self._counters['peak'], limit)
+        elif limit < previous:
+            self._counters['decreases'] += 1
+            self._counters['low'] = min(self._counters['low'], limit)
+
+    def merge(self, stats):
+        """Учитывает итог контроллера другого процесса (результат stats())
+
+        После слияния stats() описывает все процессы вместе: лимиты
+        и счётчики складываются.
+        """
+        self._shards.append(dict(stats))
+
+    def stats(self):
+        """Текущий лимит, его максимум и минимум за запуск и число изменений"""
+        if self._shards:
+            return {key: sum(shard[key] for shard in self._shards)
+                    for key in self._shards[0]}
+        with self._cond:
+            return dict(self._counters, limit=self.limit)
+
+    def summary_line(self):
+        """Строка для итогов запуска"""
+        stats = self.stats()
+        return (f"Параллельность DNS: {stats['limit']} (от {stats['low']} до {stats['peak']}, "
+                f"повышений {stats['increases']}, снижений {stats['decreases']})")
@@ -0,0 +1,156 @@
+﻿#!/usr/bin/env python3
+"""
+Асинхронная проверка email адресов на основе dns.asyncresolver
+"""
+
+import asyncio
+import time
+from collections import deque
+
+import dns.asyncresolver
+import dns.resolver
+
+from src.check_email import (
+    EmailResult, Status, cached_mx, store_mx, validate_syntax, error_result,
+    format_result, index_status, observe,
+)
+from src.dns_cache import normalize_domain
+from src.resolver import NullMX, implicit_mx_error, is_null_mx
+from src.singleflight import AsyncSingleFlight
+
+# Одновременные запросы MX одного домена выполняются один раз
+inflight = AsyncSingleFlight()
+
+
+async def resolve_mx_async(domain, cache=None, timeout=None, resolver=None):
+    """Асинхронный аналог resolve_mx с тем же кэшем
+
+    resolver - dns.asyncresolver.Resolver (см. make_async_resolver).
+    Одновременные запросы одного домена объединяются, как в resolve_mx.
+    """
+    hosts = cached_mx(domain, cache)
+    if hosts is not None:
+        return hosts
+
+    key = (normalize_domain(domain), id(cache), id(resolver))
+    return await inflight.do(key, query_mx_async, domain, cache, timeout, resolver)
+
+
+async def query_mx_async(domain, cache=None, timeout=None, resolver=None):
+    """Асинхронно отправляет запрос MX и сохраняет результат в кэш"""
+    kwargs = {'lifetime': timeout} if timeout else {}
+    resolve = dns.asyncresolver.resolve if resolver is None else resolver.resolve
+    try:
+        answer = await resolve(domain, 'MX', **kwargs)
+        if is_null_mx(answer):
+            raise NullMX()
+    except dns.resolver.NoAnswer as e:
+        error = await query_implicit_mx_async(domain, resolve, kwargs) or e
+        store_mx(domain, cache, error=error)
+        raise error
+    except Exception as e:
+        store_mx(domain, cache, error=e)
+        raise
+    return store_mx(domain, cache, answer)
+
+
+async def query_implicit_mx_async(domain, resolve, kwargs):
+    """Асинхронный аналог query_implicit_mx: A и AAAA запрашиваются одновременно"""
+    tasks = [asyncio.ensure_future(resolve(domain, rdtype, **kwargs))
+             for rdtype in ('A', 'AAAA')]
+    outcomes = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                outcomes.append(await next_done)
+                # Найденного адреса достаточно, второй ответ не нужен
+                break
+            except Exception as e:
+                outcomes.append(e)
+    finally:
+        for task in tasks:
+            task.cancel()
+    return implicit_mx_error(outcomes)
+
+
+async def validate_email_async(email, cache=None, timeout=None, semaphore=None,
+                               resolver=None, index=None, metrics=None):
+    """Асинхронно проверяет email адрес, результат совпадает с validate_email
+
+    semaphore - общий asyncio.Semaphore для ограничения числа запросов,
+    index - DomainIndex, домены из которого решаются без DNS,
+    metrics - Metrics для замера времени этапов.
+    """
+    email = email.strip()
+    if not email:
+        return None
+
+    started = time.perf_counter()
+    domain = validate_syntax(email)
+    observe(metrics, 'syntax', started)
+    if domain is None:
+        return EmailResult(email, None, Status.INVALID_SYNTAX)
+
+    status = index_status(index, domain)
+    if status is not None:
+        return EmailResult(email, domain, status)
+
+    try:
+        if semaphore is None:
+            started = time.perf_counter()
+            hosts = await resolve_mx_async(domain, cache, timeout, resolver)
+        else:
+            async with semaphore:
+                started = time.perf_counter()
+                hosts = await resolve_mx_async(domain, cache, timeout, resolver)
+    except Exception as e:
+        observe(metrics, 'resolve', started, normalize_domain(domain))
+        return error_result(email, domain, e)
+    observe(metrics, 'resolve', started, normalize_domain(domain))
+    return EmailResult(email, domain, Status.VALID, tuple(hosts))
+
+
+async def check_email_async(email, cache=None, timeout=None, semaphore=None,
+                            resolver=None, index=None):
+    """Асинхронный аналог check_email, возвращает строку результата"""
+    result = await validate_email_async(email, cache, timeout, semaphore, resolver,
+                                        index)
+    if result is None:
+        return None
+    return format_result(result)
+
+
+async def _iterate(emails):
+    """Позволяет перебирать как обычные, так и асинхронные итерируемые объекты"""
+    if hasattr(emails, '__aiter__'):
+        async for email in emails:
+            yield email
+    else:
+        for email in emails:
+            yield email
+
+
+async def validate_many_async(emails, concurrency=100, timeout=None, cache=None,
+                              semaphore=None, resolver=None, index=None, metrics=None):
+    """Асинхронный генератор EmailResult в порядке входных адресов
+
+    Если semaphore не передан, создаётся собственный с лимитом concurrency.
+    """
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(concurrency)
+
+    window = concurrency * 2
+    pending = deque()
+    try:
+        async for email in _iterate(emails):
+            pending.append(asyncio.ensure_future(
+                validate_email_async(email, cache, timeout, semaphore, resolver,
+                                     index, metrics)))
+            if len(pending) >= window:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        # Если генератор закрыли досрочно, отменяем оставшиеся проверки
+        for task in pending:
+            task.cancel()
@@ -3,93 +3,1006 @@
 Email Validator - проверка email адресов через MX-записи
 """
 
+import os
 import sys
 import argparse
+import dns.name
 import dns.resolver
 import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from itertools import islice
+from typing import NamedTuple, Optional
 
-def check_email(email):
-    """Проверяет валидность email адреса и MX-записи домена"""
+# При запуске как скрипта (python src/check_email.py) пакет src не виден
+if not __package__:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.dns_cache import DomainCache, normalize_domain
+from src.verdict_store import VerdictStore
+from src.resolver import (
+    ImplicitMX, NullMX, implicit_mx_error, is_null_mx, load_dns_settings, make_resolver,
+    parse_nameservers,
+)
+from src.domain_index import DomainIndex
+from src.telegram_queue import send_to_telegram_async
+from src.checkpoint import Checkpoint
+from src.metrics import Metrics
+from src.singleflight import SingleFlight
+from src.udp_engine import engine_from_settings
+from src.adaptive import AIMDController, is_overload
+
+# Одновременные запросы MX одного домена выполняются один раз
+inflight = SingleFlight()
+
+# Потоки для запросов AAAA, идущих параллельно с A при отсутствии MX
+fallback_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix='implicit-mx')
+
+# Размер буфера записи файла результатов
+OUTPUT_BUFFER = 1 << 20
+
+# Ответы без MX-хостов, которые можно кэшировать
+CACHEABLE_ERRORS = (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, NullMX, ImplicitMX)
+
+# Синтаксис адреса (практическое подмножество RFC 5321/5322):
+# локальная часть dot-atom, домен из меток по 1-63 символа с буквенным TLD
+MAX_EMAIL_LENGTH = 254
+MAX_LOCAL_LENGTH = 64
+MAX_DOMAIN_LENGTH = 253
+_ATEXT = r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]"
+_ATEXT_UTF8 = r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~\u0080-\U0010ffff-]"
+_LABEL = r"[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?"
+_DOMAIN = rf"(?:{_LABEL}\.)+(?:[A-Za-z]{{2,63}}|xn--[A-Za-z0-9-]{{1,59}})"
+EMAIL_RE = re.compile(rf"({_ATEXT}+(?:\.{_ATEXT}+)*)@({_DOMAIN})")
+LOCAL_PART_UTF8_RE = re.compile(rf"{_ATEXT_UTF8}+(?:\.{_ATEXT_UTF8}+)*")
+DOMAIN_RE = re.compile(_DOMAIN)
+
+class Status(Enum):
+    """Итог проверки email адреса"""
+    VALID = 'valid'
+    INVALID_SYNTAX = 'invalid_syntax'
+    NO_DOMAIN = 'no_domain'
+    NO_MX = 'no_mx'
+    NULL_MX = 'null_mx'
+    IMPLICIT_MX = 'implicit_mx'
+    MX_UNRESOLVED = 'mx_unresolved'
+    ERROR = 'error'
+    KNOWN_VALID = 'known_valid'
+    DISPOSABLE = 'disposable'
+    BLOCKED = 'blocked'
+    MAILBOX_OK = 'mailbox_ok'
+    CATCH_ALL = 'catch_all'
+    NO_MAILBOX = 'no_mailbox'
+
+    @property
+    def is_valid(self):
+        return self in VALID_STATUSES
+
+# Статусы, при которых адрес считается валидным
+VALID_STATUSES = frozenset({Status.VALID, Status.IMPLICIT_MX, Status.KNOWN_VALID,
+                            Status.MAILBOX_OK, Status.CATCH_ALL})
+
+# Текст результата для вывода пользователю
+MESSAGES = {
+    Status.VALID: "✅ домен валиден (MX записи найдены)",
+    Status.INVALID_SYNTAX: "❌ некорректный email",
+    Status.NO_DOMAIN: "❌ домен отсутствует",
+    Status.NO_MX: "⚠️ MX-записи отсутствуют",
+    Status.NULL_MX: "❌ домен не принимает почту (null MX)",
+    Status.IMPLICIT_MX: "✅ домен валиден (MX нет, почта на адрес домена)",
+    Status.MX_UNRESOLVED: "❌ у MX-серверов домена нет адресов",
+    Status.ERROR: "❌ ошибка проверки: {error}",
+    Status.KNOWN_VALID: "✅ домен валиден (известный домен)",
+    Status.DISPOSABLE: "❌ одноразовый почтовый домен",
+    Status.BLOCKED: "❌ домен заблокирован",
+    Status.MAILBOX_OK: "✅ почтовый ящик существует (SMTP)",
+    Status.CATCH_ALL: "✅ домен принимает любые адреса (catch-all)",
+    Status.NO_MAILBOX: "❌ почтовый ящик не существует",
+}
+
+# Вердикты индекса доменов (DomainIndex) и соответствующие статусы
+INDEX_STATUSES = {
+    'valid': Status.KNOWN_VALID,
+    'disposable': Status.DISPOSABLE,
+    'blocked': Status.BLOCKED,
+}
+
+class EmailResult(NamedTuple):
+    """Результат проверки одного email адреса"""
+    email: str
+    domain: Optional[str]
+    status: Status
+    mx_hosts: tuple = ()
+    error: Optional[str] = None
+    # Время разрешения домена в мс, заполняется только в validate_many(timed=True)
+    elapsed_ms: Optional[float] = None
+    # Почтовый провайдер по MX-хостам, заполняется только MXHostResolver
+    provider: Optional[str] = None
+
+def _mx_hosts(answer):
+    """Возвращает MX-хосты ответа в порядке приоритета"""
+    try:
+        records = sorted(answer, key=lambda r: r.preference)
+        # Записи null MX (".") среди обычных не указывают на сервер
+        return tuple(r.exchange.to_text(omit_final_dot=True) for r in records
+                     if r.exchange != dns.name.root)
+    except (TypeError, AttributeError):
+        return ()
+
+def _answer_ttl(answer):
+    """Возвращает TTL ответа или None, если его нельзя определить"""
+    ttl = getattr(getattr(answer, 'rrset', None), 'ttl', None)
+    return ttl if isinstance(ttl, int) else None
+
+def cached_mx(domain, cache):
+    """Возвращает MX-хосты домена из кэша или None при промахе
+
+    Если в кэше сохранён отрицательный ответ, выбрасывает его заново.
+    """
+    if cache is None:
+        return None
+    entry = cache.lookup(domain)
+    if entry is None:
+        return None
+    hosts, error = entry
+    if error is not None:
+        raise error()
+    return hosts
+
+def store_mx(domain, cache, answer=None, error=None):
+    """Сохраняет ответ или кэшируемую ошибку в кэше и возвращает MX-хосты"""
+    if error is not None:
+        if cache is not None and isinstance(error, CACHEABLE_ERRORS):
+            cache.store(domain, error=type(error))
+        return None
+    hosts = _mx_hosts(answer)
+    if cache is not None:
+        cache.store(domain, hosts=hosts, ttl=_answer_ttl(answer))
+    return hosts
+
+def resolve_mx(domain, cache=None, timeout=None, resolver=None, controller=None):
+    """Возвращает список MX-хостов домена, используя кэш если он передан
+
+    Исключения NXDOMAIN и NoAnswer сохраняются в кэше и повторно
+    выбрасываются при следующих обращениях к тому же домену. Null MX
+    выбрасывает NullMX, а домен без MX, но с адресом A/AAAA - ImplicitMX.
+    timeout - ограничение времени на один запрос в секундах,
+    resolver - настроенный dns.resolver.Resolver (см. make_resolver);
+    без него используется резолвер dnspython по умолчанию.
+    Если тот же домен уже запрашивается в другом потоке (с тем же кэшем
+    и резолвером), новый запрос не отправляется: ждём ответ первого.
+    controller - AIMDController, ограничивающий число запросов в полёте.
+    """
+    hosts = cached_mx(domain, cache)
+    if hosts is not None:
+        return hosts
+
+    key = (normalize_domain(domain), id(cache), id(resolver))
+    return inflight.do(key, query_mx, domain, cache, timeout, resolver, controller)
+
+def query_mx(domain, cache=None, timeout=None, resolver=None, controller=None):
+    """Отправляет запрос MX и сохраняет ответ или ошибку в кэш"""
+    kwargs = {'lifetime': timeout} if timeout else {}
+    resolve = dns.resolver.resolve if resolver is None else resolver.resolve
+    failed = False
+    if controller is not None:
+        controller.acquire()
+        started = time.monotonic()
+    try:
+        answer = resolve(domain, 'MX', **kwargs)
+        if is_null_mx(answer):
+            raise NullMX()
+    except dns.resolver.NoAnswer as e:
+        error = query_implicit_mx(domain, resolve, kwargs) or e
+        failed = is_overload(error)
+        store_mx(domain, cache, error=error)
+        raise error
+    except Exception as e:
+        failed = is_overload(e)
+        store_mx(domain, cache, error=e)
+        raise
+    finally:
+        if controller is not None:
+            controller.release(started, failed)
+    return store_mx(domain, cache, answer)
+
+def query_implicit_mx(domain, resolve, kwargs):
+    """Проверяет A и AAAA домена без MX и возвращает вердикт implicit_mx_error
+
+    AAAA запрашивается в fallback_pool параллельно с A; если A найден,
+    ответ AAAA не ждём.
+    """
+    aaaa = fallback_pool.submit(resolve, domain, 'AAAA', **kwargs)
+    try:
+        resolve(domain, 'A', **kwargs)
+        return ImplicitMX()
+    except Exception as e:
+        a_outcome = e
+    try:
+        aaaa_outcome = aaaa.result()
+    except Exception as e:
+        aaaa_outcome = e
+    return implicit_mx_error([a_outcome, aaaa_outcome])
+
+def validate_syntax(email):
+    """Проверяет синтаксис адреса без сетевых запросов
+
+    Возвращает домен в ASCII-виде (IDNA для национальных доменов) или None,
+    если адрес некорректен.
+    """
+    if len(email) > MAX_EMAIL_LENGTH:
+        return None
+    if email.isascii():
+        match = EMAIL_RE.fullmatch(email)
+        if match is None or len(match.group(1)) > MAX_LOCAL_LENGTH:
+            return None
+        domain = match.group(2)
+        return domain if len(domain) <= MAX_DOMAIN_LENGTH else None
+
+    # Национальные адреса: локальная часть в UTF-8, домен через IDNA
+    local, at, domain = email.rpartition('@')
+    if not at or len(local.encode('utf-8')) > MAX_LOCAL_LENGTH:
+        return None
+    if not LOCAL_PART_UTF8_RE.fullmatch(local):
+        return None
+    try:
+        domain = domain.encode('idna').decode('ascii')
+    except UnicodeError:
+        return None
+    if len(domain) > MAX_DOMAIN_LENGTH or not DOMAIN_RE.fullmatch(domain):
+        return None
+    return domain
+
+def classify_error(error):
+    """Определяет статус по исключению DNS-запроса"""
+    if isinstance(error, dns.resolver.NXDOMAIN):
+        return Status.NO_DOMAIN
+    if isinstance(error, dns.resolver.NoAnswer):
+        return Status.NO_MX
+    if isinstance(error, NullMX):
+        return Status.NULL_MX
+    if isinstance(error, ImplicitMX):
+        return Status.IMPLICIT_MX
+    return Status.ERROR
+
+def error_result(email, domain, error):
+    """Строит EmailResult по исключению DNS-запроса"""
+    status = classify_error(error)
+    detail = str(error) if status is Status.ERROR else None
+    # Без MX почту принимает сам домен, он и будет почтовым сервером
+    hosts = (domain,) if status is Status.IMPLICIT_MX else ()
+    return EmailResult(email, domain, status, hosts, error=detail)
+
+def format_result(result):
+    """Формирует строку для вывода по результату проверки"""
+    message = MESSAGES[result.status].format(error=result.error)
+    return f"{result.email}: {message}"
+
+def result_record(result):
+    """Преобразует EmailResult в словарь для машиночитаемого вывода"""
+    return {
+        'email': result.email,
+        'domain': result.domain,
+        'status': result.status.value,
+        'mx_hosts': list(result.mx_hosts),
+        'error': result.error,
+        'elapsed_ms': result.elapsed_ms,
+        'provider': result.provider,
+    }
+
+def result_from_record(record):
+    """Восстанавливает EmailResult из result_record()"""
+    return EmailResult(record['email'], record['domain'], Status(record['status']),
+                       tuple(record['mx_hosts']), record['error'], record['elapsed_ms'],
+                       record.get('provider'))
+
+def lookup_domain(domain, cache=None, timeout=None, resolver=None, controller=None):
+    """Разрешает MX домена и возвращает пару (hosts, error) без исключений"""
+    try:
+        return resolve_mx(domain, cache, timeout, resolver, controller), None
+    except Exception as e:
+        return None, e
+
+def observe(metrics, stage, started, domain=None):
+    """Передаёт в Metrics время этапа, начатого в момент started"""
+    if metrics is not None:
+        metrics.observe(stage, time.perf_counter() - started, domain)
+
+def timed_lookup(domain, cache=None, timeout=None, resolver=None, metrics=None,
+                 controller=None):
+    """Как lookup_domain, но дополнительно возвращает время разрешения в мс"""
+    started = time.perf_counter()
+    hosts, error = lookup_domain(domain, cache, timeout, resolver, controller)
+    elapsed = time.perf_counter() - started
+    if metrics is not None:
+        metrics.observe('resolve', elapsed, normalize_domain(domain))
+    return hosts, error, elapsed * 1000
+
+def engine_lookups(engine, domains, cache=None, metrics=None):
+    """Разрешает домены пакетом через UDPEngine
+
+    domains - словарь нормализованный домен -> домен из адреса. Возвращает
+    словарь с теми же ключами и тройками (hosts, error, мс), как timed_lookup.
+    Домены из кэша в движок не отправляются, ответы движка сохраняются в кэше.
+    Для доменов без MX следующим окном запрашиваются сразу A и AAAA.
+    """
+    lookups = {}
+    wanted = {}
+    for key, domain in domains.items():
+        try:
+            hosts = cached_mx(domain, cache)
+        except Exception as e:
+            lookups[key] = (None, e, 0.0)
+            continue
+        if hosts is not None:
+            lookups[key] = (hosts, None, 0.0)
+        else:
+            wanted[domain] = key
+    answers = engine.resolve_many(wanted)
+    fallback = [domain for domain, (_, error, _) in answers.items()
+                if isinstance(error, dns.resolver.NoAnswer)]
+    addresses = {}
+    if fallback:
+        addresses = engine.resolve_queries(
+            (domain, rdtype) for domain in fallback for rdtype in ('A', 'AAAA'))
+    for domain, (answer, error, elapsed) in answers.items():
+        key = wanted[domain]
+        if (domain, 'A') in addresses:
+            outcomes = [addresses[domain, rdtype] for rdtype in ('A', 'AAAA')]
+            error = implicit_mx_error(
+                [found if found is not None else failure for found, failure, _ in outcomes]
+            ) or error
+            elapsed += max(seconds for _, _, seconds in outcomes)
+        elif error is None and is_null_mx(answer):
+            error = NullMX()
+        hosts = store_mx(domain, cache, answer, error)
+        if metrics is not None:
+            metrics.observe('resolve', elapsed, key)
+        lookups[key] = (hosts, error, elapsed * 1000)
+    return lookups
+
+def domain_result(email, domain, hosts=None, error=None):
+    """Строит EmailResult по итогу разрешения домена"""
+    if error is not None:
+        return error_result(email, domain, error)
+    return EmailResult(email, domain, Status.VALID, tuple(hosts))
+
+def index_status(index, domain):
+    """Возвращает статус домена по индексу известных доменов или None"""
+    if index is None:
+        return None
+    verdict = index.match(domain)
+    return INDEX_STATUSES[verdict] if verdict is not None else None
+
+def validate_email(email, cache=None, timeout=None, resolver=None, index=None,
+                   metrics=None, smtp=None):
+    """Проверяет email адрес и возвращает EmailResult (None для пустой строки)
+
+    cache - необязательный DomainCache, общий для всех проверок запуска,
+    timeout - ограничение времени на DNS-запрос в секундах,
+    resolver - общий настроенный резолвер,
+    index - DomainIndex, домены из которого решаются без DNS,
+    metrics - Metrics для замера времени этапов,
+    smtp - SMTPVerifier для проверки почтового ящика после MX.
+    """
     email = email.strip()
     if not email:
         return None
     
     # Проверяем формат email
-    match = re.search(r'@([a-zA-Z0-9.-]+\.[a-zA-Z]{2,})', email)
-    if not match:
-        return f"{email}: ❌ некорректный email"
+    started = time.perf_counter()
+    domain = validate_syntax(email)
+    observe(metrics, 'syntax', started)
+    if domain is None:
+        return EmailResult(email, None, Status.INVALID_SYNTAX)
     
-    domain = match.group(1)
+    status = index_status(index, domain)
+    if status is not None:
+        return EmailResult(email, domain, status)
     
+    hosts, error, _ = timed_lookup(domain, cache, timeout, resolver, metrics)
+    started = time.perf_counter()
+    result = domain_result(email, domain, hosts, error)
+    observe(metrics, 'classify', started)
+    if smtp is not None:
+        started = time.perf_counter()
+        result = smtp.apply(result)
+        observe(metrics, 'smtp', started)
+    return result
+
+def check_email(email, cache=None, timeout=None, resolver=None, index=None, metrics=None,
+                smtp=None):
+    """Проверяет валидность email адреса и MX-записи домена
+
+    Возвращает строку результата; структурированный результат
+    возвращает validate_email.
+    """
+    result = validate_email(email, cache, timeout, resolver, index, metrics, smtp)
+    if result is None:
+        return None
+    return format_result(result)
+
+def group_by_domain(emails, metrics=None):
+    """Разбирает адреса и группирует их по нормализованному домену
+
+    Возвращает список (email, domain) в исходном порядке (None для пустых
+    строк, domain=None для некорректных адресов) и словарь домен -> индексы.
+    """
+    parsed = []
+    groups = {}
+    for email in emails:
+        email = email.strip()
+        if not email:
+            parsed.append(None)
+            continue
+        started = time.perf_counter()
+        domain = validate_syntax(email)
+        observe(metrics, 'syntax', started)
+        if domain is not None:
+            groups.setdefault(normalize_domain(domain), []).append(len(parsed))
+        parsed.append((email, domain))
+    return parsed, groups
+
+def _batches(iterable, size):
+    """Разбивает поток на списки длиной не более size"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def map_ordered(func, items, concurrency=10):
+    """Применяет func к потоку элементов в пуле потоков, сохраняя порядок
+
+    None передаётся дальше без вызова func. Одновременно выполняется не
+    более concurrency вызовов, вперёд читается не более concurrency * 2
+    элементов; при досрочном закрытии генератора ожидающие вызовы отменяются.
+    """
+    if concurrency <= 1:
+        for item in items:
+            yield func(item) if item is not None else None
+        return
+
+    window = concurrency * 2
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        try:
+            for item in items:
+                pending.append(executor.submit(func, item) if item is not None else None)
+                if len(pending) >= window:
+                    future = pending.popleft()
+                    yield future.result() if future is not None else None
+            while pending:
+                future = pending.popleft()
+                yield future.result() if future is not None else None
+        finally:
+            for future in pending:
+                if future is not None:
+                    future.cancel()
+
+def validate_many(emails, concurrency=10, timeout=None, cache=None, batch_size=1000,
+                  resolver=None, index=None, timed=False, metrics=None, smtp=None,
+                  engine=None, controller=None, mx_resolver=None):
+    """Проверяет адреса пакетами, сохраняя порядок входных данных
+
+    В каждом пакете адреса группируются по домену, и каждый уникальный домен
+    разрешается один раз, после чего вердикт применяется ко всем его адресам.
+    Домены, найденные в index, решаются без DNS.
+    Одновременно выполняется не более concurrency DNS-запросов. Генератор
+    возвращает те же EmailResult, что и validate_email, в порядке emails.
+    При timed=True в elapsed_ms записывается время разрешения домена адреса
+    (общее для адресов одного домена, 0 для адресов без DNS-запроса).
+    metrics - Metrics для замера времени этапов,
+    smtp - SMTPVerifier для проверки почтовых ящиков адресов с MX,
+    engine - UDPEngine: домены пакета разрешаются им одним вызовом
+    (concurrency, timeout и resolver тогда не используются для DNS),
+    controller - AIMDController: concurrency становится верхней границей,
+    а число запросов в полёте подбирается по задержкам и таймаутам,
+    mx_resolver - MXHostResolver: адреса MX-хостов и провайдер (до проверки SMTP).
+    """
+    if smtp is not None:
+        yield from smtp.verify_results(
+            validate_many(emails, concurrency, timeout, cache, batch_size, resolver,
+                          index, timed, metrics, engine=engine, controller=controller,
+                          mx_resolver=mx_resolver),
+            concurrency)
+        return
+    if mx_resolver is not None:
+        yield from mx_resolver.apply_results(
+            validate_many(emails, concurrency, timeout, cache, batch_size, resolver,
+                          index, timed, metrics, engine=engine, controller=controller),
+            concurrency)
+        return
+    elapsed = 0.0 if timed else None
+    executor = None
+    if concurrency > 1 and engine is None:
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+    lookups = {}
     try:
-        dns.resolver.resolve(domain, 'MX')
-        return f"{email}: ✅ домен валиден (MX записи найдены)"
-    except dns.resolver.NXDOMAIN:
-        return f"{email}: ❌ домен отсутствует"
-    except dns.resolver.NoAnswer:
-        return f"{email}: ⚠️ MX-записи отсутствуют"
-    except Exception as e:
-        return f"{email}: ❌ ошибка проверки: {str(e)}"
+        for batch in _batches(emails, batch_size):
+            parsed, groups = group_by_domain(batch, metrics)
+            lookups = {}
+            known = {}
+            wanted = {}
+            for key in groups:
+                status = index_status(index, key)
+                if status is not None:
+                    known[key] = status
+                elif engine is not None:
+                    wanted[key] = parsed[groups[key][0]][1]
+                elif executor is not None:
+                    domain = parsed[groups[key][0]][1]
+                    lookups[key] = executor.submit(timed_lookup, domain, cache,
+                                                   timeout, resolver, metrics, controller)
+            if wanted:
+                lookups = engine_lookups(engine, wanted, cache, metrics)
 
-def process_file(filename):
-    """Обрабатывает файл с email адресами"""
+            for item in parsed:
+                if item is None:
+                    yield None
+                    continue
+                email, domain = item
+                if domain is None:
+                    yield EmailResult(email, None, Status.INVALID_SYNTAX, elapsed_ms=elapsed)
+                    continue
+                key = normalize_domain(domain)
+                if key in known:
+                    yield EmailResult(email, domain, known[key], elapsed_ms=elapsed)
+                    continue
+                if executor is not None:
+                    hosts, error, lookup_ms = lookups[key].result()
+                else:
+                    # Последовательный режим: домен разрешается при первой
+                    # встрече (ответы UDPEngine уже получены для всего пакета)
+                    if key not in lookups:
+                        lookups[key] = timed_lookup(domain, cache, timeout, resolver,
+                                                    metrics, controller)
+                    hosts, error, lookup_ms = lookups[key]
+                started = time.perf_counter()
+                result = domain_result(email, domain, hosts, error)
+                observe(metrics, 'classify', started)
+                yield result._replace(elapsed_ms=round(lookup_ms, 3)) if timed else result
+    finally:
+        if executor is not None:
+            # При досрочном закрытии генератора не ждём оставшиеся запросы
+            for future in lookups.values():
+                future.cancel()
+            executor.shutdown()
+
+def iter_emails(filename):
+    """Лениво читает email адреса из файла, пропуская пустые строки"""
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            emails = [line.strip() for line in f if line.strip()]
+        with open(filename, 'r', encoding='utf-8-sig') as f:
+            for line in f:
+                email = line.strip()
+                if email:
+                    yield email
     except FileNotFoundError:
         print(f"Ошибка: файл {filename} не найден")
-        return []
-    
-    return emails
+
+def process_file(filename):
+    """Обрабатывает файл с email адресами"""
+    return list(iter_emails(filename))
+
+class RunSummary:
+    """Итоговые счётчики запуска, обновляемые по мере поступления результатов"""
+
+    def __init__(self):
+        self.total = 0
+        self.valid = 0
+        self.domains = set()
+        self.statuses = {}
+        self.providers = {}
+
+    @property
+    def invalid(self):
+        return self.total - self.valid
+
+    def add(self, result):
+        """Учитывает очередной EmailResult"""
+        self.total += 1
+        if result.status.is_valid:
+            self.valid += 1
+        if result.domain is not None:
+            self.domains.add(normalize_domain(result.domain))
+        status = result.status.value
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if result.provider is not None:
+            self.providers[result.provider] = self.providers.get(result.provider, 0) + 1
+
+    def merge(self, other):
+        """Добавляет счётчики другой сводки (например, другого процесса)"""
+        self.total += other.total
+        self.valid += other.valid
+        self.domains |= other.domains
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        for provider, count in other.providers.items():
+            self.providers[provider] = self.providers.get(provider, 0) + count
+
+    def to_dict(self):
+        """Состояние для сохранения в контрольной точке"""
+        return {'total': self.total, 'valid': self.valid, 'domains': sorted(self.domains),
+                'statuses': dict(self.statuses), 'providers': dict(self.providers)}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Восстанавливает сводку из to_dict()"""
+        summary = cls()
+        summary.total = data['total']
+        summary.valid = data['valid']
+        summary.domains = set(data['domains'])
+        summary.statuses = dict(data.get('statuses', {}))
+        summary.providers = dict(data.get('providers', {}))
+        return summary
+
+    def stats_record(self):
+        """Итоги в виде словаря для отдельного файла статистики"""
+        return {
+            'total': self.total,
+            'unique_domains': len(self.domains),
+            'valid': self.valid,
+            'invalid': self.invalid,
+            'statuses': dict(self.statuses),
+            'providers': dict(self.providers),
+        }
+
+    def lines(self):
+        """Возвращает строки итоговой сводки"""
+        lines = [
+            f"Всего проверено: {self.total}",
+            f"Уникальных доменов: {len(self.domains)}",
+            f"Валидных: {self.valid}",
+            f"Невалидных: {self.invalid}",
+        ]
+        if self.providers:
+            ranked = sorted(self.providers.items(), key=lambda item: (-item[1], item[0]))
+            lines.append("По провайдерам: " + ", ".join(
+                f"{provider} {count}" for provider, count in ranked))
+        return lines
+
+def open_output(filename, resume_size=None):
+    """Открывает файл результатов для постепенной записи или возвращает None
+
+    resume_size - продолжить запись в существующий файл, отбросив всё
+    после этой позиции (байт), записанное после контрольной точки.
+    """
+    if not filename:
+        return None
+    try:
+        if resume_size is not None:
+            os.truncate(filename, resume_size)
+            return open(filename, 'a', encoding='utf-8', buffering=OUTPUT_BUFFER)
+        return open(filename, 'w', encoding='utf-8', buffering=OUTPUT_BUFFER)
+    except OSError as e:
+        print(f"Ошибка сохранения файла: {e}")
+        return None
+
+def dns_settings_from_args(args):
+    """Настройки резолвера из config.ini с учётом параметров командной строки"""
+    # Параметры командной строки важнее значений из config.ini
+    dns_settings = load_dns_settings(args.config)
+    if args.timeout is not None:
+        dns_settings['lifetime'] = args.timeout
+    if args.server_timeout is not None:
+        dns_settings['timeout'] = args.server_timeout
+    if args.nameservers:
+        dns_settings['nameservers'] = parse_nameservers(args.nameservers)
+    if args.rotate:
+        dns_settings['rotate'] = True
+    return dns_settings
 
 def main():
+    if sys.argv[1:2] == ['serve']:
+        # Импорт здесь: модуль server сам зависит от check_email
+        from src.server import main as serve_main
+        return serve_main(sys.argv[2:])
+    
     parser = argparse.ArgumentParser(description='Проверка MX-записей email адресов')
     parser.add_argument('-f', '--file', default='data/emails.txt', 
                        help='Файл с email адресами')
     parser.add_argument('-e', '--email', help='Проверить один email адрес')
     parser.add_argument('-o', '--output', help='Сохранить результаты в файл')
+    parser.add_argument('--format', choices=['text', 'jsonl', 'csv'], default='text',
+                       help='Формат файла результатов; для jsonl и csv итоги '
+                            'сохраняются в <output>.stats.json')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                       help='Количество параллельных DNS-запросов')
+    parser.add_argument('-t', '--timeout', type=float,
+                       help='Таймаут одного DNS-запроса в секундах')
+    parser.add_argument('-c', '--config', default='config.ini',
+                       help='Файл конфигурации с секцией [email]')
+    parser.add_argument('--nameservers',
+                       help='DNS-серверы через запятую (вместо системных)')
+    parser.add_argument('--server-timeout', type=float,
+                       help='Ожидание ответа одного DNS-сервера перед переходом к следующему')
+    parser.add_argument('--engine', choices=['dnspython', 'udp'], default='dnspython',
+                       help='Способ разрешения MX: dnspython (поток на запрос) или udp '
+                            '(тысячи запросов через несколько UDP-сокетов)')
+    parser.add_argument('--udp-sockets', type=int, default=4,
+                       help='Число UDP-сокетов для --engine udp')
+    parser.add_argument('--max-outstanding', type=int, default=1000,
+                       help='Максимум одновременных запросов для --engine udp')
+    parser.add_argument('--adaptive', action='store_true',
+                       help='Подбирать число одновременных DNS-запросов по задержкам и '
+                            'таймаутам; --workers или --max-outstanding задают предел')
+    parser.add_argument('--target-latency', type=float, default=200,
+                       help='Задержка ответа DNS в мс, до которой --adaptive '
+                            'увеличивает параллельность')
+    parser.add_argument('--rotate', action='store_true',
+                       help='Распределять запросы по всем DNS-серверам по очереди')
+    parser.add_argument('--cache-db',
+                       help='Файл SQLite для хранения вердиктов между запусками')
+    parser.add_argument('--cache-ttl', type=int, default=86400,
+                       help='Время жизни вердикта в --cache-db в секундах')
+    parser.add_argument('--cache-purge', action='store_true',
+                       help='Удалить устаревшие вердикты из --cache-db и сжать базу')
+    parser.add_argument('-p', '--processes', type=int, default=1,
+                       help='Количество процессов для проверки файла')
+    parser.add_argument('--domain-index', action='append',
+                       help='Файл со списком доменов "домен [valid|disposable|blocked]", '
+                            'проверяемых без DNS (можно указать несколько раз)')
+    parser.add_argument('--checkpoint',
+                       help='Файл контрольной точки: позиция в файле и промежуточные итоги')
+    parser.add_argument('--checkpoint-every', type=int, default=10000,
+                       help='Сохранять контрольную точку каждые N адресов')
+    parser.add_argument('--resume', action='store_true',
+                       help='Продолжить прерванную проверку с контрольной точки')
+    parser.add_argument('--only-expired', action='store_true',
+                       help='Проверять только адреса, вердикт домена которых в --cache-db '
+                            'отсутствует или устарел')
+    parser.add_argument('--smtp', action='store_true',
+                       help='Проверять существование ящика на MX-сервере (RCPT TO)')
+    parser.add_argument('--smtp-from', default='',
+                       help='Адрес отправителя для MAIL FROM (по умолчанию пустой <>)')
+    parser.add_argument('--smtp-helo', help='Имя хоста для EHLO (по умолчанию FQDN)')
+    parser.add_argument('--smtp-timeout', type=float, default=10,
+                       help='Таймаут SMTP-соединения в секундах')
+    parser.add_argument('--smtp-per-host', type=int, default=2,
+                       help='Одновременных SMTP-сессий на один MX-хост')
+    parser.add_argument('--mx-hosts', action='store_true',
+                       help='Разрешать адреса MX-хостов (общий кэш по хостам) и '
+                            'группировать итоги по почтовым провайдерам')
+    parser.add_argument('--stats', action='store_true',
+                       help='Показать время по этапам проверки и самые медленные домены')
+    parser.add_argument('--metrics-file',
+                       help='Сохранить метрики в текстовом формате Prometheus')
+    parser.add_argument('--telegram', action='store_true',
+                       help='Отправить итоги в Telegram (секция [telegram] из --config)')
     
     args = parser.parse_args()
     
+    store = None
+    if args.cache_db:
+        store = VerdictStore(args.cache_db, ttl=args.cache_ttl)
+    
+    if args.cache_purge:
+        if store is None:
+            parser.error("--cache-purge требует указать --cache-db")
+        with store:
+            removed = store.purge()
+            store.compact()
+            print(f"Удалено устаревших вердиктов: {removed}, осталось: {store.count()}")
+        return None
+    
+    if args.only_expired and store is None:
+        parser.error("--only-expired требует указать --cache-db")
+    if args.resume and not args.checkpoint:
+        parser.error("--resume требует указать --checkpoint")
+    if args.checkpoint and (args.email or args.processes > 1):
+        parser.error("--checkpoint поддерживается только для --file без --processes")
+    
+    checkpoint = None
+    state = None
+    if args.checkpoint:
+        checkpoint = Checkpoint(args.checkpoint, args.checkpoint_every)
+        if args.resume:
+            try:
+                state = checkpoint.load()
+            except ValueError as e:
+                parser.error(str(e))
+            if state is not None and state['file'] != os.path.abspath(args.file):
+                parser.error(f"контрольная точка относится к файлу {state['file']}")
+    
+    dns_settings = dns_settings_from_args(args)
+    resolver = make_resolver(**dns_settings) if dns_settings else None
+    engine_options = None
+    engine = None
+    batch_size = 1000
+    if args.engine == 'udp':
+        engine_options = {'sockets': args.udp_sockets,
+                          'max_outstanding': args.max_outstanding}
+        # Пакет больше окна запросов, чтобы движок не простаивал на стыке пакетов
+        batch_size = max(batch_size, args.max_outstanding * 10)
+    controller = None
+    if args.adaptive:
+        maximum = args.max_outstanding if engine_options else args.workers
+        controller = AIMDController(initial=min(10, maximum), maximum=maximum,
+                                    target_latency=args.target_latency / 1000)
+    
+    index = None
+    if args.domain_index:
+        try:
+            index = DomainIndex.from_files(args.domain_index)
+        except (OSError, ValueError) as e:
+            parser.error(f"не удалось загрузить индекс доменов: {e}")
+    
     print("=== ПРОВЕРКА MX-ЗАПИСЕЙ EMAIL АДРЕСОВ ===")
     print("=" * 50)
     
-    valid_count = 0
-    total_count = 0
-    results = []
+    summary = RunSummary()
+    cache = DomainCache(verdict_store=store)
+    stats = None
+    start = 0
+    if state is not None:
+        start = state['position']
+        summary = RunSummary.from_dict(state['summary'])
+        print(f"Продолжение с позиции {start}")
     
     if args.email:
         emails = [args.email]
     else:
-        emails = process_file(args.file)
+        emails = iter_emails(args.file)
     
-    for email in emails:
-        result = check_email(email)
-        if result:
-            print(result)
-            results.append(result)
-            total_count += 1
-            if "✅" in result:
-                valid_count += 1
+    # Позиции во входном файле для адресов, переданных на проверку
+    positions = deque()
+    fresh = {}
+    
+    def is_fresh(email):
+        """Есть ли у домена адреса действующий вердикт в базе"""
+        domain = validate_syntax(email)
+        if domain is None:
+            return True
+        key = normalize_domain(domain)
+        if key not in fresh:
+            fresh[key] = store.get(key) is not None
+        return fresh[key]
+    
+    def pending_emails():
+        for position, email in enumerate(islice(emails, start, None), start):
+            if args.only_expired and is_fresh(email):
+                continue
+            positions.append(position)
+            yield email
+    
+    # Импорт здесь: модуль writers сам зависит от check_email
+    from src.writers import FIELDS, PROVIDER_FIELDS, make_writer, stats_path, write_stats
+    
+    # Результаты пишутся в файл сразу, не накапливаясь в памяти
+    output = open_output(args.output, state['output_size'] if state else None)
+    writer = None
+    if output:
+        writer = make_writer(args.format, output, header=not state or not state['output_size'],
+                             fields=PROVIDER_FIELDS if args.mx_hosts else FIELDS)
+    metrics = Metrics() if args.stats or args.metrics_file else None
+    smtp_options = None
+    smtp = None
+    if args.smtp:
+        smtp_options = {'helo': args.smtp_helo, 'mail_from': args.smtp_from,
+                        'timeout': args.smtp_timeout, 'max_per_host': args.smtp_per_host}
+        # Импорт здесь: модуль smtp_check сам зависит от check_email
+        from src.smtp_check import SMTPVerifier
+        smtp = SMTPVerifier(**smtp_options)
+    mx_resolver = None
+    # В многопроцессном режиме у каждого процесса свой MXHostResolver
+    if args.mx_hosts and (args.processes <= 1 or args.email):
+        # Импорт здесь: модуль mx_hosts сам зависит от check_email
+        from src.mx_hosts import MXHostResolver
+        mx_resolver = MXHostResolver(resolver, args.timeout, workers=args.workers)
+    started = time.perf_counter()
+    done = start
+    completed = False
+    
+    def save_checkpoint():
+        if output:
+            output.flush()
+        checkpoint.save({
+            'file': os.path.abspath(args.file),
+            'position': done,
+            'output_size': output.tell() if output else 0,
+            'summary': summary.to_dict(),
+        })
+    
+    def emit(result):
+        output_started = time.perf_counter()
+        print(format_result(result))
+        if writer:
+            writer.write(result)
+        observe(metrics, 'output', output_started)
+    
+    try:
+        if args.processes > 1 and not args.email:
+            if not os.path.isfile(args.file):
+                print(f"Ошибка: файл {args.file} не найден")
+            else:
+                # Импорт здесь: модуль sharding сам зависит от check_email
+                from src.sharding import run_sharded
+                summary, stats = run_sharded(
+                    args.file, args.processes, emit, args.workers, args.timeout,
+                    args.cache_db, args.cache_ttl, dns_settings=dns_settings,
+                    domain_index=args.domain_index, metrics=metrics,
+                    smtp_options=smtp_options, engine_options=engine_options,
+                    controller=controller, mx_hosts=args.mx_hosts)
+        else:
+            if engine_options is not None:
+                engine = engine_from_settings(dns_settings, controller=controller,
+                                              **engine_options)
+            for result in validate_many(pending_emails(), args.workers, args.timeout,
+                                        cache, batch_size, resolver, index,
+                                        timed=writer is not None, metrics=metrics,
+                                        smtp=smtp, engine=engine, controller=controller,
+                                        mx_resolver=mx_resolver):
+                position = positions.popleft()
+                if result is not None:
+                    emit(result)
+                    summary.add(result)
+                done = position + 1
+                if checkpoint and done % checkpoint.every == 0:
+                    save_checkpoint()
+        
+        if writer:
+            writer.write_summary(summary)
+        completed = True
+    finally:
+        if checkpoint:
+            if completed:
+                checkpoint.remove()
+            else:
+                # Прерванный запуск можно продолжить с --resume
+                save_checkpoint()
+                print(f"\nПроверка прервана, контрольная точка: {args.checkpoint}")
+        if output:
+            output.close()
+        if smtp is not None:
+            smtp.close()
+        if mx_resolver is not None:
+            mx_resolver.close()
+        if engine is not None:
+            engine.close()
+        if store is not None:
+            store.close()
     
     print("=" * 50)
-    print(f"Всего проверено: {total_count}")
-    print(f"Валидных: {valid_count}")
-    print(f"Невалидных: {total_count - valid_count}")
+    for line in summary.lines():
+        print(line)
+    if stats is None:
+        stats = cache.stats()
+    print(f"Кэш DNS: попаданий {stats['hits']}, промахов {stats['misses']}")
+    if store is not None:
+        print(f"Из базы {args.cache_db}: {stats['store_hits']}")
+    if controller is not None:
+        print(controller.summary_line())
+    if mx_resolver is not None:
+        host_stats = mx_resolver.stats()
+        print(f"Кэш адресов MX-хостов: хостов {host_stats['size']}, "
+              f"попаданий {host_stats['hits']}, промахов {host_stats['misses']}")
+    if args.stats:
+        for line in metrics.report_lines():
+            print(line)
+    if args.metrics_file:
+        metrics.write_prometheus(args.metrics_file)
+        print(f"Метрики сохранены в файл: {args.metrics_file}")
     
-    # Сохранение в файл если указано
-    if args.output:
-        try:
-            with open(args.output, 'w', encoding='utf-8') as f:
-                f.write("\n".join(results))
-                f.write(f"\n\nВсего проверено: {total_count}")
-                f.write(f"\nВалидных: {valid_count}")
-                f.write(f"\nНевалидных: {total_count - valid_count}")
-            print(f"\nРезультаты сохранены в файл: {args.output}")
-        except Exception as e:
-            print(f"Ошибка сохранения файла: {e}")
+    if output:
+        print(f"\nРезультаты сохранены в файл: {args.output}")
+        if args.format != 'text':
+            record = summary.stats_record()
+            record['cache'] = stats
+            if controller is not None:
+                record['concurrency'] = controller.stats()
+            record['elapsed_s'] = round(time.perf_counter() - started, 3)
+            write_stats(stats_path(args.output), record)
+            print(f"Статистика сохранена в файл: {stats_path(args.output)}")
+    
+    if args.telegram:
+        # Сообщение уходит в фоне, очередь дожидается доставки при выходе
+        report = "\n".join(["📊 ИТОГИ ПРОВЕРКИ EMAIL"] + summary.lines())
+        send_to_telegram_async(report, args.config)
     
-    return results
+    return summary
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,45 @@
+﻿#!/usr/bin/env python3
+"""
+Контрольные точки длительной проверки файла для продолжения после прерывания
+"""
+
+import json
+import os
+
+
+class Checkpoint:
+    """JSON-файл с позицией во входном файле и промежуточной сводкой
+
+    Запись атомарна (временный файл + os.replace), поэтому прерывание
+    в момент сохранения оставляет предыдущую контрольную точку целой.
+    """
+
+    def __init__(self, path, every=10000):
+        self.path = path
+        self.every = every
+
+    def load(self):
+        """Возвращает сохранённое состояние или None, если файла нет"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            raise ValueError(f"Повреждён файл контрольной точки {self.path}: {e}")
+
+    def save(self, state):
+        """Сохраняет состояние, заменяя предыдущее"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        """Удаляет контрольную точку после успешного завершения"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
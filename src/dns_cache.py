@@ -0,0 +1,112 @@
+﻿#!/usr/bin/env python3
+"""
+Кэш результатов DNS-запросов по доменам
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_domain(domain):
+    """Приводит имя домена к виду, используемому как ключ кэша"""
+    return domain.strip().rstrip('.').lower()
+
+
+class DomainCache:
+    """LRU-кэш MX-ответов по доменам с учётом TTL
+
+    Хранит как положительные ответы (список MX-хостов), так и отрицательные
+    (NXDOMAIN, NoAnswer). Безопасен для использования из нескольких потоков.
+    verdict_store - необязательное постоянное хранилище (VerdictStore), которое
+    опрашивается при промахе и дополняется при каждой записи.
+    """
+
+    def __init__(self, maxsize=10000, default_ttl=3600, negative_ttl=300,
+                 min_ttl=60, max_ttl=86400, clock=time.monotonic, verdict_store=None):
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.verdict_store = verdict_store
+        self.hits = 0
+        self.misses = 0
+        self.store_hits = 0
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def lookup(self, domain):
+        """Возвращает запись (hosts, error) для домена или None, если её нет или она устарела"""
+        key = normalize_domain(domain)
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires, entry = item
+                if expires > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                del self._data[key]
+            if self.verdict_store is None:
+                self.misses += 1
+                return None
+
+        stored = self.verdict_store.get(key)
+        with self._lock:
+            if stored is None:
+                self.misses += 1
+                return None
+            hosts, error, ttl = stored
+            self.hits += 1
+            self.store_hits += 1
+            self._put(key, (hosts, error), min(ttl, self.max_ttl))
+            return hosts, error
+
+    def store(self, domain, hosts=None, error=None, ttl=None):
+        """Сохраняет результат для домена
+
+        hosts - список MX-хостов для положительного ответа,
+        error - класс исключения (NXDOMAIN, NoAnswer) для отрицательного.
+        """
+        if ttl is None:
+            ttl = self.negative_ttl if error is not None else self.default_ttl
+        else:
+            ttl = max(self.min_ttl, min(ttl, self.max_ttl))
+
+        key = normalize_domain(domain)
+        with self._lock:
+            self._put(key, (hosts, error), ttl)
+        if self.verdict_store is not None:
+            self.verdict_store.put(key, hosts, error)
+
+    def _put(self, key, entry, ttl):
+        self._data[key] = (self._clock() + ttl, entry)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        """Очищает кэш и счётчики"""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.store_hits = 0
+
+    def stats(self):
+        """Возвращает счётчики попаданий и промахов"""
+        with self._lock:
+            stats = {
+                'size': len(self._data),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+            if self.verdict_store is not None:
+                stats['store_hits'] = self.store_hits
+            return stats
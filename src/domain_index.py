@@ -0,0 +1,74 @@
+﻿#!/usr/bin/env python3
+"""
+Индекс известных доменов: одноразовые, заблокированные и заведомо валидные
+"""
+
+from src.dns_cache import normalize_domain
+
+# Допустимые вердикты в файле индекса
+VERDICTS = ('valid', 'disposable', 'blocked')
+
+
+class DomainIndex:
+    """Словарь домен -> вердикт с поиском по родительским доменам
+
+    Запись для example.com действует и на mail.example.com; если заданы
+    обе, побеждает более точная. Проверка стоит не больше нескольких
+    обращений к словарю на адрес.
+    """
+
+    def __init__(self):
+        self._verdicts = {}
+
+    def __len__(self):
+        return len(self._verdicts)
+
+    def add(self, domain, verdict):
+        """Добавляет домен с вердиктом из VERDICTS"""
+        if verdict not in VERDICTS:
+            raise ValueError(f"Неизвестный вердикт '{verdict}' для домена {domain}")
+        self._verdicts[normalize_domain(domain)] = verdict
+
+    def match(self, domain):
+        """Возвращает вердикт для домена или его родителя, либо None"""
+        key = normalize_domain(domain)
+        verdicts = self._verdicts
+        while True:
+            verdict = verdicts.get(key)
+            if verdict is not None:
+                return verdict
+            dot = key.find('.')
+            if dot < 0:
+                return None
+            key = key[dot + 1:]
+
+    def load(self, filename, default='blocked'):
+        """Загружает записи из файла и возвращает их количество
+
+        Формат строки: "домен [вердикт]", строки с # - комментарии.
+        Для строк без вердикта используется default.
+        """
+        count = 0
+        with open(filename, 'r', encoding='utf-8-sig') as f:
+            for number, line in enumerate(f, 1):
+                line = line.split('#', 1)[0].strip()
+                if not line:
+                    continue
+                parts = line.split()
+                if len(parts) > 2:
+                    raise ValueError(f"{filename}:{number}: ожидается 'домен [вердикт]'")
+                verdict = parts[1].lower() if len(parts) == 2 else default
+                try:
+                    self.add(parts[0], verdict)
+                except ValueError as e:
+                    raise ValueError(f"{filename}:{number}: {e}")
+                count += 1
+        return count
+
+    @classmethod
+    def from_files(cls, filenames, default='blocked'):
+        """Создаёт индекс из нескольких файлов"""
+        index = cls()
+        for filename in filenames:
+            index.load(filename, default)
+        return index
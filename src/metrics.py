@@ -0,0 +1,192 @@
+﻿#!/usr/bin/env python3
+"""
+Замеры времени по этапам проверки и экспорт метрик (отчёт, Prometheus)
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Границы корзин гистограмм в секундах
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Этапы проверки в порядке прохождения адреса
+STAGES = ('syntax', 'resolve', 'classify', 'output')
+
+# Домены сверх лимита учитываются под этим именем
+OTHER_DOMAINS = '_other'
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами, как в Prometheus"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """Оценка квантиля сверху: граница корзины, где он находится"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def cumulative(self):
+        """Пары (граница, накопленное количество), последняя граница +Inf"""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+class Metrics:
+    """Сборщик времени этапов и задержек разрешения по доменам
+
+    Потокобезопасен: этапы могут замеряться из потоков validate_many.
+    Обработчики, добавленные через add_hook, вызываются при каждом замере
+    с аргументами (stage, seconds, domain) - так можно подключить
+    собственную систему метрик.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, max_domains=1000):
+        self.buckets = buckets
+        self.max_domains = max_domains
+        self.stages = {}
+        self.domains = {}
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Для передачи между процессами: без блокировки и обработчиков
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_hooks'] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        """Подписывает hook(stage, seconds, domain) на все замеры"""
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def observe(self, stage, seconds, domain=None):
+        """Учитывает длительность этапа; для resolve - и по домену"""
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            if domain is not None:
+                key = domain
+                if key not in self.domains and len(self.domains) >= self.max_domains:
+                    key = OTHER_DOMAINS
+                histogram = self.domains.get(key)
+                if histogram is None:
+                    histogram = self.domains[key] = Histogram(self.buckets)
+                histogram.observe(seconds)
+        for hook in self._hooks:
+            hook(stage, seconds, domain)
+
+    @contextmanager
+    def timer(self, stage, domain=None):
+        """Замеряет время блока with как этап stage"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, domain)
+
+    def merge(self, other):
+        """Добавляет замеры другого сборщика (например, другого процесса)"""
+        with self._lock:
+            for target, source in ((self.stages, other.stages), (self.domains, other.domains)):
+                for name, histogram in source.items():
+                    if name in target:
+                        target[name].merge(histogram)
+                    else:
+                        copy = target[name] = Histogram(histogram.buckets)
+                        copy.merge(histogram)
+
+    def report_lines(self, top=10):
+        """Строки отчёта --stats: этапы и самые медленные домены"""
+        lines = ["Время по этапам:"]
+        names = [name for name in STAGES if name in self.stages]
+        names += sorted(name for name in self.stages if name not in STAGES)
+        for name in names:
+            h = self.stages[name]
+            average = h.sum / h.count * 1000 if h.count else 0.0
+            lines.append(
+                f"  {name:<9} вызовов {h.count:>8}, всего {h.sum:8.3f} с, "
+                f"среднее {average:8.3f} мс, p50 ≤ {h.quantile(0.5) * 1000:.3f} мс, "
+                f"p99 ≤ {h.quantile(0.99) * 1000:.3f} мс")
+        slowest = sorted(self.domains.items(), key=lambda item: item[1].max, reverse=True)
+        if slowest:
+            lines.append("Самые медленные домены:")
+            for domain, h in slowest[:top]:
+                lines.append(f"  {domain}: макс. {h.max * 1000:.1f} мс, запросов {h.count}")
+        return lines
+
+    def prometheus_text(self, prefix='email_validator'):
+        """Метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric, label, source, help_text in (
+                (f"{prefix}_stage_seconds", 'stage', self.stages,
+                 "Время этапов проверки адреса"),
+                (f"{prefix}_domain_resolve_seconds", 'domain', self.domains,
+                 "Время разрешения MX по доменам")):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            with self._lock:
+                items = sorted((name, list(h.cumulative()), h.sum, h.count)
+                               for name, h in source.items())
+            for name, pairs, total, count in items:
+                value = _label_value(name)
+                for bound, cumulative in pairs:
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{metric}_bucket{{{label}="{value}",le="{le}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{{label}="{value}"}} {total!r}')
+                lines.append(f'{metric}_count{{{label}="{value}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Атомарно записывает prometheus_text() в файл (textfile collector)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,151 @@
+﻿#!/usr/bin/env python3
+"""
+Адреса MX-хостов с общим кэшем и определение почтового провайдера домена
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import dns.resolver
+
+from src.check_email import Status, map_ordered
+from src.dns_cache import DomainCache, normalize_domain
+from src.resolver import NO_ADDRESS_ERRORS
+from src.singleflight import SingleFlight
+
+# Провайдеры и суффиксы имён их MX-хостов
+PROVIDERS = (
+    ('google', ('google.com', 'googlemail.com', 'smtp.goog')),
+    ('microsoft', ('outlook.com', 'hotmail.com')),
+    ('yandex', ('yandex.net', 'yandex.ru')),
+    ('mailru', ('mail.ru',)),
+    ('yahoo', ('yahoodns.net',)),
+    ('zoho', ('zoho.com', 'zoho.eu', 'zoho.in', 'zohomail.com')),
+    ('icloud', ('icloud.com',)),
+    ('protonmail', ('protonmail.ch',)),
+    ('fastmail', ('messagingengine.com',)),
+    ('gmx', ('gmx.net', 'web.de')),
+    ('mimecast', ('mimecast.com',)),
+    ('proofpoint', ('pphosted.com', 'ppe-hosted.com')),
+)
+
+# Провайдер доменов, MX которых не подошёл ни под один шаблон
+OTHER_PROVIDER = 'other'
+
+# Статусы, для которых известны рабочие MX-хосты
+CHECKED_STATUSES = (Status.VALID, Status.IMPLICIT_MX)
+
+# Суффикс имени хоста -> провайдер
+SUFFIXES = {suffix: name for name, suffixes in PROVIDERS for suffix in suffixes}
+
+
+def provider_of(hosts):
+    """Возвращает провайдера по MX-хостам (первый узнанный в порядке приоритета)"""
+    for host in hosts:
+        labels = normalize_domain(host).split('.')
+        # Сравниваем по границам меток: mx.evilgoogle.com не google.com
+        for start in range(len(labels) - 1):
+            name = SUFFIXES.get('.'.join(labels[start:]))
+            if name is not None:
+                return name
+    return OTHER_PROVIDER
+
+
+class MXHostResolver:
+    """Разрешает MX-хосты в адреса и помечает результаты провайдером
+
+    Адреса хранятся в кэше по имени хоста, общем для всех доменов: тысячи
+    доменов на aspmx.l.google.com дают один запрос A и один AAAA за TTL.
+    Если ни один MX-хост домена не имеет адреса, результат получает статус
+    MX_UNRESOLVED; при ошибках запросов (таймаут и т.п.) статус не меняется.
+    Запросы AAAA идут в собственном пуле из workers потоков, который
+    создаётся при первом запросе и закрывается close().
+    """
+
+    def __init__(self, resolver=None, timeout=None, cache=None, workers=10):
+        self.resolver = resolver
+        self.timeout = timeout
+        self.cache = cache if cache is not None else DomainCache()
+        self.workers = max(1, workers)
+        self._inflight = SingleFlight()
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix='mx-hosts')
+            return self._pool
+
+    def addresses(self, host):
+        """Возвращает кортеж адресов хоста; без адресов - NoAnswer из кэша"""
+        entry = self.cache.lookup(host)
+        if entry is not None:
+            addresses, error = entry
+            if error is not None:
+                raise error()
+            return addresses
+        return self._inflight.do(normalize_domain(host), self._query, host)
+
+    def _query(self, host):
+        """Запрашивает A и AAAA хоста одновременно и сохраняет ответ в кэше"""
+        resolve = dns.resolver.resolve if self.resolver is None else self.resolver.resolve
+        kwargs = {'lifetime': self.timeout} if self.timeout else {}
+        aaaa = self._executor().submit(resolve, host, 'AAAA', **kwargs)
+        outcomes = []
+        try:
+            outcomes.append(resolve(host, 'A', **kwargs))
+        except Exception as e:
+            outcomes.append(e)
+        try:
+            outcomes.append(aaaa.result())
+        except Exception as e:
+            outcomes.append(e)
+
+        answers = [outcome for outcome in outcomes if not isinstance(outcome, Exception)]
+        if not answers:
+            for outcome in outcomes:
+                if not isinstance(outcome, NO_ADDRESS_ERRORS):
+                    raise outcome
+            self.cache.store(host, error=dns.resolver.NoAnswer)
+            raise dns.resolver.NoAnswer()
+        addresses = tuple(record.to_text() for answer in answers for record in answer)
+        ttls = [answer.rrset.ttl for answer in answers
+                if isinstance(getattr(getattr(answer, 'rrset', None), 'ttl', None), int)]
+        self.cache.store(host, hosts=addresses, ttl=min(ttls) if ttls else None)
+        return addresses
+
+    def apply(self, result):
+        """Добавляет провайдера к EmailResult и проверяет адреса его MX-хостов"""
+        if result.status not in CHECKED_STATUSES or not result.mx_hosts:
+            return result
+        result = result._replace(provider=provider_of(result.mx_hosts))
+        unresolved = 0
+        for host in result.mx_hosts:
+            try:
+                if self.addresses(host):
+                    return result
+            except NO_ADDRESS_ERRORS:
+                unresolved += 1
+            except Exception:
+                # Таймаут и т.п. не доказывает отсутствие адресов
+                pass
+        if unresolved == len(result.mx_hosts):
+            return result._replace(status=Status.MX_UNRESOLVED)
+        return result
+
+    def apply_results(self, results, concurrency=10):
+        """Применяет apply к потоку EmailResult, сохраняя порядок"""
+        return map_ordered(self.apply, results, concurrency)
+
+    def stats(self):
+        """Счётчики кэша адресов хостов"""
+        return self.cache.stats()
+
+    def close(self):
+        """Останавливает пул запросов AAAA"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,115 @@
+﻿#!/usr/bin/env python3
+"""
+Настройка DNS-резолвера: таймауты, повторы и пул серверов имён
+"""
+
+import configparser
+
+import dns.asyncresolver
+import dns.exception
+import dns.name
+import dns.resolver
+
+
+class NullMX(dns.exception.DNSException):
+    """Домен не принимает почту (null MX "0 .", RFC 7505)"""
+
+
+class ImplicitMX(dns.exception.DNSException):
+    """MX-записей нет, почта принимается на A/AAAA самого домена (RFC 5321, 5.1)"""
+
+
+# Ответы A/AAAA, после которых адресов у домена точно нет
+NO_ADDRESS_ERRORS = (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN)
+
+
+def is_null_mx(answer):
+    """Состоит ли ответ MX только из записей с пустым сервером "." """
+    try:
+        exchanges = [record.exchange for record in answer.rrset]
+    except (TypeError, AttributeError):
+        return False
+    return bool(exchanges) and all(exchange == dns.name.root for exchange in exchanges)
+
+
+def implicit_mx_error(outcomes):
+    """Вердикт по ответам A/AAAA домена без MX-записей
+
+    outcomes - ответы или исключения запросов A и AAAA (можно не все).
+    Возвращает ImplicitMX, если есть хотя бы один адрес, исключение
+    неудавшегося запроса, если отсутствие адресов не подтверждено, иначе None.
+    """
+    failure = None
+    for outcome in outcomes:
+        if not isinstance(outcome, Exception):
+            return ImplicitMX()
+        if failure is None and not isinstance(outcome, NO_ADDRESS_ERRORS):
+            failure = outcome
+    return failure
+
+
+def parse_nameservers(value):
+    """Разбирает список серверов имён, разделённых запятыми или пробелами"""
+    if not value:
+        return []
+    return [server for server in value.replace(',', ' ').split() if server]
+
+
+def load_dns_settings(config_file='config.ini'):
+    """Читает настройки DNS из секции [email] файла конфигурации
+
+    Поддерживаемые ключи: timeout (время на весь запрос), server_timeout
+    (ожидание ответа одного сервера), nameservers, rotate. Отсутствующий
+    файл или секция дают пустой словарь.
+    """
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    if 'email' not in config:
+        return {}
+
+    section = config['email']
+    settings = {}
+    if section.get('timeout'):
+        settings['lifetime'] = section.getfloat('timeout')
+    if section.get('server_timeout'):
+        settings['timeout'] = section.getfloat('server_timeout')
+    if section.get('nameservers'):
+        settings['nameservers'] = parse_nameservers(section.get('nameservers'))
+    if section.get('rotate'):
+        settings['rotate'] = section.getboolean('rotate')
+    return settings
+
+
+def _configure(resolver, nameservers=None, timeout=None, lifetime=None, rotate=False,
+               port=None):
+    if nameservers:
+        resolver.nameservers = list(nameservers)
+    if port:
+        resolver.port = port
+    if timeout is not None:
+        resolver.timeout = timeout
+    if lifetime is not None:
+        resolver.lifetime = lifetime
+    # rotate - распределять запросы по серверам; без него следующий
+    # сервер используется только при отказе предыдущего
+    resolver.rotate = rotate
+    resolver.retry_servfail = True
+    return resolver
+
+
+def make_resolver(nameservers=None, timeout=None, lifetime=None, rotate=False, port=None):
+    """Создаёт резолвер для многократного использования в проверках
+
+    nameservers - список серверов (по умолчанию из системных настроек),
+    timeout - ожидание ответа одного сервера, lifetime - общее время на запрос
+    со всеми повторами и переключениями между серверами.
+    """
+    resolver = dns.resolver.Resolver(configure=not nameservers)
+    return _configure(resolver, nameservers, timeout, lifetime, rotate, port)
+
+
+def make_async_resolver(nameservers=None, timeout=None, lifetime=None, rotate=False,
+                        port=None):
+    """Асинхронный аналог make_resolver для dns.asyncresolver"""
+    resolver = dns.asyncresolver.Resolver(configure=not nameservers)
+    return _configure(resolver, nameservers, timeout, lifetime, rotate, port)
@@ -0,0 +1,245 @@
+﻿#!/usr/bin/env python3
+"""
+HTTP-сервис проверки адресов (email-validator serve) с общим кэшем и резолвером
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# При запуске как скрипта (python src/server.py) пакет src не виден
+if not __package__:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.check_email import (
+    dns_settings_from_args, result_record, validate_many,
+)
+from src.dns_cache import DomainCache
+from src.domain_index import DomainIndex
+from src.metrics import Metrics
+from src.resolver import make_resolver
+from src.verdict_store import VerdictStore
+
+
+class ServiceBusy(Exception):
+    """Все слоты обработки заняты дольше допустимого ожидания"""
+
+
+class ValidationService:
+    """Состояние сервиса, общее для всех запросов: кэш, резолвер, метрики
+
+    Одновременно обрабатывается не более max_requests запросов; запрос,
+    не получивший слот за queue_timeout секунд, отклоняется.
+    """
+
+    def __init__(self, cache=None, resolver=None, index=None, timeout=None, workers=10,
+                 max_batch=1000, max_requests=8, queue_timeout=5.0, metrics=None):
+        self.cache = cache if cache is not None else DomainCache()
+        self.resolver = resolver
+        self.index = index
+        self.timeout = timeout
+        self.workers = workers
+        self.max_batch = max_batch
+        self.queue_timeout = queue_timeout
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.started = time.monotonic()
+        self.requests = 0
+        self.addresses = 0
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(max_requests)
+        self._lock = threading.Lock()
+
+    def validate(self, emails):
+        """Проверяет адреса и возвращает список записей result_record"""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise ServiceBusy("Сервер перегружен, повторите запрос позже")
+        try:
+            results = validate_many(emails, self.workers, self.timeout, self.cache,
+                                    resolver=self.resolver, index=self.index, timed=True,
+                                    metrics=self.metrics)
+            records = [result_record(result) if result is not None else None
+                       for result in results]
+        finally:
+            self._slots.release()
+        with self._lock:
+            self.requests += 1
+            self.addresses += len(records)
+        return records
+
+    def health(self):
+        with self._lock:
+            counters = {'requests': self.requests, 'addresses': self.addresses,
+                        'rejected': self.rejected}
+        return {
+            'status': 'ok',
+            'uptime_s': round(time.monotonic() - self.started, 3),
+            'cache': self.cache.stats(),
+            **counters,
+        }
+
+    def metrics_text(self):
+        """Метрики Prometheus: этапы проверки и счётчики сервиса"""
+        health = self.health()
+        lines = [self.metrics.prometheus_text().rstrip("\n")]
+        for name, value in (('requests_total', health['requests']),
+                            ('addresses_total', health['addresses']),
+                            ('rejected_total', health['rejected']),
+                            ('cache_hits_total', health['cache']['hits']),
+                            ('cache_misses_total', health['cache']['misses'])):
+            lines.append(f"# TYPE email_validator_{name} counter")
+            lines.append(f"email_validator_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """POST /validate, GET /health, GET /metrics"""
+
+    server_version = "email-validator"
+    # Ограничение на размер тела запроса, байт
+    max_body = 10 * 1024 * 1024
+    verbose = False
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type='application/json; charset=utf-8'):
+        if not isinstance(body, bytes):
+            body = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send(status, {'error': message})
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == '/health':
+            self._send(200, service.health())
+        elif self.path == '/metrics':
+            self._send(200, service.metrics_text().encode('utf-8'),
+                       'text/plain; version=0.0.4; charset=utf-8')
+        else:
+            self._error(404, "Неизвестный адрес")
+
+    def do_POST(self):
+        service = self.server.service
+        if self.path != '/validate':
+            self._error(404, "Неизвестный адрес")
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > self.max_body:
+            self._error(413, "Слишком большой запрос")
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b'null')
+        except ValueError:
+            self._error(400, "Тело запроса должно быть JSON")
+            return
+
+        # {"email": "..."} - один адрес, {"emails": [...]} - пакет
+        single = isinstance(payload, dict) and isinstance(payload.get('email'), str)
+        if single:
+            emails = [payload['email']]
+        elif isinstance(payload, dict) and isinstance(payload.get('emails'), list):
+            emails = payload['emails']
+            if not all(isinstance(email, str) for email in emails):
+                self._error(400, "emails должен быть списком строк")
+                return
+        else:
+            self._error(400, 'Ожидается {"email": "..."} или {"emails": [...]}')
+            return
+        if len(emails) > service.max_batch:
+            self._error(413, f"Не более {service.max_batch} адресов в запросе")
+            return
+
+        try:
+            records = service.validate(emails)
+        except ServiceBusy as e:
+            self._error(503, str(e))
+            return
+        if single:
+            self._send(200, {'result': records[0]})
+        else:
+            self._send(200, {'results': records, 'count': len(records)})
+
+
+def make_server(service, host='127.0.0.1', port=8025, verbose=False):
+    """Создаёт ThreadingHTTPServer, обслуживающий service"""
+    handler = type('Handler', (RequestHandler,), {'verbose': verbose})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='email-validator serve',
+                                     description='HTTP-сервис проверки email адресов')
+    parser.add_argument('--host', default='127.0.0.1', help='Адрес для прослушивания')
+    parser.add_argument('--port', type=int, default=8025, help='Порт')
+    parser.add_argument('-w', '--workers', type=int, default=10,
+                       help='Параллельных DNS-запросов на один запрос')
+    parser.add_argument('--max-requests', type=int, default=8,
+                       help='Одновременно обрабатываемых запросов')
+    parser.add_argument('--max-batch', type=int, default=1000,
+                       help='Максимум адресов в одном запросе')
+    parser.add_argument('-t', '--timeout', type=float,
+                       help='Таймаут одного DNS-запроса в секундах')
+    parser.add_argument('-c', '--config', default='config.ini',
+                       help='Файл конфигурации с секцией [email]')
+    parser.add_argument('--nameservers',
+                       help='DNS-серверы через запятую (вместо системных)')
+    parser.add_argument('--server-timeout', type=float,
+                       help='Ожидание ответа одного DNS-сервера')
+    parser.add_argument('--rotate', action='store_true',
+                       help='Распределять запросы по всем DNS-серверам по очереди')
+    parser.add_argument('--cache-db', help='Файл SQLite с вердиктами между запусками')
+    parser.add_argument('--cache-ttl', type=int, default=86400,
+                       help='Время жизни вердикта в --cache-db в секундах')
+    parser.add_argument('--domain-index', action='append',
+                       help='Файл со списком доменов, проверяемых без DNS')
+    parser.add_argument('--verbose', action='store_true', help='Писать журнал запросов')
+    args = parser.parse_args(argv)
+
+    index = None
+    if args.domain_index:
+        try:
+            index = DomainIndex.from_files(args.domain_index)
+        except (OSError, ValueError) as e:
+            parser.error(f"не удалось загрузить индекс доменов: {e}")
+
+    dns_settings = dns_settings_from_args(args)
+    store = VerdictStore(args.cache_db, ttl=args.cache_ttl) if args.cache_db else None
+    service = ValidationService(
+        DomainCache(verdict_store=store),
+        make_resolver(**dns_settings) if dns_settings else None,
+        index, args.timeout, args.workers, args.max_batch, args.max_requests)
+    server = make_server(service, args.host, args.port, args.verbose)
+
+    host, port = server.server_address[:2]
+    print(f"Сервис проверки email запущен: http://{host}:{port}")
+    print("POST /validate, GET /health, GET /metrics; Ctrl+C для остановки")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nОстановка сервиса")
+    finally:
+        server.server_close()
+        if store is not None:
+            store.close()
+    return service
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+﻿#!/usr/bin/env python3
+"""
+Многопроцессная проверка больших файлов с разбиением по доменам
+"""
+
+import heapq
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import tempfile
+import zlib
+from collections import deque
+
+from src.check_email import (
+    RunSummary, iter_emails, result_from_record, result_record, validate_many,
+)
+from src.dns_cache import DomainCache
+from src.domain_index import DomainIndex
+from src.metrics import Metrics
+from src.mx_hosts import MXHostResolver
+from src.smtp_check import SMTPVerifier
+from src.verdict_store import VerdictStore
+from src.resolver import make_resolver
+from src.udp_engine import engine_from_settings
+from src.adaptive import AIMDController
+
+
+def shard_of(email, shards):
+    """Возвращает номер шарда для адреса по хэшу его домена
+
+    Используется дешёвый разбор (часть после последнего @), чтобы все
+    адреса одного домена попадали в один процесс и его кэш.
+    """
+    domain = email.rpartition('@')[2].strip().rstrip('.').lower()
+    return zlib.crc32(domain.encode('utf-8', 'replace')) % shards
+
+
+def _shard_worker(shard, shards, filename, out_path, events, options):
+    """Проверяет адреса своего шарда и пишет строки "индекс<TAB>JSON-запись" """
+    store = None
+    smtp = None
+    engine = None
+    mx_resolver = None
+    try:
+        if options.get('cache_db'):
+            store = VerdictStore(options['cache_db'], ttl=options.get('cache_ttl', 86400))
+        cache = DomainCache(verdict_store=store)
+        settings = options.get('dns_settings')
+        resolver = make_resolver(**settings) if settings else None
+        index_files = options.get('domain_index')
+        index = DomainIndex.from_files(index_files) if index_files else None
+        metrics = Metrics() if options.get('metrics') else None
+        if options.get('smtp'):
+            smtp = SMTPVerifier(**options['smtp'])
+        controller = None
+        if options.get('adaptive'):
+            controller = AIMDController(**options['adaptive'])
+        batch_size = 1000
+        if options.get('engine'):
+            engine = engine_from_settings(settings, controller=controller, **options['engine'])
+            batch_size = max(batch_size, engine.max_outstanding * 10)
+        summary = RunSummary()
+        indices = deque()
+        progress_every = options.get('progress_every', 10000)
+
+        def own_emails():
+            for index, email in enumerate(iter_emails(filename)):
+                if shard_of(email, shards) == shard:
+                    indices.append(index)
+                    yield email
+
+        if options.get('mx_hosts'):
+            mx_resolver = MXHostResolver(resolver, options.get('timeout'),
+                                         workers=options.get('workers', 1))
+        results = validate_many(own_emails(), options.get('workers', 1),
+                                options.get('timeout'), cache, batch_size, resolver,
+                                index, timed=True, metrics=metrics, smtp=smtp,
+                                engine=engine, controller=controller,
+                                mx_resolver=mx_resolver)
+        with open(out_path, 'w', encoding='utf-8') as out:
+            for result in results:
+                index = indices.popleft()
+                summary.add(result)
+                record = json.dumps(result_record(result), ensure_ascii=False)
+                out.write(f"{index}\t{record}\n")
+                if summary.total % progress_every == 0:
+                    events.put(('progress', shard, summary.total))
+
+        events.put(('done', shard, summary, cache.stats(), metrics,
+                    controller.stats() if controller is not None else None))
+    except Exception as e:
+        events.put(('error', shard, f"{type(e).__name__}: {e}"))
+    finally:
+        if smtp is not None:
+            smtp.close()
+        if mx_resolver is not None:
+            mx_resolver.close()
+        if engine is not None:
+            engine.close()
+        if store is not None:
+            store.close()
+
+
+def _read_shard(path):
+    """Читает файл шарда как поток пар (индекс, EmailResult)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            index, record = line.rstrip('\n').split('\t', 1)
+            yield int(index), result_from_record(json.loads(record))
+
+
+def run_sharded(filename, processes, emit, workers=1, timeout=None, cache_db=None,
+                cache_ttl=86400, progress_every=10000, start_method=None,
+                dns_settings=None, domain_index=None, metrics=None, smtp_options=None,
+                engine_options=None, controller=None, mx_hosts=False):
+    """Проверяет файл в нескольких процессах и объединяет результаты
+
+    Каждый процесс получает свою долю доменов, собственный резолвер
+    (по настройкам dns_settings для make_resolver), кэш и индекс доменов,
+    загруженный из файлов domain_index, SMTPVerifier(**smtp_options) и
+    UDPEngine (engine_from_settings с engine_options), если они заданы.
+    С controller каждый процесс подбирает параллельность своим
+    AIMDController с теми же настройками, итоги сливаются в controller.
+    mx_hosts=True включает в процессах MXHostResolver со своим кэшем хостов.
+    Замеры процессов добавляются в metrics.
+    emit вызывается для каждого EmailResult в порядке входного файла.
+    start_method - способ запуска процессов multiprocessing (по умолчанию
+    используется способ платформы). Возвращает объединённые RunSummary и счётчики кэша.
+    """
+    options = {
+        'workers': workers,
+        'timeout': timeout,
+        'cache_db': cache_db,
+        'cache_ttl': cache_ttl,
+        'progress_every': progress_every,
+        'dns_settings': dns_settings,
+        'domain_index': domain_index,
+        'metrics': metrics is not None,
+        'smtp': smtp_options,
+        'engine': engine_options,
+        'adaptive': controller.settings() if controller is not None else None,
+        'mx_hosts': mx_hosts,
+    }
+    context = multiprocessing.get_context(start_method)
+    events = context.Queue()
+    summary = RunSummary()
+    stats = {}
+
+    with tempfile.TemporaryDirectory(prefix='email-validator-') as tmp:
+        paths = [os.path.join(tmp, f"shard-{shard}.tsv") for shard in range(processes)]
+        workers_list = [
+            context.Process(target=_shard_worker,
+                            args=(shard, processes, filename, paths[shard], events, options))
+            for shard in range(processes)
+        ]
+        for process in workers_list:
+            process.start()
+
+        finished = set()
+        try:
+            while len(finished) < processes:
+                try:
+                    kind, shard, *payload = events.get(timeout=1)
+                except queue.Empty:
+                    # Процесс мог завершиться аварийно, не отправив результат
+                    for shard, process in enumerate(workers_list):
+                        if shard not in finished and process.exitcode not in (None, 0):
+                            raise RuntimeError(
+                                f"Шард {shard + 1} завершился с кодом {process.exitcode}")
+                    continue
+
+                if kind == 'progress':
+                    print(f"[шард {shard + 1}/{processes}] обработано: {payload[0]}",
+                          file=sys.stderr)
+                elif kind == 'done':
+                    shard_summary, shard_stats, shard_metrics, shard_concurrency = payload
+                    summary.merge(shard_summary)
+                    if controller is not None and shard_concurrency is not None:
+                        controller.merge(shard_concurrency)
+                    if metrics is not None and shard_metrics is not None:
+                        metrics.merge(shard_metrics)
+                    for key, value in shard_stats.items():
+                        stats[key] = stats.get(key, 0) + value
+                    finished.add(shard)
+                    print(f"[шард {shard + 1}/{processes}] готово: {shard_summary.total}",
+                          file=sys.stderr)
+                else:
+                    raise RuntimeError(f"Ошибка в шарде {shard + 1}: {payload[0]}")
+        finally:
+            for process in workers_list:
+                # При ошибке останавливаем оставшиеся процессы
+                if len(finished) < processes and process.is_alive():
+                    process.terminate()
+                process.join()
+
+        # Файлы шардов уже упорядочены по индексу, достаточно слияния
+        for _, result in heapq.merge(*(_read_shard(path) for path in paths),
+                                     key=lambda item: item[0]):
+            emit(result)
+
+    return summary, stats
@@ -0,0 +1,105 @@
+﻿#!/usr/bin/env python3
+"""
+Объединение одновременных одинаковых запросов (singleflight)
+"""
+
+import asyncio
+import threading
+
+
+class _Call:
+    """Выполняющийся вызов, результата которого ждут остальные"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Для потоков: пока вызов с ключом key выполняется, повторные вызовы
+    с тем же ключом не запускают func, а ждут и получают его результат
+    (или то же исключение)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key, func, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {'leaders': self.leaders, 'shared': self.shared,
+                    'in_flight': len(self._calls)}
+
+
+class AsyncSingleFlight:
+    """Аналог SingleFlight для корутин одного цикла событий"""
+
+    def __init__(self):
+        self._calls = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key, func, *args):
+        loop = asyncio.get_running_loop()
+        # Futures привязаны к циклу событий, поэтому он входит в ключ
+        slot = (loop, key)
+        future = self._calls.get(slot)
+        if future is not None:
+            self.shared += 1
+            # shield: отмена ожидающего не должна отменять общий запрос
+            return await asyncio.shield(future)
+
+        future = self._calls[slot] = loop.create_future()
+        self.leaders += 1
+        try:
+            result = await func(*args)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Исключение получит вызывающий; ожидающих может и не быть
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[slot]
+
+    def stats(self):
+        return {'leaders': self.leaders, 'shared': self.shared,
+                'in_flight': len(self._calls)}
@@ -0,0 +1,190 @@
+﻿#!/usr/bin/env python3
+"""
+Проверка почтовых ящиков через SMTP (EHLO / MAIL FROM / RCPT TO без отправки письма)
+"""
+
+import smtplib
+import socket
+import threading
+import uuid
+from contextlib import contextmanager
+
+from src.check_email import Status, map_ordered
+
+# Ответы RCPT TO, означающие, что адрес принят
+ACCEPTED = (250, 251)
+
+
+class _HostPool:
+    """Свободные SMTP-сессии одного MX-хоста и ограничение их числа"""
+
+    def __init__(self, limit):
+        self.slots = threading.BoundedSemaphore(limit)
+        self.idle = []
+        self.lock = threading.Lock()
+
+
+class SMTPVerifier:
+    """Проверяет существование ящиков на приоритетном MX-хосте домена
+
+    На каждый MX-хост держится не более max_per_host сессий; после проверки
+    сессия сбрасывается (RSET) и используется для следующих получателей,
+    пока не обработает max_rcpt_per_session адресов. Признак catch-all
+    (домен принимает любой адрес) определяется один раз на домен пробным
+    RCPT TO на случайный адрес и кэшируется.
+    """
+
+    def __init__(self, helo=None, mail_from='', timeout=10, port=25, max_per_host=2,
+                 max_rcpt_per_session=50, detect_catch_all=True, smtp_factory=smtplib.SMTP):
+        self.helo = helo or socket.getfqdn()
+        self.mail_from = mail_from
+        self.timeout = timeout
+        self.port = port
+        self.max_per_host = max_per_host
+        self.max_rcpt_per_session = max_rcpt_per_session
+        self.detect_catch_all = detect_catch_all
+        self._factory = smtp_factory
+        self._pools = {}
+        self._catch_all = {}
+        self._lock = threading.Lock()
+        self.sessions_opened = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _pool(self, host):
+        with self._lock:
+            pool = self._pools.get(host)
+            if pool is None:
+                pool = self._pools[host] = _HostPool(self.max_per_host)
+            return pool
+
+    def _connect(self, host):
+        session = self._factory(timeout=self.timeout)
+        session.connect(host, self.port)
+        code, _ = session.ehlo(self.helo)
+        if not 200 <= code < 300:
+            session.helo(self.helo)
+        session.recipients_checked = 0
+        with self._lock:
+            self.sessions_opened += 1
+        return session
+
+    @contextmanager
+    def _session(self, host):
+        """Выдаёт сессию из пула хоста, ожидая свободный слот"""
+        pool = self._pool(host)
+        pool.slots.acquire()
+        session = None
+        try:
+            with pool.lock:
+                session = pool.idle.pop() if pool.idle else None
+            if session is None:
+                session = self._connect(host)
+            yield session
+            session.recipients_checked += 1
+            if session.recipients_checked < self.max_rcpt_per_session:
+                with pool.lock:
+                    pool.idle.append(session)
+                session = None
+        finally:
+            if session is not None:
+                _quit(session)
+            pool.slots.release()
+
+    def _probe(self, session, address):
+        """MAIL FROM + RCPT TO + RSET, возвращает (код, сообщение) RCPT"""
+        code, message = session.mail(self.mail_from)
+        if code != 250:
+            raise smtplib.SMTPSenderRefused(code, message, self.mail_from)
+        try:
+            code, message = session.rcpt(address)
+        finally:
+            session.rset()
+        return code, message.decode('utf-8', 'replace') if isinstance(message, bytes) else message
+
+    def is_catch_all(self, domain, session):
+        """Принимает ли домен произвольные адреса (кэшируется на домен)"""
+        with self._lock:
+            if domain in self._catch_all:
+                return self._catch_all[domain]
+        code, _ = self._probe(session, f"{uuid.uuid4().hex[:16]}@{domain}")
+        verdict = code in ACCEPTED
+        with self._lock:
+            self._catch_all[domain] = verdict
+        return verdict
+
+    def verify(self, address, domain, mx_hosts):
+        """Возвращает ('ok' | 'catch_all' | 'missing' | 'unknown', сообщение)
+
+        'unknown' - ящик проверить не удалось: сбой соединения, временная
+        ошибка 4xx (например, greylisting) или отказ в MAIL FROM.
+        """
+        if not mx_hosts:
+            return 'unknown', "нет MX-хостов"
+        host = mx_hosts[0]
+        for attempt in range(2):
+            try:
+                with self._session(host) as session:
+                    code, message = self._probe(session, address)
+                    if code in ACCEPTED:
+                        if self.detect_catch_all and self.is_catch_all(domain, session):
+                            return 'catch_all', message
+                        return 'ok', message
+                break
+            except smtplib.SMTPServerDisconnected as e:
+                # Сервер мог закрыть простаивавшую сессию: одна попытка с новой
+                if attempt:
+                    return 'unknown', f"{type(e).__name__}: {e}"
+            except (smtplib.SMTPException, OSError, UnicodeError) as e:
+                return 'unknown', f"{type(e).__name__}: {e}"
+        if 500 <= code < 600:
+            return 'missing', f"{code} {message}"
+        return 'unknown', f"{code} {message}"
+
+    def apply(self, result):
+        """Уточняет статус EmailResult с найденными MX по ответу SMTP
+
+        Домены без MX с адресом A/AAAA (IMPLICIT_MX) проверяются на самом домене.
+        """
+        if result.status not in (Status.VALID, Status.IMPLICIT_MX) or not result.mx_hosts:
+            return result
+        local = result.email.rpartition('@')[0]
+        verdict, message = self.verify(f"{local}@{result.domain}", result.domain.lower(),
+                                       result.mx_hosts)
+        if verdict == 'ok':
+            return result._replace(status=Status.MAILBOX_OK)
+        if verdict == 'catch_all':
+            return result._replace(status=Status.CATCH_ALL)
+        if verdict == 'missing':
+            return result._replace(status=Status.NO_MAILBOX, error=message)
+        # Неопределённый ответ SMTP не отменяет найденные MX-записи
+        return result
+
+    def verify_results(self, results, concurrency=10):
+        """Применяет apply к потоку EmailResult, сохраняя порядок
+
+        Одновременно выполняется не более concurrency проверок (и не более
+        max_per_host на один MX-хост).
+        """
+        return map_ordered(self.apply, results, concurrency)
+
+    def close(self):
+        """Закрывает все открытые сессии (QUIT)"""
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            with pool.lock:
+                idle, pool.idle = pool.idle, []
+            for session in idle:
+                _quit(session)
+
+
+def _quit(session):
+    try:
+        session.quit()
+    except (smtplib.SMTPException, OSError):
+        session.close()
@@ -0,0 +1,195 @@
+﻿#!/usr/bin/env python3
+"""
+Фоновая очередь доставки сообщений в Telegram с учётом ограничений API
+"""
+
+import atexit
+import threading
+import time
+from collections import deque
+
+import requests
+
+from src.telegram_sender import MAX_MESSAGE_LENGTH, get_client, split_message
+
+# Разделитель сообщений, объединённых в одно
+SEPARATOR = "\n\n"
+
+
+def retry_after(response):
+    """Возвращает паузу в секундах, запрошенную сервером, или None
+
+    Telegram передаёт её в parameters.retry_after ответа 429,
+    запасной вариант - заголовок Retry-After.
+    """
+    if response is None:
+        return None
+    try:
+        value = response.json()['parameters']['retry_after']
+    except (ValueError, KeyError, TypeError):
+        value = response.headers.get('Retry-After')
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TelegramQueue:
+    """Неблокирующая очередь отправки через TelegramClient
+
+    put() только кладёт сообщение в очередь; отправкой занимается фоновый
+    поток. Подряд идущие короткие сообщения объединяются в одно (не длиннее
+    max_length), ответ 429 выдерживается паузой retry_after, сетевые ошибки
+    и ошибки 5xx повторяются с экспоненциальной задержкой. close() дожидается
+    отправки всего накопленного.
+    """
+
+    def __init__(self, client, max_length=MAX_MESSAGE_LENGTH, max_retries=5,
+                 backoff=1.0, max_backoff=60.0, linger=0.2, sleep=time.sleep):
+        self.client = client
+        self.max_length = max_length
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.linger = linger
+        self._sleep = sleep
+        self.sent = 0
+        self.failed = 0
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._busy = False
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name='telegram-queue', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def put(self, message):
+        """Ставит сообщение в очередь, длинные тексты делятся на части"""
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("Очередь Telegram уже закрыта")
+            self._pending.extend(split_message(message, self.max_length))
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Ждёт, пока очередь опустеет; возвращает False по таймауту"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def close(self, timeout=None):
+        """Отправляет оставшиеся сообщения и останавливает поток"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._cond:
+            return {'sent': self.sent, 'failed': self.failed, 'pending': len(self._pending)}
+
+    def _take(self):
+        """Забирает из очереди сообщения, помещающиеся в одно"""
+        parts = [self._pending.popleft()]
+        length = len(parts[0])
+        while self._pending:
+            extra = len(SEPARATOR) + len(self._pending[0])
+            if length + extra > self.max_length:
+                break
+            parts.append(self._pending.popleft())
+            length += extra
+        return SEPARATOR.join(parts)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closing:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                if self.linger and not self._closing:
+                    # Небольшая пауза, чтобы успели подойти соседние сообщения
+                    self._cond.wait(self.linger)
+                text = self._take()
+                self._busy = True
+            delivered = self._deliver(text)
+            with self._cond:
+                if delivered:
+                    self.sent += 1
+                else:
+                    self.failed += 1
+                self._busy = False
+                self._cond.notify_all()
+
+    def _delay(self, attempt):
+        return min(self.max_backoff, self.backoff * 2 ** attempt)
+
+    def _deliver(self, text):
+        """Отправляет одно сообщение с повторами, возвращает успех"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.client.send_message(text)
+                return True
+            except requests.exceptions.HTTPError as e:
+                response = e.response
+                status = response.status_code if response is not None else None
+                delay = retry_after(response) if status == 429 else None
+                if delay is None:
+                    if status is not None and status < 500 and status != 429:
+                        # Ошибка запроса: повтор ничего не изменит
+                        print(f"❌ Telegram отклонил сообщение: {e}")
+                        return False
+                    delay = self._delay(attempt)
+            except requests.exceptions.RequestException:
+                delay = self._delay(attempt)
+            if attempt < self.max_retries:
+                self._sleep(delay)
+        print(f"❌ Сообщение не доставлено в Telegram после {self.max_retries + 1} попыток")
+        return False
+
+
+# Очереди по пути к файлу конфигурации, закрываются при выходе из процесса
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_queue(config_file='config.ini'):
+    """Возвращает общую очередь для файла конфигурации"""
+    with _queues_lock:
+        delivery = _queues.get(config_file)
+        if delivery is None:
+            delivery = TelegramQueue(get_client(config_file))
+            _queues[config_file] = delivery
+        return delivery
+
+
+def close_queues(timeout=None):
+    """Дожидается отправки сообщений во всех общих очередях"""
+    with _queues_lock:
+        queues = list(_queues.values())
+        _queues.clear()
+    for delivery in queues:
+        delivery.close(timeout)
+
+
+atexit.register(close_queues)
+
+
+def send_to_telegram_async(message, config_file='config.ini'):
+    """Ставит сообщение в очередь отправки, не дожидаясь сети
+
+    Возвращает False, если Telegram не настроен.
+    """
+    try:
+        client = get_client(config_file)
+    except ValueError as e:
+        print(f"❌ Ошибка конфигурации: {e}")
+        return False
+    if not client.is_configured():
+        return False
+    get_queue(config_file).put(message)
+    return True
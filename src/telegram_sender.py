@@ -3,10 +3,23 @@
 Отправка сообщений в Telegram через API бота
 """
 
+import os
 import requests
 import configparser
 import argparse
+import threading
+import uuid
+import zlib
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+
+API_URL = "https://api.telegram.org/bot{token}/{method}"
+
+# Ограничение Telegram на длину текста одного сообщения
+MAX_MESSAGE_LENGTH = 4096
+
+# Файлы больше этого размера (байт) отправляются документом, а не сообщениями
+DOCUMENT_THRESHOLD = 5 * MAX_MESSAGE_LENGTH
 
 def load_config(config_file='config.ini'):
     """Загружает конфигурацию из файла"""
@@ -18,49 +31,244 @@ def load_config(config_file='config.ini'):
     
     return config['telegram']
 
-def send_to_telegram(message, config_file='config.ini'):
-    """Отправляет сообщение в Telegram"""
+def split_message(text, limit=MAX_MESSAGE_LENGTH):
+    """Делит текст на части не длиннее limit по границам строк
     
-    try:
-        config = load_config(config_file)
-        token = config.get('bot_token')
-        chat_id = config.get('chat_id')
+    Строка длиннее limit режется на куски фиксированной длины.
+    """
+    if len(text) <= limit:
+        return [text]
+    
+    chunks = []
+    current = ''
+    for line in text.splitlines(keepends=True):
+        if len(current) + len(line) > limit and current:
+            chunks.append(current)
+            current = ''
+        while len(line) > limit:
+            chunks.append(line[:limit])
+            line = line[limit:]
+        current += line
+    if current:
+        chunks.append(current)
+    return [chunk.rstrip('\n') for chunk in chunks if chunk.strip()]
+
+def iter_file_chunks(filename, limit=MAX_MESSAGE_LENGTH):
+    """Читает текстовый файл построчно и выдаёт части не длиннее limit"""
+    current = ''
+    with open(filename, 'r', encoding='utf-8') as f:
+        for line in f:
+            if len(current) + len(line) > limit and current:
+                yield current.rstrip('\n')
+                current = ''
+            while len(line) > limit:
+                yield line[:limit]
+                line = line[limit:]
+            current += line
+    if current.strip():
+        yield current.rstrip('\n')
+
+class MultipartFile:
+    """Тело запроса multipart/form-data с файлом, читаемым с диска по частям
+    
+    При compress=True файл сжимается в gzip на лету; длина тела тогда
+    заранее неизвестна (length = None) и запрос уходит chunked.
+    """
+    
+    def __init__(self, path, fields, field='document', compress=False, chunk_size=64 * 1024):
+        self.path = path
+        self.compress = compress
+        self.chunk_size = chunk_size
+        self.boundary = uuid.uuid4().hex
+        name = Path(path).name + ('.gz' if compress else '')
+        file_type = 'application/gzip' if compress else 'text/plain'
+        
+        head = ''.join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'
+            for key, value in fields.items() if value is not None
+        )
+        head += (f'--{self.boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+                 f'filename="{name}"\r\nContent-Type: {file_type}\r\n\r\n')
+        self._head = head.encode('utf-8')
+        self._tail = f'\r\n--{self.boundary}--\r\n'.encode('ascii')
+        self.length = None
+        if not compress:
+            self.length = len(self._head) + os.path.getsize(path) + len(self._tail)
+    
+    @property
+    def content_type(self):
+        return f'multipart/form-data; boundary={self.boundary}'
+    
+    def __len__(self):
+        return self.length
+    
+    def __iter__(self):
+        yield self._head
+        compressor = zlib.compressobj(wbits=31) if self.compress else None
+        with open(self.path, 'rb') as f:
+            for block in iter(lambda: f.read(self.chunk_size), b''):
+                if compressor is not None:
+                    block = compressor.compress(block)
+                    if not block:
+                        continue
+                yield block
+        if compressor is not None:
+            yield compressor.flush()
+        yield self._tail
+    
+    def body(self):
+        """Возвращает объект для data= в requests
         
-        if not token or token == 'ваш_токен_бота_здесь':
+        Объект с известной длиной отправляется с Content-Length,
+        генератор - кусками (Transfer-Encoding: chunked).
+        """
+        return self if self.length is not None else iter(self)
+
+class TelegramClient:
+    """Клиент Bot API с однократно прочитанной конфигурацией
+    
+    Все запросы идут через один requests.Session, поэтому соединение
+    с api.telegram.org (TCP + TLS) переиспользуется между сообщениями.
+    """
+    
+    def __init__(self, config_file='config.ini', timeout=10, pool_size=4):
+        config = load_config(config_file)
+        self.token = config.get('bot_token')
+        self.chat_id = config.get('chat_id')
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def close(self):
+        """Закрывает соединения сессии"""
+        self.session.close()
+    
+    def is_configured(self):
+        """Проверяет, что токен и chat_id заполнены, иначе выводит подсказку"""
+        if not self.token or self.token == 'ваш_токен_бота_здесь':
             print("❌ Токен бота не настроен. Отредактируйте config.ini")
             return False
             
-        if not chat_id or chat_id == 'ваш_chat_id_здесь':
+        if not self.chat_id or self.chat_id == 'ваш_chat_id_здесь':
             print("❌ Chat ID не настроен. Отредактируйте config.ini")
             return False
+        return True
+    
+    def api_call(self, method, **kwargs):
+        """Выполняет POST-запрос к методу Bot API и возвращает ответ
         
-        url = f"https://api.telegram.org/bot{token}/sendMessage"
-        
+        Ошибки HTTP пробрасываются как requests.exceptions.RequestException.
+        """
+        url = API_URL.format(token=self.token, method=method)
+        response = self.session.post(url, timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response
+    
+    def send_message(self, message):
+        """Отправляет сообщение, ошибки пробрасываются вызывающему"""
         payload = {
-            'chat_id': chat_id,
+            'chat_id': self.chat_id,
             'text': message,
             'parse_mode': 'HTML'
         }
+        return self.api_call('sendMessage', json=payload)
+    
+    def send_document(self, filename, caption=None, compress=False):
+        """Загружает файл документом, не читая его целиком в память"""
+        upload = MultipartFile(filename, {'chat_id': self.chat_id, 'caption': caption},
+                               compress=compress)
+        return self.api_call('sendDocument', data=upload.body(),
+                             headers={'Content-Type': upload.content_type})
+    
+    def send(self, message):
+        """Отправляет сообщение в чат из конфигурации"""
+        if not self.is_configured():
+            return False
         
-        response = requests.post(url, json=payload, timeout=10)
-        response.raise_for_status()
-        print("✅ Сообщение успешно отправлено в Telegram")
-        return True
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Ошибка отправки в Telegram: {e}")
+        try:
+            self.send_message(message)
+            print("✅ Сообщение успешно отправлено в Telegram")
+            return True
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Ошибка отправки в Telegram: {e}")
+            return False
+
+# Клиенты по пути к файлу конфигурации, общие для всего процесса
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(config_file='config.ini'):
+    """Возвращает общий TelegramClient для файла конфигурации"""
+    with _clients_lock:
+        client = _clients.get(config_file)
+        if client is None:
+            client = TelegramClient(config_file)
+            _clients[config_file] = client
+        return client
+
+def send_to_telegram(message, config_file='config.ini'):
+    """Отправляет сообщение в Telegram"""
+    try:
+        client = get_client(config_file)
+    except ValueError as e:
+        print(f"❌ Ошибка конфигурации: {e}")
         return False
+    return client.send(message)
+
+def send_document_to_telegram(filename, caption=None, config_file='config.ini',
+                              compress=False):
+    """Отправляет файл в Telegram документом (sendDocument)"""
+    try:
+        client = get_client(config_file)
     except ValueError as e:
         print(f"❌ Ошибка конфигурации: {e}")
         return False
+    if not client.is_configured():
+        return False
+    
+    try:
+        client.send_document(filename, caption, compress)
+        print("✅ Файл успешно отправлен в Telegram")
+        return True
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Ошибка отправки в Telegram: {e}")
+        return False
 
-def send_file_to_telegram(filename, config_file='config.ini'):
-    """Отправляет содержимое файла в Telegram"""
+def send_file_to_telegram(filename, config_file='config.ini', compress=False):
+    """Отправляет содержимое файла в Telegram
+    
+    Короткий файл уходит одним сообщением, файл до DOCUMENT_THRESHOLD байт -
+    несколькими сообщениями по границам строк, больший - документом
+    (при compress=True сжатым в gzip).
+    """
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        message = f"📄 Файл: {Path(filename).name}\n\n{content}"
-        return send_to_telegram(message, config_file)
+        size = os.path.getsize(filename)
+    except OSError:
+        print(f"❌ Файл не найден: {filename}")
+        return False
+    
+    header = f"📄 Файл: {Path(filename).name}\n\n"
+    if size > DOCUMENT_THRESHOLD:
+        return send_document_to_telegram(filename, header.strip(), config_file, compress)
+    
+    try:
+        limit = MAX_MESSAGE_LENGTH - len(header)
+        message = header
+        for chunk in iter_file_chunks(filename, limit):
+            if not send_to_telegram(message + chunk, config_file):
+                return False
+            message = ''
+        if message:
+            # Пустой файл: отправляем только заголовок
+            return send_to_telegram(message, config_file)
+        return True
     except FileNotFoundError:
         print(f"❌ Файл не найден: {filename}")
         return False
@@ -69,11 +277,13 @@ def main():
     parser = argparse.ArgumentParser(description='Отправка сообщений в Telegram')
     parser.add_argument('-m', '--message', help='Текст сообщения')
     parser.add_argument('-f', '--file', help='Отправить содержимое файла')
+    parser.add_argument('--gzip', action='store_true',
+                       help='Сжимать большие файлы, отправляемые документом')
     
     args = parser.parse_args()
     
     if args.file:
-        send_file_to_telegram(args.file)
+        send_file_to_telegram(args.file, compress=args.gzip)
     elif args.message:
         send_to_telegram(args.message)
     else:
@@ -0,0 +1,300 @@
+﻿#!/usr/bin/env python3
+"""
+Пакетное разрешение MX через несколько UDP-сокетов без потока на запрос
+"""
+
+import random
+import selectors
+import socket
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import dns.exception
+import dns.flags
+import dns.inet
+import dns.message
+import dns.query
+import dns.rcode
+import dns.rdataclass
+import dns.rdatatype
+import dns.resolver
+
+# Размер приёмного буфера сокета: тысячи ответов могут прийти разом
+RECEIVE_BUFFER = 1 << 20
+
+
+class _Query:
+    """Запрос (домен, тип записи), ожидающий ответа"""
+
+    __slots__ = ('key', 'message', 'attempt', 'first', 'server', 'sock', 'started',
+                 'sent', 'done')
+
+    def __init__(self, key, message, started):
+        self.key = key
+        self.message = message
+        self.attempt = 0
+        # Номер сервера для первой попытки, повторы идут по следующим
+        self.first = None
+        self.server = None
+        self.sock = None
+        self.started = started
+        # Время отправки последней попытки
+        self.sent = started
+        self.done = False
+
+
+class UDPEngine:
+    """Разрешает MX множества доменов, держа тысячи запросов в полёте
+
+    Запросы отправляются через несколько неблокирующих UDP-сокетов, ответы
+    сопоставляются с запросами по сокету, ID сообщения и вопросу. Запрос без
+    ответа за timeout секунд повторяется на следующем сервере (не больше
+    retries раз), усечённый ответ (флаг TC) перезапрашивается по TCP.
+    С controller (AIMDController) число запросов в полёте равно его лимиту,
+    а ответы, таймауты и SERVFAIL сообщаются ему; max_outstanding тогда
+    не используется.
+    Экземпляр не потокобезопасен: resolve_many вызывается из одного потока.
+    """
+
+    def __init__(self, nameservers=None, port=53, sockets=4, max_outstanding=1000,
+                 timeout=2.0, retries=2, tcp_timeout=5.0, tcp_workers=4, controller=None):
+        if not nameservers:
+            nameservers = dns.resolver.get_default_resolver().nameservers
+        self.nameservers = [str(server) for server in nameservers]
+        self.port = port
+        self.max_outstanding = max(1, max_outstanding)
+        self.timeout = timeout
+        self.retries = retries
+        self.tcp_timeout = tcp_timeout
+        self.controller = controller
+        self._selector = selectors.DefaultSelector()
+        self._sockets = {}
+        for family in {dns.inet.af_for_address(server) for server in self.nameservers}:
+            self._sockets[family] = [self._open_socket(family) for _ in range(max(1, sockets))]
+        self._tcp = ThreadPoolExecutor(max_workers=tcp_workers)
+        self._counters = {'sent': 0, 'retransmits': 0, 'truncated': 0,
+                          'timeouts': 0, 'unmatched': 0}
+        self._next = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _open_socket(self, family):
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+        except OSError:
+            pass
+        self._selector.register(sock, selectors.EVENT_READ)
+        return sock
+
+    def close(self):
+        """Закрывает сокеты и пул TCP-запросов"""
+        self._tcp.shutdown(wait=False)
+        for sockets in self._sockets.values():
+            for sock in sockets:
+                self._selector.unregister(sock)
+                sock.close()
+        self._sockets = {}
+        self._selector.close()
+
+    def stats(self):
+        """Счётчики отправленных, повторных, усечённых и потерянных запросов"""
+        return dict(self._counters)
+
+    def resolve_many(self, domains, rdtype='MX'):
+        """Разрешает записи доменов и возвращает словарь домен -> (answer, error, секунды)
+
+        answer - dns.resolver.Answer (как у dns.resolver.resolve), error -
+        исключение dnspython (NXDOMAIN, NoAnswer, NoNameservers, Timeout),
+        одно из двух всегда None. Время считается от первой отправки запроса.
+        """
+        results = self.resolve_queries((domain, rdtype) for domain in domains)
+        return {domain: outcome for (domain, _), outcome in results.items()}
+
+    def resolve_queries(self, queries):
+        """Как resolve_many, но для пар (домен, тип записи) в одном окне запросов
+
+        Ключи результата - те же пары.
+        """
+        waiting = deque(dict.fromkeys(queries))
+        results = {}
+        outstanding = {}
+        # Таймаут одинаков для всех запросов, поэтому сроки идут по порядку отправки
+        deadlines = deque()
+        tcp_pending = []
+
+        while waiting or outstanding or tcp_pending:
+            now = time.monotonic()
+            limit = self.controller.limit if self.controller else self.max_outstanding
+            while waiting and len(outstanding) + len(tcp_pending) < limit:
+                key = waiting.popleft()
+                try:
+                    message = dns.message.make_query(*key)
+                except Exception as e:
+                    results[key] = (None, e, 0.0)
+                    continue
+                query = _Query(key, message, now)
+                self._send(query, outstanding, deadlines, now)
+
+            self._receive(outstanding, deadlines, results, tcp_pending,
+                          self._wait_time(deadlines, tcp_pending))
+            self._expire(outstanding, deadlines, results)
+            if tcp_pending:
+                tcp_pending[:] = self._collect_tcp(tcp_pending, results)
+        return results
+
+    def _send(self, query, outstanding, deadlines, now):
+        """Отправляет (или повторяет) запрос на очередной сервер"""
+        if query.first is None:
+            query.first = self._next
+        server = self.nameservers[(query.first + query.attempt) % len(self.nameservers)]
+        sockets = self._sockets[dns.inet.af_for_address(server)]
+        sock = sockets[self._next % len(sockets)]
+        self._next += 1
+        # ID должен быть уникален среди ожидающих ответа на этом сокете
+        while (sock, query.message.id) in outstanding:
+            query.message.id = random.randrange(65536)
+        query.server = server
+        query.sock = sock
+        query.sent = now
+        outstanding[(sock, query.message.id)] = query
+        deadlines.append((now + self.timeout, query, query.attempt))
+        try:
+            sock.sendto(query.message.to_wire(), (server, self.port))
+            self._counters['sent'] += 1
+        except (BlockingIOError, InterruptedError):
+            # Буфер отправки полон: запрос повторится по таймауту
+            pass
+
+    def _wait_time(self, deadlines, tcp_pending):
+        """Сколько ждать ответов до ближайшего срока"""
+        wait = self.timeout
+        if deadlines:
+            wait = max(0.0, deadlines[0][0] - time.monotonic())
+        if tcp_pending:
+            wait = min(wait, 0.01)
+        return wait
+
+    def _receive(self, outstanding, deadlines, results, tcp_pending, wait):
+        """Читает все пришедшие ответы и сопоставляет их с запросами"""
+        for key, _ in self._selector.select(wait):
+            sock = key.fileobj
+            while True:
+                try:
+                    wire, address = sock.recvfrom(65535)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError:
+                    # Например, ICMP port unreachable: запрос повторится по таймауту
+                    break
+                try:
+                    response = dns.message.from_wire(wire)
+                except Exception:
+                    self._counters['unmatched'] += 1
+                    continue
+                query = outstanding.get((sock, response.id))
+                if (query is None or address[0] != query.server
+                        or not query.message.is_response(response)):
+                    # Опоздавший ответ на повторённый запрос или чужой пакет
+                    self._counters['unmatched'] += 1
+                    continue
+                del outstanding[(sock, response.id)]
+                self._handle(query, response, outstanding, deadlines, results, tcp_pending)
+
+    def _handle(self, query, response, outstanding, deadlines, results, tcp_pending):
+        rcode = response.rcode()
+        if self.controller is not None:
+            self.controller.record(query.sent, rcode not in (dns.rcode.NOERROR,
+                                                             dns.rcode.NXDOMAIN))
+        if response.flags & dns.flags.TC:
+            self._counters['truncated'] += 1
+            future = self._tcp.submit(dns.query.tcp, query.message, query.server,
+                                      self.tcp_timeout, self.port)
+            tcp_pending.append((future, query))
+            return
+        if rcode in (dns.rcode.NOERROR, dns.rcode.NXDOMAIN):
+            self._finish(query, results, *self._parse(query, response))
+        elif query.attempt < self.retries:
+            # SERVFAIL, REFUSED и т.п.: пробуем следующий сервер
+            query.attempt += 1
+            self._counters['retransmits'] += 1
+            self._send(query, outstanding, deadlines, time.monotonic())
+        else:
+            error = dns.resolver.NoNameservers(request=query.message, errors=[
+                (query.server, False, self.port, dns.rcode.to_text(rcode))])
+            self._finish(query, results, None, error)
+
+    def _parse(self, query, response):
+        """Возвращает (answer, error) по ответу сервера"""
+        question = query.message.question[0]
+        qname = question.name
+        if response.rcode() == dns.rcode.NXDOMAIN:
+            return None, dns.resolver.NXDOMAIN(qnames=[qname], responses={qname: response})
+        try:
+            answer = dns.resolver.Answer(qname, question.rdtype, dns.rdataclass.IN,
+                                         response, query.server, self.port)
+        except Exception as e:
+            return None, e
+        if answer.rrset is None:
+            return None, dns.resolver.NoAnswer(response=response)
+        return answer, None
+
+    def _finish(self, query, results, answer, error):
+        query.done = True
+        results[query.key] = (answer, error, time.monotonic() - query.started)
+
+    def _expire(self, outstanding, deadlines, results):
+        """Повторяет или завершает запросы, не получившие ответа в срок"""
+        now = time.monotonic()
+        while deadlines and deadlines[0][0] <= now:
+            _, query, attempt = deadlines.popleft()
+            if query.done or attempt != query.attempt:
+                continue
+            outstanding.pop((query.sock, query.message.id), None)
+            if self.controller is not None:
+                self.controller.record(query.sent, True)
+            if query.attempt < self.retries:
+                query.attempt += 1
+                self._counters['retransmits'] += 1
+                # Новый ID: опоздавший ответ на прошлую попытку не будет принят
+                query.message.id = random.randrange(65536)
+                self._send(query, outstanding, deadlines, now)
+            else:
+                self._counters['timeouts'] += 1
+                self._finish(query, results, None,
+                             dns.exception.Timeout(timeout=now - query.started))
+
+    def _collect_tcp(self, tcp_pending, results):
+        """Забирает завершённые TCP-запросы и возвращает оставшиеся"""
+        remaining = []
+        for future, query in tcp_pending:
+            if not future.done():
+                remaining.append((future, query))
+                continue
+            try:
+                response = future.result()
+            except Exception as e:
+                self._finish(query, results, None, e)
+                continue
+            self._finish(query, results, *self._parse(query, response))
+        return remaining
+
+
+def engine_from_settings(dns_settings=None, sockets=4, max_outstanding=1000, controller=None):
+    """Создаёт UDPEngine по настройкам DNS в формате load_dns_settings
+
+    server_timeout становится таймаутом одной попытки, а timeout (общее
+    время на запрос) определяет число повторов.
+    """
+    settings = dns_settings or {}
+    timeout = settings.get('timeout') or 2.0
+    lifetime = settings.get('lifetime')
+    retries = max(0, int(lifetime / timeout) - 1) if lifetime else 2
+    return UDPEngine(settings.get('nameservers'), settings.get('port') or 53, sockets,
+                     max_outstanding, timeout, retries, controller=controller)
@@ -0,0 +1,110 @@
+﻿#!/usr/bin/env python3
+"""
+Постоянное хранилище вердиктов по доменам (SQLite)
+"""
+
+import sqlite3
+import threading
+import time
+
+import dns.resolver
+
+from src.resolver import ImplicitMX, NullMX
+
+# Ответы без MX-хостов, которые сохраняются по имени класса
+ERRORS = {
+    'NXDOMAIN': dns.resolver.NXDOMAIN,
+    'NoAnswer': dns.resolver.NoAnswer,
+    'NullMX': NullMX,
+    'ImplicitMX': ImplicitMX,
+}
+
+
+class VerdictStore:
+    """Вердикты MX по доменам с отметкой времени и TTL
+
+    База открывается в режиме WAL, поэтому её могут одновременно читать
+    и дополнять несколько процессов email-validator.
+    """
+
+    def __init__(self, path, ttl=86400, negative_ttl=3600, timeout=30, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute(f"PRAGMA busy_timeout = {int(timeout * 1000)}")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            " domain TEXT PRIMARY KEY,"
+            " hosts TEXT,"
+            " error TEXT,"
+            " checked_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, domain):
+        """Возвращает (hosts, error, ttl) или None, если вердикта нет или он устарел
+
+        ttl - сколько секунд вердикт ещё остаётся действительным.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT hosts, error, expires_at FROM verdicts WHERE domain = ?",
+                (domain,),
+            ).fetchone()
+        if row is None:
+            return None
+        hosts, error, expires_at = row
+        ttl = expires_at - self._clock()
+        if ttl <= 0:
+            return None
+        if error is not None:
+            return None, ERRORS[error], ttl
+        return tuple(hosts.split()) if hosts else (), None, ttl
+
+    def put(self, domain, hosts=None, error=None):
+        """Сохраняет вердикт домена"""
+        now = self._clock()
+        if error is not None:
+            values = (domain, None, error.__name__, now, now + self.negative_ttl)
+        else:
+            values = (domain, " ".join(hosts or ()), None, now, now + self.ttl)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verdicts (domain, hosts, error, checked_at, expires_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                values,
+            )
+
+    def purge(self):
+        """Удаляет устаревшие вердикты и возвращает их количество"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM verdicts WHERE expires_at <= ?", (self._clock(),))
+            return cursor.rowcount
+
+    def compact(self):
+        """Освобождает место в файле базы после удаления записей"""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("VACUUM")
+
+    def count(self):
+        """Возвращает количество записей в базе"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,93 @@
+﻿#!/usr/bin/env python3
+"""
+Форматы файла результатов: текст, JSON Lines и CSV
+"""
+
+import csv
+import json
+
+from src.check_email import format_result, result_record
+
+# Поля записи об адресе в машиночитаемых форматах
+FIELDS = ('email', 'domain', 'status', 'mx_hosts', 'error', 'elapsed_ms')
+
+# Поля при включённом разрешении MX-хостов (--mx-hosts)
+PROVIDER_FIELDS = FIELDS + ('provider',)
+
+
+class TextWriter:
+    """Строки "email: результат" и итоговая сводка в конце файла"""
+
+    def __init__(self, stream, header=True, fields=FIELDS):
+        self.stream = stream
+
+    def write(self, result):
+        self.stream.write(format_result(result) + "\n")
+
+    def write_summary(self, summary):
+        for line in summary.lines():
+            self.stream.write(f"\n{line}")
+
+
+class JsonlWriter:
+    """Одна JSON-запись на строку; сводка пишется отдельно (см. write_stats)"""
+
+    def __init__(self, stream, header=True, fields=FIELDS):
+        self.stream = stream
+        self.fields = fields
+
+    def write(self, result):
+        record = result_record(result)
+        record = {field: record[field] for field in self.fields}
+        self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def write_summary(self, summary):
+        pass
+
+
+class CsvWriter:
+    """CSV с заголовком fields; MX-хосты перечисляются через пробел"""
+
+    def __init__(self, stream, header=True, fields=FIELDS):
+        self.stream = stream
+        self.fields = fields
+        self._writer = csv.writer(stream, lineterminator="\n")
+        if header:
+            self._writer.writerow(fields)
+
+    def write(self, result):
+        record = result_record(result)
+        record['mx_hosts'] = " ".join(record['mx_hosts'])
+        self._writer.writerow([record[field] for field in self.fields])
+
+    def write_summary(self, summary):
+        pass
+
+
+WRITERS = {
+    'text': TextWriter,
+    'jsonl': JsonlWriter,
+    'csv': CsvWriter,
+}
+
+
+def make_writer(fmt, stream, header=True, fields=FIELDS):
+    """Создаёт писатель формата fmt поверх открытого файла
+
+    header=False - файл дописывается (продолжение с контрольной точки),
+    и заголовок CSV повторно не выводится. fields - поля записей JSONL и
+    CSV (PROVIDER_FIELDS добавляет провайдера).
+    """
+    return WRITERS[fmt](stream, header, fields)
+
+
+def stats_path(output):
+    """Путь к файлу статистики рядом с файлом результатов"""
+    return f"{output}.stats.json"
+
+
+def write_stats(path, record):
+    """Сохраняет итоговую статистику запуска в JSON"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(record, f, ensure_ascii=False, indent=2)
+        f.write("\n")
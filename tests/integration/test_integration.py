@@ -5,9 +5,11 @@ import pytest
 import tempfile
 import os
 from unittest.mock import patch, MagicMock
-from src.check_email import main as check_email_main
+from src.check_email import main as check_email_main, check_email
 from src.telegram_sender import main as telegram_main
 import sys
+import dns.resolver
+from benchmarks.fake_dns import FakeDNSServer
 
 
 class TestIntegration:
@@ -105,6 +107,61 @@ test@mail.ru
             # Восстанавливаем оригинальные аргументы
             sys.argv = original_argv
     
+    def test_email_validation_with_workers(self, sample_email_file, mock_dns, capsys):
+        """Test parallel CLI run prints results in input order"""
+        original_argv = sys.argv
+        
+        try:
+            sys.argv = ['check_email.py', '--file', sample_email_file, '--workers', '4']
+            
+            summary = check_email_main()
+            output = capsys.readouterr().out
+            lines = [line for line in output.splitlines() if ": " in line][:4]
+            
+            assert [line.split(':')[0] for line in lines] == [
+                "test@gmail.com",
+                "invalid-email",
+                "nonexistent@domain-that-does-not-exist-12345.com",
+                "test@mail.ru",
+            ]
+            assert summary.total == 4
+            assert "Всего проверено: 4" in output
+            
+        finally:
+            sys.argv = original_argv
+    
+    def test_output_file_written_incrementally(self, sample_email_file, mock_dns, tmp_path):
+        """Test results reach the output file before the run finishes"""
+        output_file = tmp_path / "results.txt"
+        original_argv = sys.argv
+        seen = []
+        
+        from src import check_email as module
+        original_format = module.format_result
+        
+        def spy(result):
+            # К моменту вывода последнего адреса первые уже должны быть в файле
+            if result.email == "test@mail.ru":
+                seen.append(output_file.read_text(encoding='utf-8'))
+            return original_format(result)
+        
+        try:
+            sys.argv = ['check_email.py', '--file', sample_email_file, '--output', str(output_file)]
+            
+            with patch('src.check_email.format_result', side_effect=spy), \
+                    patch('src.check_email.open_output',
+                          lambda name, resume_size=None: open(name, 'w', encoding='utf-8',
+                                                               buffering=1)):
+                check_email_main()
+            
+            assert "invalid-email" in seen[0]
+            content = output_file.read_text(encoding='utf-8')
+            assert content.startswith("test@gmail.com: ✅")
+            assert content.endswith("Невалидных: 2")
+            
+        finally:
+            sys.argv = original_argv
+    
     @patch('src.telegram_sender.send_to_telegram')
     def test_telegram_cli_interface(self, mock_send):
         """Test Telegram sender CLI interface"""
@@ -146,6 +203,28 @@ test@mail.ru
             sys.argv = original_argv
 
 
+@pytest.mark.integration
+class TestWithStubDNS:
+    """Integration tests against the local stub DNS server"""
+    
+    def test_check_email_over_real_dns_protocol(self):
+        """Test validation over UDP against the stub server"""
+        with FakeDNSServer(nxdomain_ratio=0.3, noanswer_ratio=0.2) as server:
+            with server.as_default_resolver():
+                for i in range(20):
+                    domain = f"domain{i}.test"
+                    result = check_email(f"user@{domain}")
+                    expected = {
+                        'mx': "✅",
+                        'nxdomain': "❌ домен отсутствует",
+                        'noanswer': "⚠️ MX-записи отсутствуют",
+                    }[server.outcome(domain)]
+                    assert expected in result
+            # Для доменов без MX дополнительно запрашиваются A и AAAA
+            noanswer = sum(server.outcome(f"domain{i}.test") == 'noanswer' for i in range(20))
+            assert server.queries == 20 + 2 * noanswer
+
+
 @pytest.mark.e2e
 class TestEndToEnd:
     """End-to-end tests (require real services)"""
@@ -0,0 +1,223 @@
+﻿"""
+Unit tests for adaptive (AIMD) concurrency control
+"""
+import json
+import sys
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import dns.exception
+import dns.resolver
+from benchmarks.fake_dns import FakeDNSServer
+from src.adaptive import AIMDController, is_overload
+from src.udp_engine import UDPEngine
+from src.check_email import validate_many, Status, main as check_email_main
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAIMDController:
+    """Test cases for AIMDController"""
+
+    def test_slow_start_grows_per_answer(self):
+        """Test the limit grows by one per fast answer before the first cut"""
+        clock = FakeClock()
+        controller = AIMDController(initial=4, maximum=100, target_latency=0.1, clock=clock)
+        for _ in range(6):
+            controller.record(0.0)
+        assert controller.limit == 10
+
+    def test_failure_halves_limit(self):
+        """Test a timeout cuts the limit multiplicatively"""
+        clock = FakeClock()
+        controller = AIMDController(initial=40, target_latency=0.1, clock=clock)
+        clock.now = 1.0
+        controller.record(0.9, failed=True)
+        assert controller.limit == 20
+        assert controller.stats()['decreases'] == 1
+
+    def test_one_cut_per_round(self):
+        """Test failures of queries sent before the last cut are ignored"""
+        clock = FakeClock()
+        controller = AIMDController(initial=40, target_latency=0.1, clock=clock)
+        clock.now = 1.0
+        for _ in range(5):
+            controller.record(0.5, failed=True)
+        assert controller.limit == 20
+        # Запрос, отправленный после снижения, снова снижает лимит
+        clock.now = 2.0
+        controller.record(1.5, failed=True)
+        assert controller.limit == 10
+
+    def test_additive_increase_after_cut(self):
+        """Test the limit grows by about one per window after a cut"""
+        clock = FakeClock()
+        controller = AIMDController(initial=20, target_latency=0.1, clock=clock)
+        controller.record(0.0, failed=True)
+        assert controller.limit == 10
+        # Окно из 10 запросов: 10 ответов ещё не дают +1, следующие 12 - дают +2
+        for _ in range(10):
+            controller.record(0.0)
+        assert controller.limit == 10
+        for _ in range(12):
+            controller.record(0.0)
+        assert controller.limit == 12
+
+    def test_slow_answer_holds_limit(self):
+        """Test answers slower than the target do not raise the limit"""
+        clock = FakeClock()
+        controller = AIMDController(initial=10, target_latency=0.1, clock=clock)
+        clock.now = 1.0
+        for _ in range(20):
+            controller.record(0.5)
+        assert controller.limit == 10
+
+    def test_bounds(self):
+        """Test the limit stays within minimum and maximum"""
+        clock = FakeClock()
+        controller = AIMDController(initial=3, minimum=2, maximum=5, target_latency=None,
+                                    clock=clock)
+        for _ in range(10):
+            controller.record(clock.now)
+        assert controller.limit == 5
+        for step in range(1, 5):
+            clock.now = step
+            controller.record(step, failed=True)
+        assert controller.limit == 2
+        # 5 -> 2.5 -> минимум 2: целый лимит снизился один раз
+        assert controller.stats() == {'limit': 2, 'peak': 5, 'low': 2,
+                                      'increases': 2, 'decreases': 1}
+
+    def test_acquire_blocks_at_limit(self):
+        """Test threads beyond the limit wait for a release"""
+        controller = AIMDController(initial=2, maximum=2)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def worker():
+            controller.acquire()
+            started = time.monotonic()
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+            controller.release(started)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for _ in range(16):
+                executor.submit(worker)
+        assert max(peak) == 2
+
+    def test_merge_sums_processes(self):
+        """Test merged stats describe all processes together"""
+        controller = AIMDController()
+        controller.merge({'limit': 10, 'peak': 12, 'low': 4, 'increases': 8, 'decreases': 1})
+        controller.merge({'limit': 6, 'peak': 7, 'low': 5, 'increases': 2, 'decreases': 0})
+        assert controller.stats() == {'limit': 16, 'peak': 19, 'low': 9,
+                                      'increases': 10, 'decreases': 1}
+        assert "Параллельность DNS: 16" in controller.summary_line()
+
+    def test_settings_round_trip(self):
+        """Test settings() rebuilds an equivalent controller"""
+        controller = AIMDController(initial=7, minimum=2, maximum=50, target_latency=0.3)
+        copy = AIMDController(**controller.settings())
+        assert copy.settings() == controller.settings()
+
+    def test_is_overload(self):
+        """Test timeouts and SERVFAIL count as overload, NXDOMAIN does not"""
+        assert is_overload(dns.exception.Timeout())
+        assert is_overload(dns.resolver.LifetimeTimeout(timeout=1.0, errors=[]))
+        assert is_overload(dns.resolver.NoNameservers())
+        assert not is_overload(dns.resolver.NXDOMAIN())
+        assert not is_overload(dns.resolver.NoAnswer())
+
+
+class TestAdaptiveLookups:
+    """Test cases for the controller in the resolution paths"""
+
+    def test_threaded_lookups_respect_limit(self):
+        """Test validate_many never runs more queries than the limit"""
+        controller = AIMDController(initial=3, maximum=3)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def resolve(domain, record_type):
+            with lock:
+                active.append(domain)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.remove(domain)
+            raise dns.resolver.NXDOMAIN
+
+        emails = [f"user@d{i}.test" for i in range(20)]
+        with patch('src.check_email.dns.resolver.resolve', side_effect=resolve):
+            results = list(validate_many(emails, concurrency=10, controller=controller))
+        assert all(r.status is Status.NO_DOMAIN for r in results)
+        assert max(peak) == 3
+
+    def test_threaded_timeouts_cut_limit(self):
+        """Test resolver timeouts reduce the limit"""
+        controller = AIMDController(initial=8, maximum=8)
+        with patch('src.check_email.dns.resolver.resolve',
+                   side_effect=dns.resolver.LifetimeTimeout(timeout=1.0, errors=[])):
+            results = list(validate_many(["a@x.test"], concurrency=4, controller=controller))
+        assert results[0].status is Status.ERROR
+        assert controller.limit == 4
+
+    def test_engine_window_follows_limit(self):
+        """Test the UDP engine grows its window from the controller"""
+        controller = AIMDController(initial=2, maximum=50, target_latency=1.0)
+        domains = [f"d{i}.test" for i in range(200)]
+        with FakeDNSServer() as server:
+            with UDPEngine([server.host], server.port, timeout=0.5,
+                           controller=controller) as engine:
+                results = engine.resolve_many(domains)
+        assert all(error is None for _, error, _ in results.values())
+        assert controller.limit == 50
+        assert controller.stats()['low'] == 2
+
+    def test_engine_timeouts_cut_limit(self):
+        """Test unanswered engine queries reduce the limit"""
+        controller = AIMDController(initial=16, maximum=16)
+        with FakeDNSServer(drop_ratio=1.0) as server:
+            with UDPEngine([server.host], server.port, timeout=0.1,
+                           controller=controller) as engine:
+                results = engine.resolve_many([f"d{i}.test" for i in range(16)])
+        assert all(error is None for _, error, _ in results.values())
+        assert controller.stats()['decreases'] >= 1
+
+    def test_cli_reports_concurrency(self, tmp_path, capsys):
+        """Test --adaptive prints the final level and writes it to the stats file"""
+        email_file = tmp_path / "emails.txt"
+        email_file.write_text("a@one.test\nb@two.test\n")
+        output = tmp_path / "out.jsonl"
+        original_argv = sys.argv
+        try:
+            sys.argv = ['check_email.py', '--file', str(email_file), '--workers', '4',
+                        '--adaptive', '--output', str(output), '--format', 'jsonl']
+            with patch('src.check_email.dns.resolver.resolve',
+                       side_effect=dns.resolver.NXDOMAIN):
+                check_email_main()
+        finally:
+            sys.argv = original_argv
+
+        assert "Параллельность DNS: 4" in capsys.readouterr().out
+        stats = json.loads((tmp_path / "out.jsonl.stats.json").read_text(encoding='utf-8'))
+        assert stats['concurrency']['limit'] == 4
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
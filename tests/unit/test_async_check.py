@@ -0,0 +1,154 @@
+﻿"""
+Unit tests for the asyncio-based validator
+"""
+import asyncio
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+import dns.name
+import dns.resolver
+from src.async_check import check_email_async, validate_many_async
+from src.check_email import check_email, Status
+from src.dns_cache import DomainCache
+
+
+def fake_resolve(domain, record_type, **kwargs):
+    """Shared DNS behaviour for sync and async mocks"""
+    if domain.startswith("nx"):
+        raise dns.resolver.NXDOMAIN
+    if domain.startswith("nomx"):
+        raise dns.resolver.NoAnswer
+    if domain.startswith("err"):
+        raise Exception("DNS error")
+    return MagicMock()
+
+
+async def collect(agen):
+    return [item async for item in agen]
+
+
+class TestCheckEmailAsync:
+    """Test cases for check_email_async"""
+
+    @patch('src.check_email.dns.resolver.resolve')
+    @patch('src.async_check.dns.asyncresolver.resolve', new_callable=AsyncMock)
+    def test_same_classification_as_sync(self, mock_async_resolve, mock_dns_resolve):
+        """Test async results are identical to check_email"""
+        mock_async_resolve.side_effect = fake_resolve
+        mock_dns_resolve.side_effect = fake_resolve
+        emails = ["a@ok.com", "invalid-email", "b@nx.com", "c@nomx.com", "d@err.com", "  "]
+
+        for email in emails:
+            assert asyncio.run(check_email_async(email)) == check_email(email)
+
+    @patch('src.async_check.dns.asyncresolver.resolve', new_callable=AsyncMock)
+    def test_uses_shared_cache(self, mock_async_resolve):
+        """Test the async path reads and fills DomainCache"""
+        mock_async_resolve.side_effect = fake_resolve
+        cache = DomainCache()
+
+        async def run():
+            await check_email_async("a@nx.com", cache)
+            return await check_email_async("b@nx.com", cache)
+
+        assert "❌ домен отсутствует" in asyncio.run(run())
+        assert mock_async_resolve.await_count == 1
+        assert cache.hits == 1
+
+
+class TestImplicitMXAsync:
+    """Test cases for null MX and the address fallback in the async path"""
+
+    @staticmethod
+    def resolve(domain, record_type, **kwargs):
+        if domain.startswith("nomail"):
+            answer = MagicMock()
+            answer.rrset = [MagicMock(exchange=dns.name.root)]
+            return answer
+        if record_type == 'MX':
+            raise dns.resolver.NoAnswer
+        if domain.startswith("bare") and record_type == 'AAAA':
+            return MagicMock()
+        raise dns.resolver.NoAnswer
+
+    @patch('src.check_email.dns.resolver.resolve')
+    @patch('src.async_check.dns.asyncresolver.resolve', new_callable=AsyncMock)
+    def test_same_classification_as_sync(self, mock_async_resolve, mock_dns_resolve):
+        """Test null MX and implicit MX match the sync path"""
+        mock_async_resolve.side_effect = self.resolve
+        mock_dns_resolve.side_effect = self.resolve
+        for email in ["a@nomail.com", "b@bare.com", "c@none.com"]:
+            assert asyncio.run(check_email_async(email)) == check_email(email)
+        assert "почта на адрес домена" in check_email("b@bare.com")
+
+    @patch('src.async_check.dns.asyncresolver.resolve', new_callable=AsyncMock)
+    def test_a_and_aaaa_in_flight_together(self, mock_async_resolve):
+        """Test both address queries are started before either finishes"""
+        started = []
+
+        async def resolve(domain, record_type, **kwargs):
+            if record_type == 'MX':
+                raise dns.resolver.NoAnswer
+            started.append(record_type)
+            await asyncio.sleep(0.01)
+            assert sorted(started) == ['A', 'AAAA']
+            raise dns.resolver.NoAnswer
+
+        mock_async_resolve.side_effect = resolve
+        assert "MX-записи отсутствуют" in asyncio.run(check_email_async("a@none.com"))
+
+
+class TestValidateManyAsync:
+    """Test cases for the async bulk iterator"""
+
+    @patch('src.async_check.dns.asyncresolver.resolve', new_callable=AsyncMock)
+    def test_preserves_input_order(self, mock_async_resolve):
+        """Test results come back in input order"""
+        async def delayed(domain, record_type, **kwargs):
+            # Первые домены отвечают дольше последних
+            await asyncio.sleep(0.001 * (10 - int(domain[1:].split('.')[0])))
+            return MagicMock()
+
+        mock_async_resolve.side_effect = delayed
+        emails = [f"user@d{i}.com" for i in range(10)]
+
+        results = asyncio.run(collect(validate_many_async(emails, concurrency=5)))
+        assert [r.email for r in results] == emails
+
+    @patch('src.async_check.dns.asyncresolver.resolve', new_callable=AsyncMock)
+    def test_shared_semaphore_limits_inflight(self, mock_async_resolve):
+        """Test a shared semaphore caps concurrent lookups"""
+        state = {'current': 0, 'peak': 0}
+
+        async def slow(domain, record_type, **kwargs):
+            state['current'] += 1
+            state['peak'] = max(state['peak'], state['current'])
+            await asyncio.sleep(0.005)
+            state['current'] -= 1
+            return MagicMock()
+
+        mock_async_resolve.side_effect = slow
+        emails = [f"user@d{i}.com" for i in range(30)]
+
+        async def run():
+            semaphore = asyncio.Semaphore(4)
+            return await collect(validate_many_async(emails, concurrency=50,
+                                                     semaphore=semaphore))
+
+        assert len(asyncio.run(run())) == 30
+        assert state['peak'] == 4
+
+    @patch('src.async_check.dns.asyncresolver.resolve', new_callable=AsyncMock)
+    def test_accepts_async_iterable(self, mock_async_resolve):
+        """Test async sources are consumed as well"""
+        mock_async_resolve.side_effect = fake_resolve
+
+        async def source():
+            for email in ["a@ok.com", "b@nx.com"]:
+                yield email
+
+        results = asyncio.run(collect(validate_many_async(source())))
+        assert [r.status for r in results] == [Status.VALID, Status.NO_DOMAIN]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,135 @@
+﻿"""
+Unit tests for checkpointed and resumable file runs
+"""
+import json
+import sys
+import time
+import pytest
+from unittest.mock import patch
+from src.checkpoint import Checkpoint
+from src.check_email import RunSummary, validate_email, main as check_email_main
+from src.verdict_store import VerdictStore
+
+
+def run_cli(*args):
+    """Run the validator CLI with the given arguments"""
+    with patch.object(sys, 'argv', ['check_email', *args]):
+        return check_email_main()
+
+
+@pytest.fixture
+def emails_file(tmp_path):
+    path = tmp_path / "emails.txt"
+    path.write_text("\n".join(f"user{i}@domain{i}.com" for i in range(6)) + "\n",
+                    encoding="utf-8")
+    return path
+
+
+class TestCheckpointFile:
+    """Test cases for the checkpoint file itself"""
+
+    def test_save_load_remove(self, tmp_path):
+        """Test the state round trip and removal"""
+        checkpoint = Checkpoint(str(tmp_path / "run.ckpt"))
+        assert checkpoint.load() is None
+        checkpoint.save({'position': 5})
+        assert checkpoint.load() == {'position': 5}
+        assert not (tmp_path / "run.ckpt.tmp").exists()
+        checkpoint.remove()
+        checkpoint.remove()
+        assert checkpoint.load() is None
+
+    def test_corrupt_file(self, tmp_path):
+        """Test a damaged checkpoint is reported"""
+        path = tmp_path / "run.ckpt"
+        path.write_text("{broken")
+        with pytest.raises(ValueError, match="Повреждён"):
+            Checkpoint(str(path)).load()
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_summary_round_trip(self, mock_resolve):
+        """Test RunSummary survives serialization"""
+        mock_resolve.return_value = []
+        summary = RunSummary()
+        summary.add(validate_email("a@example.com"))
+        summary.add(validate_email("bad"))
+        restored = RunSummary.from_dict(json.loads(json.dumps(summary.to_dict())))
+        assert restored.lines() == summary.lines()
+
+
+class TestResume:
+    """Test cases for interrupted and resumed CLI runs"""
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_interrupt_and_resume(self, mock_resolve, emails_file, tmp_path, capsys):
+        """Test a resumed run produces the same output as an uninterrupted one"""
+        output = tmp_path / "out.txt"
+        ckpt = tmp_path / "run.ckpt"
+        common = ['-f', str(emails_file), '-o', str(output), '-c', str(tmp_path / "none.ini"),
+                  '--checkpoint', str(ckpt), '--checkpoint-every', '2']
+
+        def interrupted(domain, record_type):
+            if domain == "domain3.com":
+                raise KeyboardInterrupt
+            return []
+
+        mock_resolve.side_effect = interrupted
+        with pytest.raises(KeyboardInterrupt):
+            run_cli(*common)
+        state = json.loads(ckpt.read_text(encoding="utf-8"))
+        assert state['position'] == 3
+        assert state['summary']['total'] == 3
+
+        mock_resolve.side_effect = None
+        mock_resolve.return_value = []
+        summary = run_cli(*common, '--resume')
+        assert summary.total == 6
+        assert summary.valid == 6
+        assert not ckpt.exists()
+        # Адреса 0-2 не проверяются повторно
+        assert [c.args[0] for c in mock_resolve.call_args_list[-3:]] == [
+            "domain3.com", "domain4.com", "domain5.com"]
+        lines = output.read_text(encoding="utf-8").splitlines()
+        assert [line.split(":")[0] for line in lines[:6]] == [
+            f"user{i}@domain{i}.com" for i in range(6)]
+        assert "Всего проверено: 6" in lines
+
+    def test_resume_other_file(self, emails_file, tmp_path):
+        """Test a checkpoint of another input file is refused"""
+        ckpt = tmp_path / "run.ckpt"
+        Checkpoint(str(ckpt)).save({'file': "/elsewhere.txt", 'position': 1})
+        with pytest.raises(SystemExit):
+            run_cli('-f', str(emails_file), '--checkpoint', str(ckpt), '--resume')
+
+    def test_resume_requires_checkpoint(self, emails_file):
+        """Test --resume without --checkpoint is an error"""
+        with pytest.raises(SystemExit):
+            run_cli('-f', str(emails_file), '--resume')
+
+
+class TestOnlyExpired:
+    """Test cases for re-validating only expired verdicts"""
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_fresh_domains_skipped(self, mock_resolve, emails_file, tmp_path, capsys):
+        """Test addresses with a fresh stored verdict are not rechecked"""
+        db = tmp_path / "verdicts.db"
+        with VerdictStore(str(db)) as store:
+            store.put("domain0.com", hosts=("mx.domain0.com",))
+            store.put("domain1.com", hosts=("mx.domain1.com",))
+        # Вердикт, сохранённый двое суток назад, уже устарел
+        with VerdictStore(str(db), clock=lambda: time.time() - 2 * 86400) as store:
+            store.put("domain2.com", hosts=("mx.domain2.com",))
+        mock_resolve.return_value = []
+
+        summary = run_cli('-f', str(emails_file), '--cache-db', str(db), '--only-expired',
+                          '-c', str(tmp_path / "none.ini"))
+        assert summary.total == 4
+        assert [c.args[0] for c in mock_resolve.call_args_list] == [
+            "domain2.com", "domain3.com", "domain4.com", "domain5.com"]
+        assert "user0@domain0.com" not in capsys.readouterr().out
+
+    def test_requires_cache_db(self, emails_file):
+        """Test --only-expired needs a verdict store"""
+        with pytest.raises(SystemExit):
+            run_cli('-f', str(emails_file), '--only-expired')
@@ -0,0 +1,130 @@
+﻿"""
+Unit tests for the per-domain DNS result cache
+"""
+import pytest
+from unittest.mock import patch, MagicMock
+import dns.resolver
+from src.dns_cache import DomainCache, normalize_domain
+from src.check_email import check_email, resolve_mx
+
+
+class FakeClock:
+    """Manually advanced clock for TTL tests"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDomainCache:
+    """Test cases for DomainCache"""
+
+    def test_normalize_domain(self):
+        """Test domain keys are case and trailing-dot insensitive"""
+        assert normalize_domain(" Gmail.COM. ") == "gmail.com"
+
+    def test_miss_then_hit(self):
+        """Test hit and miss counters"""
+        cache = DomainCache()
+        assert cache.lookup("gmail.com") is None
+        cache.store("gmail.com", hosts=["mx.gmail.com"])
+        assert cache.lookup("GMAIL.com") == (["mx.gmail.com"], None)
+        assert cache.stats() == {'size': 1, 'hits': 1, 'misses': 1}
+
+    def test_negative_entry(self):
+        """Test negative answers are stored with their error class"""
+        cache = DomainCache()
+        cache.store("nope.example", error=dns.resolver.NXDOMAIN)
+        assert cache.lookup("nope.example") == (None, dns.resolver.NXDOMAIN)
+
+    def test_entry_expires(self):
+        """Test entries are dropped after their TTL"""
+        clock = FakeClock()
+        cache = DomainCache(min_ttl=1, clock=clock)
+        cache.store("gmail.com", hosts=[], ttl=10)
+        clock.now += 9
+        assert cache.lookup("gmail.com") is not None
+        clock.now += 2
+        assert cache.lookup("gmail.com") is None
+        assert len(cache) == 0
+
+    def test_ttl_is_clamped(self):
+        """Test TTL from the answer is clamped to configured bounds"""
+        clock = FakeClock()
+        cache = DomainCache(min_ttl=60, max_ttl=120, clock=clock)
+        cache.store("a.com", hosts=[], ttl=0)
+        cache.store("b.com", hosts=[], ttl=10 ** 6)
+        clock.now += 61
+        assert cache.lookup("a.com") is None
+        assert cache.lookup("b.com") is not None
+
+    def test_lru_eviction(self):
+        """Test least recently used domain is evicted first"""
+        cache = DomainCache(maxsize=2)
+        cache.store("a.com", hosts=[])
+        cache.store("b.com", hosts=[])
+        cache.lookup("a.com")
+        cache.store("c.com", hosts=[])
+        assert cache.lookup("b.com") is None
+        assert cache.lookup("a.com") is not None
+        assert cache.lookup("c.com") is not None
+
+
+class TestResolveWithCache:
+    """Test cases for cached MX resolution in check_email"""
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_same_domain_resolved_once(self, mock_dns_resolve):
+        """Test repeated domains are served from the cache"""
+        mock_dns_resolve.return_value = MagicMock()
+        cache = DomainCache()
+
+        for email in ["a@gmail.com", "b@gmail.com", "c@GMAIL.com"]:
+            assert "✅" in check_email(email, cache)
+
+        assert mock_dns_resolve.call_count == 1
+        assert cache.hits == 2
+        assert cache.misses == 1
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_negative_answer_cached(self, mock_dns_resolve):
+        """Test NXDOMAIN is cached and re-raised"""
+        mock_dns_resolve.side_effect = dns.resolver.NXDOMAIN
+        cache = DomainCache()
+
+        assert "❌ домен отсутствует" in check_email("a@nope-12345.com", cache)
+        assert "❌ домен отсутствует" in check_email("b@nope-12345.com", cache)
+        assert mock_dns_resolve.call_count == 1
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_transient_error_not_cached(self, mock_dns_resolve):
+        """Test timeouts and other errors are not cached"""
+        mock_dns_resolve.side_effect = dns.resolver.LifetimeTimeout
+        cache = DomainCache()
+
+        check_email("a@slow.com", cache)
+        check_email("b@slow.com", cache)
+        assert mock_dns_resolve.call_count == 2
+        assert len(cache) == 0
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_mx_hosts_sorted_by_preference(self, mock_dns_resolve):
+        """Test MX hosts are returned in priority order"""
+        def record(preference, host):
+            rdata = MagicMock()
+            rdata.preference = preference
+            rdata.exchange.to_text.return_value = host
+            return rdata
+
+        answer = MagicMock()
+        answer.__iter__.return_value = iter([record(20, "mx2.a.com"), record(10, "mx1.a.com")])
+        answer.rrset.ttl = 300
+        mock_dns_resolve.return_value = answer
+
+        assert resolve_mx("a.com") == ("mx1.a.com", "mx2.a.com")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,120 @@
+﻿"""
+Unit tests for the known-domain index fast path
+"""
+import sys
+import pytest
+from unittest.mock import patch
+from src.domain_index import DomainIndex
+from src.check_email import (
+    check_email, validate_email, validate_many, Status, RunSummary,
+    main as check_email_main,
+)
+from src.async_check import validate_email_async
+
+
+@pytest.fixture
+def index():
+    index = DomainIndex()
+    index.add("mailinator.com", "disposable")
+    index.add("spam.example", "blocked")
+    index.add("gmail.com", "valid")
+    return index
+
+
+class TestDomainIndex:
+    """Test cases for DomainIndex lookups and loading"""
+
+    def test_exact_and_parent_match(self, index):
+        """Test a parent entry applies to subdomains"""
+        assert index.match("mailinator.com") == "disposable"
+        assert index.match("eu.mailinator.com.") == "disposable"
+        assert index.match("GMAIL.COM") == "valid"
+        assert index.match("example.com") is None
+        assert index.match("com") is None
+
+    def test_most_specific_wins(self, index):
+        """Test a subdomain entry overrides its parent"""
+        index.add("ok.spam.example", "valid")
+        assert index.match("mx.ok.spam.example") == "valid"
+        assert index.match("other.spam.example") == "blocked"
+
+    def test_unknown_verdict(self, index):
+        """Test an unknown verdict is rejected"""
+        with pytest.raises(ValueError):
+            index.add("example.com", "maybe")
+
+    def test_load_file(self, tmp_path):
+        """Test the file format with comments and default verdict"""
+        path = tmp_path / "domains.txt"
+        path.write_text("# список\nmailinator.com disposable\n\nbad.example\n"
+                        "gmail.com VALID  # комментарий\n", encoding="utf-8")
+        index = DomainIndex()
+        assert index.load(str(path)) == 3
+        assert len(index) == 3
+        assert index.match("bad.example") == "blocked"
+        assert index.match("gmail.com") == "valid"
+
+    def test_load_reports_line(self, tmp_path):
+        """Test malformed lines are reported with file and line number"""
+        path = tmp_path / "domains.txt"
+        path.write_text("ok.example valid\nbad.example nope\n", encoding="utf-8")
+        with pytest.raises(ValueError, match=r"domains\.txt:2"):
+            DomainIndex.from_files([str(path)])
+
+
+class TestIndexFastPath:
+    """Test cases for validation short-circuiting on indexed domains"""
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_no_dns_for_indexed_domains(self, mock_resolve, index):
+        """Test indexed domains never reach the resolver"""
+        assert validate_email("a@mailinator.com", index=index).status is Status.DISPOSABLE
+        assert validate_email("a@spam.example", index=index).status is Status.BLOCKED
+        result = validate_email("a@gmail.com", index=index)
+        assert result.status is Status.KNOWN_VALID
+        assert result.status.is_valid
+        assert check_email("b@spam.example", index=index) == "b@spam.example: ❌ домен заблокирован"
+        mock_resolve.assert_not_called()
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_syntax_checked_first(self, mock_resolve, index):
+        """Test malformed addresses are still rejected before the index"""
+        assert validate_email("bad@@gmail.com", index=index).status is Status.INVALID_SYNTAX
+
+    @pytest.mark.parametrize("workers", [1, 4])
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_validate_many_mixed(self, mock_resolve, workers, index):
+        """Test only unindexed domains are resolved in batch mode"""
+        mock_resolve.return_value = []
+        emails = ["a@mailinator.com", "b@example.org", "c@gmail.com", "d@example.org"]
+        statuses = [r.status for r in validate_many(emails, workers, index=index)]
+        assert statuses == [Status.DISPOSABLE, Status.VALID, Status.KNOWN_VALID, Status.VALID]
+        mock_resolve.assert_called_once_with("example.org", "MX")
+
+    def test_async_fast_path(self, index):
+        """Test the async validator uses the index too"""
+        import asyncio
+        with patch('src.async_check.dns.asyncresolver.resolve') as mock_resolve:
+            result = asyncio.run(validate_email_async("x@eu.mailinator.com", index=index))
+        assert result.status is Status.DISPOSABLE
+        mock_resolve.assert_not_called()
+
+    def test_summary_counts_known_valid(self, index):
+        """Test known-valid addresses count as valid in the summary"""
+        summary = RunSummary()
+        summary.add(validate_email("a@gmail.com", index=index))
+        summary.add(validate_email("a@mailinator.com", index=index))
+        assert summary.valid == 1
+        assert summary.invalid == 1
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_cli_domain_index(self, mock_resolve, tmp_path, capsys):
+        """Test --domain-index loads the file and skips DNS"""
+        index_file = tmp_path / "domains.txt"
+        index_file.write_text("mailinator.com disposable\n", encoding="utf-8")
+        with patch.object(sys, 'argv', ['check_email', '-e', 'a@mailinator.com',
+                                        '-c', str(tmp_path / "none.ini"),
+                                        '--domain-index', str(index_file)]):
+            check_email_main()
+        assert "a@mailinator.com: ❌ одноразовый почтовый домен" in capsys.readouterr().out
+        mock_resolve.assert_not_called()
@@ -3,8 +3,16 @@ Unit tests for email validator functionality
 """
 import pytest
 from unittest.mock import patch, MagicMock
-from src.check_email import check_email, process_file
+from src.check_email import (
+    check_email, process_file, validate_many, iter_emails, RunSummary,
+    validate_email, format_result, EmailResult, Status, group_by_domain,
+    validate_syntax,
+)
+from src.dns_cache import DomainCache
+import dns.name
 import dns.resolver
+import threading
+import time
 
 
 class TestEmailValidator:
@@ -108,6 +116,29 @@ class TestEmailValidator:
         emails = process_file(str(file_path))
         assert emails == ["test@gmail.com", "test2@yahoo.com"]
 
+    def test_iter_emails_is_lazy(self, tmp_path):
+        """Test addresses are read one line at a time"""
+        file_path = tmp_path / "emails.txt"
+        file_path.write_text("\ufefffirst@gmail.com\n\nsecond@yahoo.com\n", encoding='utf-8')
+        
+        emails = iter_emails(str(file_path))
+        assert next(emails) == "first@gmail.com"
+        assert list(emails) == ["second@yahoo.com"]
+
+    def test_iter_emails_not_found(self, capsys):
+        """Test missing file yields nothing"""
+        assert list(iter_emails("nonexistent_file.txt")) == []
+        assert "не найден" in capsys.readouterr().out
+
+    def test_run_summary_counts(self):
+        """Test summary counters update per result"""
+        summary = RunSummary()
+        summary.add(EmailResult("a@gmail.com", "gmail.com", Status.VALID))
+        summary.add(EmailResult("b@GMAIL.com", "GMAIL.com", Status.VALID))
+        summary.add(EmailResult("bad", None, Status.INVALID_SYNTAX))
+        assert (summary.total, summary.valid, summary.invalid) == (3, 2, 1)
+        assert summary.lines()[:2] == ["Всего проверено: 3", "Уникальных доменов: 1"]
+
     # Тест граничных случаев
     def test_email_with_special_characters(self):
         """Test email with special characters"""
@@ -123,6 +154,179 @@ class TestEmailValidator:
         assert isinstance(result, str)
 
 
+class TestValidateSyntax:
+    """Test cases for the network-free syntax validator"""
+
+    @pytest.mark.parametrize("email, domain", [
+        ("test@gmail.com", "gmail.com"),
+        ("user.name+tag@Sub.Domain.co.uk", "Sub.Domain.co.uk"),
+        ("o'brien@example.org", "example.org"),
+        ("user@xn--80a1acny.xn--p1ai", "xn--80a1acny.xn--p1ai"),
+        ("user@почта.рф", "xn--80a1acny.xn--p1ai"),
+        ("иван@почта.рф", "xn--80a1acny.xn--p1ai"),
+        ("a" * 64 + "@" + "b" * 63 + ".com", "b" * 63 + ".com"),
+    ])
+    def test_accepts(self, email, domain):
+        """Test practical RFC 5321/5322 addresses are accepted"""
+        assert validate_syntax(email) == domain
+
+    @pytest.mark.parametrize("email", [
+        "foo@@bar.com junk",
+        "foo@bar.com junk",
+        "John <john@example.com>",
+        "a..b@example.com",
+        ".a@example.com",
+        "a.@example.com",
+        "a" * 65 + "@example.com",
+        "user@" + "b" * 64 + ".com",
+        "user@" + ("a" * 60 + ".") * 5 + "com",
+        "user@exa_mple.com",
+        "user@domain-.com",
+        "user@1.2.3.4",
+        "user@[127.0.0.1]",
+        "user@localhost",
+        "user@domain.c",
+        "user name@example.com",
+    ])
+    def test_rejects(self, email):
+        """Test malformed addresses are rejected"""
+        assert validate_syntax(email) is None
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_rejected_before_dns(self, mock_dns_resolve):
+        """Test malformed input never reaches the resolver"""
+        result = validate_email("foo@@bar.com junk")
+        assert result.status is Status.INVALID_SYNTAX
+        mock_dns_resolve.assert_not_called()
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_idna_domain_resolved_in_ascii(self, mock_dns_resolve):
+        """Test national domains are looked up in their IDNA form"""
+        mock_dns_resolve.return_value = MagicMock()
+
+        result = validate_email("user@почта.рф")
+        assert result.domain == "xn--80a1acny.xn--p1ai"
+        assert mock_dns_resolve.call_args[0][0] == "xn--80a1acny.xn--p1ai"
+
+
+class TestStructuredResults:
+    """Test cases for EmailResult and its rendering"""
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_validate_email_fields(self, mock_dns_resolve):
+        """Test validate_email fills every field"""
+        mock_dns_resolve.side_effect = dns.resolver.NoAnswer
+
+        result = validate_email("  user@example.com ")
+        assert result == EmailResult("user@example.com", "example.com", Status.NO_MX)
+        assert not result.status.is_valid
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_error_detail_kept(self, mock_dns_resolve):
+        """Test unexpected DNS errors carry their message"""
+        mock_dns_resolve.side_effect = Exception("DNS error")
+
+        result = validate_email("user@example.com")
+        assert result.status is Status.ERROR
+        assert result.error == "DNS error"
+
+    def test_invalid_syntax_skips_dns(self):
+        """Test syntax errors are reported without a domain"""
+        result = validate_email("invalid-email")
+        assert result.status is Status.INVALID_SYNTAX
+        assert result.domain is None
+
+    def test_empty_input(self):
+        """Test blank lines produce no result"""
+        assert validate_email("   ") is None
+
+    @pytest.mark.parametrize("status, text", [
+        (Status.VALID, "✅ домен валиден (MX записи найдены)"),
+        (Status.INVALID_SYNTAX, "❌ некорректный email"),
+        (Status.NO_DOMAIN, "❌ домен отсутствует"),
+        (Status.NO_MX, "⚠️ MX-записи отсутствуют"),
+    ])
+    def test_format_result(self, status, text):
+        """Test rendering matches the historical output"""
+        assert format_result(EmailResult("a@b.com", "b.com", status)) == f"a@b.com: {text}"
+
+    def test_format_result_error(self):
+        """Test error rendering includes the detail"""
+        result = EmailResult("a@b.com", "b.com", Status.ERROR, error="timeout")
+        assert format_result(result) == "a@b.com: ❌ ошибка проверки: timeout"
+
+
+class TestValidateMany:
+    """Test cases for concurrent bulk validation"""
+
+    @staticmethod
+    def fake_resolve(domain, record_type, **kwargs):
+        if domain.startswith("nx"):
+            raise dns.resolver.NXDOMAIN
+        if domain.startswith("nomx"):
+            raise dns.resolver.NoAnswer
+        return MagicMock()
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_results_match_sequential_path(self, mock_dns_resolve):
+        """Test parallel results equal check_email results in input order"""
+        mock_dns_resolve.side_effect = self.fake_resolve
+        emails = ["a@ok.com", "bad", "b@nx.com", "c@nomx.com", "", "d@ok.org"] * 5
+
+        expected = [validate_email(email) for email in emails]
+        assert list(validate_many(emails, concurrency=4)) == expected
+        assert list(validate_many(emails, concurrency=1)) == expected
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_concurrency_is_bounded(self, mock_dns_resolve):
+        """Test no more than `concurrency` lookups run at once"""
+        lock = threading.Lock()
+        state = {'current': 0, 'peak': 0}
+
+        def slow_resolve(domain, record_type, **kwargs):
+            with lock:
+                state['current'] += 1
+                state['peak'] = max(state['peak'], state['current'])
+            time.sleep(0.01)
+            with lock:
+                state['current'] -= 1
+            return MagicMock()
+
+        mock_dns_resolve.side_effect = slow_resolve
+        emails = [f"user{i}@domain{i}.com" for i in range(40)]
+
+        results = list(validate_many(emails, concurrency=3))
+        assert len(results) == 40
+        assert 1 < state['peak'] <= 3
+
+    @pytest.mark.parametrize("concurrency", [1, 4])
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_each_domain_resolved_once(self, mock_dns_resolve, concurrency):
+        """Test addresses sharing a domain trigger a single lookup"""
+        mock_dns_resolve.side_effect = self.fake_resolve
+        emails = [f"user{i}@{d}" for i in range(50) for d in ("ok.com", "OK.com", "nx.com")]
+
+        results = list(validate_many(emails, concurrency=concurrency, batch_size=1000))
+        assert len(results) == 150
+        assert mock_dns_resolve.call_count == 2
+        assert sum(r.status is Status.NO_DOMAIN for r in results) == 50
+
+    def test_group_by_domain(self):
+        """Test the grouping pre-pass keeps order and normalizes domains"""
+        parsed, groups = group_by_domain(["a@Gmail.com", "", "bad", "b@gmail.com", "c@mail.ru"])
+        assert parsed == [("a@Gmail.com", "Gmail.com"), None, ("bad", None),
+                          ("b@gmail.com", "gmail.com"), ("c@mail.ru", "mail.ru")]
+        assert groups == {"gmail.com": [0, 3], "mail.ru": [4]}
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_timeout_passed_as_lifetime(self, mock_dns_resolve):
+        """Test per-query timeout is forwarded to the resolver"""
+        mock_dns_resolve.return_value = MagicMock()
+
+        list(validate_many(["a@ok.com"], concurrency=2, timeout=1.5))
+        assert mock_dns_resolve.call_args.kwargs['lifetime'] == 1.5
+
+
 class TestEmailValidatorIntegration:
     """Integration tests for email validator"""
     
@@ -145,5 +349,115 @@ class TestEmailValidatorIntegration:
             assert email in result
 
 
+class TestNullAndImplicitMX:
+    """Test cases for RFC 7505 null MX and the RFC 5321 address fallback"""
+
+    @staticmethod
+    def mx_answer(*records):
+        answer = MagicMock()
+        answer.rrset = [MagicMock(preference=preference, exchange=dns.name.from_text(host))
+                        for preference, host in records]
+        answer.__iter__.side_effect = lambda: iter(answer.rrset)
+        return answer
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_null_mx(self, mock_dns_resolve):
+        """Test "0 ." means the domain accepts no mail, without address queries"""
+        mock_dns_resolve.return_value = self.mx_answer((0, "."))
+        result = validate_email("user@nomail.com")
+        assert result.status is Status.NULL_MX
+        assert not result.status.is_valid
+        assert "не принимает почту" in format_result(result)
+        mock_dns_resolve.assert_called_once_with("nomail.com", 'MX')
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_null_record_among_real_ones_ignored(self, mock_dns_resolve):
+        """Test a stray "." next to real MX records is not a host"""
+        mock_dns_resolve.return_value = self.mx_answer((0, "."), (10, "mx.a.com."))
+        result = validate_email("user@a.com")
+        assert result.status is Status.VALID
+        assert result.mx_hosts == ("mx.a.com",)
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_implicit_mx_from_a_record(self, mock_dns_resolve):
+        """Test a domain without MX but with an A record is valid"""
+        def resolve(domain, record_type):
+            if record_type == 'MX':
+                raise dns.resolver.NoAnswer
+            if record_type == 'A':
+                return MagicMock()
+            raise dns.resolver.NoAnswer
+
+        mock_dns_resolve.side_effect = resolve
+        result = validate_email("user@bare.com")
+        assert result.status is Status.IMPLICIT_MX
+        assert result.status.is_valid
+        assert result.mx_hosts == ("bare.com",)
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_implicit_mx_from_aaaa_only(self, mock_dns_resolve):
+        """Test an IPv6-only domain also gets the implicit MX"""
+        def resolve(domain, record_type):
+            if record_type == 'AAAA':
+                return MagicMock()
+            raise dns.resolver.NoAnswer
+
+        mock_dns_resolve.side_effect = resolve
+        assert validate_email("user@v6.com").status is Status.IMPLICIT_MX
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_a_and_aaaa_queried_concurrently(self, mock_dns_resolve):
+        """Test the address queries overlap instead of running back to back"""
+        barrier = threading.Barrier(2, timeout=2)
+
+        def resolve(domain, record_type):
+            if record_type == 'MX':
+                raise dns.resolver.NoAnswer
+            # Оба запроса должны дойти сюда одновременно
+            barrier.wait()
+            raise dns.resolver.NoAnswer
+
+        mock_dns_resolve.side_effect = resolve
+        assert validate_email("user@nomx.com").status is Status.NO_MX
+        assert [c.args[1] for c in mock_dns_resolve.call_args_list].count('MX') == 1
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_no_fallback_when_not_needed(self, mock_dns_resolve):
+        """Test NXDOMAIN and found MX records trigger no address queries"""
+        mock_dns_resolve.side_effect = dns.resolver.NXDOMAIN
+        assert validate_email("user@nx.com").status is Status.NO_DOMAIN
+        assert mock_dns_resolve.call_count == 1
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_fallback_failure_reported(self, mock_dns_resolve):
+        """Test a timeout on the address queries is an error, not "no MX" """
+        def resolve(domain, record_type):
+            if record_type == 'MX':
+                raise dns.resolver.NoAnswer
+            raise dns.resolver.LifetimeTimeout(timeout=1.0, errors=[])
+
+        mock_dns_resolve.side_effect = resolve
+        assert validate_email("user@slow.com").status is Status.ERROR
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_verdicts_cached(self, mock_dns_resolve):
+        """Test null and implicit MX verdicts are served from the cache"""
+        def resolve(domain, record_type):
+            if domain == "nomail.com":
+                return self.mx_answer((0, "."))
+            if record_type == 'MX':
+                raise dns.resolver.NoAnswer
+            return MagicMock()
+
+        mock_dns_resolve.side_effect = resolve
+        cache = DomainCache()
+        for _ in range(2):
+            assert validate_email("a@nomail.com", cache).status is Status.NULL_MX
+            result = validate_email("b@bare.com", cache)
+            assert result.status is Status.IMPLICIT_MX
+            assert result.mx_hosts == ("bare.com",)
+        assert cache.hits == 2
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
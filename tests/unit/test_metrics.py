@@ -0,0 +1,162 @@
+﻿"""
+Unit tests for stage timing and metrics export
+"""
+import asyncio
+import pickle
+import sys
+import pytest
+from unittest.mock import patch
+import dns.resolver
+from src.metrics import Histogram, Metrics, OTHER_DOMAINS
+from src.check_email import validate_email, validate_many, main as check_email_main
+from src.async_check import validate_many_async
+
+
+def fake_resolve(domain, record_type):
+    if domain.startswith("nx"):
+        raise dns.resolver.NXDOMAIN
+    return []
+
+
+class TestHistogram:
+    """Test cases for Histogram"""
+
+    def test_buckets_and_quantiles(self):
+        """Test observations land in the right buckets"""
+        h = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.05, 0.5, 2.0):
+            h.observe(value)
+        assert h.counts == [2, 1, 1]
+        assert h.cumulative() == [(0.1, 2), (1.0, 3), (float('inf'), 4)]
+        assert h.quantile(0.5) == 0.1
+        assert h.quantile(0.75) == 1.0
+        assert h.quantile(1.0) == 2.0
+        assert h.max == 2.0
+
+    def test_merge(self):
+        """Test merging adds counts and sums"""
+        a, b = Histogram(), Histogram()
+        a.observe(0.01)
+        b.observe(0.02)
+        a.merge(b)
+        assert a.count == 2
+        assert a.sum == pytest.approx(0.03)
+
+
+class TestMetrics:
+    """Test cases for the Metrics collector"""
+
+    def test_hooks_receive_observations(self):
+        """Test user hooks see every measurement"""
+        metrics = Metrics()
+        seen = []
+        metrics.add_hook(lambda stage, seconds, domain: seen.append((stage, domain)))
+        with metrics.timer('resolve', 'example.com'):
+            pass
+        metrics.observe('syntax', 0.001)
+        assert seen == [('resolve', 'example.com'), ('syntax', None)]
+        assert metrics.stages['resolve'].count == 1
+        assert metrics.domains['example.com'].count == 1
+
+    def test_domain_limit(self):
+        """Test domains beyond max_domains are folded together"""
+        metrics = Metrics(max_domains=2)
+        for domain in ("a.com", "b.com", "c.com", "d.com"):
+            metrics.observe('resolve', 0.01, domain)
+        assert set(metrics.domains) == {"a.com", "b.com", OTHER_DOMAINS}
+        assert metrics.domains[OTHER_DOMAINS].count == 2
+
+    def test_picklable(self):
+        """Test metrics can be sent between processes"""
+        metrics = Metrics()
+        metrics.add_hook(print)
+        metrics.observe('resolve', 0.01, 'a.com')
+        copy = pickle.loads(pickle.dumps(metrics))
+        copy.observe('resolve', 0.02, 'a.com')
+        assert copy.domains['a.com'].count == 2
+
+    def test_prometheus_text(self):
+        """Test the exposition format"""
+        metrics = Metrics(buckets=(0.1,))
+        metrics.observe('resolve', 0.05, 'ex"ample.com')
+        text = metrics.prometheus_text()
+        assert "# TYPE email_validator_stage_seconds histogram" in text
+        assert 'email_validator_stage_seconds_bucket{stage="resolve",le="0.1"} 1' in text
+        assert 'email_validator_stage_seconds_bucket{stage="resolve",le="+Inf"} 1' in text
+        assert 'email_validator_stage_seconds_count{stage="resolve"} 1' in text
+        assert 'email_validator_domain_resolve_seconds_count{domain="ex\\"ample.com"} 1' in text
+
+
+class TestInstrumentation:
+    """Test cases for stage timing in the validation paths"""
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_validate_email_stages(self, mock_resolve):
+        """Test a single check records syntax, resolve and classify"""
+        mock_resolve.side_effect = fake_resolve
+        metrics = Metrics()
+        validate_email("a@ok.com", metrics=metrics)
+        validate_email("bad", metrics=metrics)
+        assert metrics.stages['syntax'].count == 2
+        assert metrics.stages['resolve'].count == 1
+        assert metrics.stages['classify'].count == 1
+        assert list(metrics.domains) == ["ok.com"]
+
+    @pytest.mark.parametrize("workers", [1, 3])
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_validate_many_stages(self, mock_resolve, workers):
+        """Test batch mode resolves each domain once and times every address"""
+        mock_resolve.side_effect = fake_resolve
+        metrics = Metrics()
+        emails = ["a@ok.com", "b@ok.com", "c@nx.com", "bad"]
+        list(validate_many(emails, workers, metrics=metrics))
+        assert metrics.stages['syntax'].count == 4
+        assert metrics.stages['resolve'].count == 2
+        assert metrics.stages['classify'].count == 3
+        assert set(metrics.domains) == {"ok.com", "nx.com"}
+
+    def test_async_stages(self):
+        """Test the async path records resolve per domain"""
+        metrics = Metrics()
+
+        async def collect():
+            return [r async for r in validate_many_async(["a@ok.com", "b@nx.com"],
+                                                         metrics=metrics)]
+
+        async def fake_async_resolve(domain, record_type, **kwargs):
+            return fake_resolve(domain, record_type)
+
+        with patch('src.async_check.dns.asyncresolver.resolve', side_effect=fake_async_resolve):
+            asyncio.run(collect())
+        assert metrics.stages['resolve'].count == 2
+        assert set(metrics.domains) == {"ok.com", "nx.com"}
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_cli_stats_and_prometheus(self, mock_resolve, tmp_path, capsys):
+        """Test --stats prints the report and --metrics-file writes metrics"""
+        mock_resolve.side_effect = fake_resolve
+        emails = tmp_path / "emails.txt"
+        emails.write_text("a@ok.com\nb@nx.com\n")
+        prom = tmp_path / "metrics.prom"
+        with patch.object(sys, 'argv', ['check_email', '-f', str(emails), '--stats',
+                                        '--metrics-file', str(prom),
+                                        '-c', str(tmp_path / "none.ini")]):
+            check_email_main()
+        out = capsys.readouterr().out
+        assert "Время по этапам:" in out
+        assert "Самые медленные домены:" in out
+        text = prom.read_text(encoding="utf-8")
+        assert 'email_validator_stage_seconds_count{stage="output"} 2' in text
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="fork start method required")
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_sharded_metrics_merged(self, mock_resolve, tmp_path):
+        """Test per-process metrics are merged in sharded mode"""
+        from src.sharding import run_sharded
+        mock_resolve.side_effect = fake_resolve
+        path = tmp_path / "emails.txt"
+        path.write_text("\n".join(f"u{i}@d{i}.com" for i in range(6)) + "\n")
+        metrics = Metrics()
+        run_sharded(str(path), 2, lambda result: None, start_method='fork', metrics=metrics)
+        assert metrics.stages['resolve'].count == 6
+        assert len(metrics.domains) == 6
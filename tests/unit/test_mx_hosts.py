@@ -0,0 +1,193 @@
+﻿"""
+Unit tests for MX host resolution and provider fingerprinting
+"""
+import sys
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+import dns.resolver
+from src.mx_hosts import MXHostResolver, provider_of, OTHER_PROVIDER
+from src.check_email import (
+    EmailResult, RunSummary, Status, format_result, validate_many,
+    main as check_email_main,
+)
+
+GOOGLE = ("aspmx.l.google.com", "alt1.aspmx.l.google.com")
+
+
+def address_answer(*addresses, ttl=300):
+    answer = MagicMock()
+    answer.__iter__.side_effect = lambda: iter(
+        [MagicMock(**{'to_text.return_value': address}) for address in addresses])
+    answer.rrset.ttl = ttl
+    return answer
+
+
+def fake_resolve(domain, record_type, **kwargs):
+    """MX by domain name prefix, addresses for every host except dead.* ones"""
+    if record_type == 'MX':
+        hosts = GOOGLE if domain.startswith("g") else (f"mx.{domain}",)
+        answer = MagicMock()
+        answer.__iter__.side_effect = lambda: iter([
+            MagicMock(preference=10 * i, exchange=MagicMock(**{
+                'to_text.return_value': host}))
+            for i, host in enumerate(hosts)])
+        answer.rrset = None
+        return answer
+    if domain.startswith("mx.dead"):
+        raise dns.resolver.NXDOMAIN
+    return address_answer("192.0.2.1" if record_type == 'A' else "2001:db8::1")
+
+
+class TestProviderOf:
+    """Test cases for provider_of"""
+
+    @pytest.mark.parametrize("hosts, provider", [
+        (GOOGLE, "google"),
+        (("example-com.mail.protection.outlook.com",), "microsoft"),
+        (("mx.yandex.net",), "yandex"),
+        (("mxs.mail.ru",), "mailru"),
+        (("MX01.Mail.iCloud.com.",), "icloud"),
+        (("mx.example.com",), OTHER_PROVIDER),
+        # Совпадение только по границе меток
+        (("mx.notgoogle.com",), OTHER_PROVIDER),
+        (("mx.example.com", "aspmx.l.google.com"), "google"),
+        ((), OTHER_PROVIDER),
+    ])
+    def test_patterns(self, hosts, provider):
+        """Test MX host names map to providers"""
+        assert provider_of(hosts) == provider
+
+
+class TestMXHostResolver:
+    """Test cases for MXHostResolver"""
+
+    @patch('src.mx_hosts.dns.resolver.resolve')
+    def test_host_cache_shared_across_domains(self, mock_resolve):
+        """Test each host is resolved once however many domains use it"""
+        mock_resolve.side_effect = fake_resolve
+        stage = MXHostResolver()
+        for i in range(50):
+            result = EmailResult(f"u@g{i}.com", f"g{i}.com", Status.VALID, GOOGLE)
+            assert stage.apply(result).provider == "google"
+        # Первый хост отвечает, до второго дело не доходит
+        assert sorted(c.args[1] for c in mock_resolve.call_args_list) == ['A', 'AAAA']
+        assert stage.addresses(GOOGLE[0]) == ("192.0.2.1", "2001:db8::1")
+        assert stage.stats()['size'] == 1
+
+    @patch('src.mx_hosts.dns.resolver.resolve')
+    def test_a_and_aaaa_concurrent(self, mock_resolve):
+        """Test the address queries of a host overlap"""
+        barrier = threading.Barrier(2, timeout=2)
+
+        def resolve(host, record_type, **kwargs):
+            barrier.wait()
+            return address_answer("192.0.2.1")
+
+        mock_resolve.side_effect = resolve
+        assert MXHostResolver().addresses("mx.a.com") == ("192.0.2.1", "192.0.2.1")
+
+    @patch('src.mx_hosts.dns.resolver.resolve')
+    def test_close_stops_pool(self, mock_resolve):
+        """Test the AAAA pool is created on demand and released by close"""
+        mock_resolve.side_effect = fake_resolve
+        stage = MXHostResolver(workers=2)
+        assert stage._pool is None
+        stage.addresses("mx.a.com")
+        assert stage._pool is not None
+        stage.close()
+        assert stage._pool is None
+        # После close пул создаётся заново
+        assert stage.addresses("mx.b.com")
+        stage.close()
+
+    @patch('src.mx_hosts.dns.resolver.resolve')
+    def test_unresolvable_mx(self, mock_resolve):
+        """Test a domain whose MX hosts have no addresses is flagged"""
+        mock_resolve.side_effect = fake_resolve
+        stage = MXHostResolver()
+        result = stage.apply(EmailResult("u@dead.com", "dead.com", Status.VALID,
+                                         ("mx.dead.com",)))
+        assert result.status is Status.MX_UNRESOLVED
+        assert not result.status.is_valid
+        assert result.provider == OTHER_PROVIDER
+        assert "нет адресов" in format_result(result)
+        # Отрицательный ответ тоже кэшируется
+        calls = mock_resolve.call_count
+        stage.apply(EmailResult("v@dead.com", "dead.com", Status.VALID, ("mx.dead.com",)))
+        assert mock_resolve.call_count == calls
+
+    @patch('src.mx_hosts.dns.resolver.resolve')
+    def test_timeout_keeps_status(self, mock_resolve):
+        """Test lookup failures do not turn a domain invalid"""
+        mock_resolve.side_effect = dns.resolver.LifetimeTimeout(timeout=1.0, errors=[])
+        result = MXHostResolver().apply(
+            EmailResult("u@a.com", "a.com", Status.VALID, ("mx.a.com",)))
+        assert result.status is Status.VALID
+        assert result.provider == OTHER_PROVIDER
+
+    @patch('src.mx_hosts.dns.resolver.resolve')
+    def test_other_statuses_untouched(self, mock_resolve):
+        """Test results without working MX hosts are passed through"""
+        stage = MXHostResolver()
+        for result in [EmailResult("bad", None, Status.INVALID_SYNTAX),
+                       EmailResult("u@nx.com", "nx.com", Status.NO_DOMAIN),
+                       EmailResult("u@d.com", "d.com", Status.DISPOSABLE)]:
+            assert stage.apply(result) is result
+        mock_resolve.assert_not_called()
+
+
+class TestProviderReports:
+    """Test cases for provider grouping in bulk runs"""
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_validate_many_with_stage(self, mock_resolve):
+        """Test results keep order and carry the provider"""
+        mock_resolve.side_effect = fake_resolve
+        emails = ["a@g1.com", "bad", "b@dead.com", "c@own.com", "d@g2.com"]
+        results = list(validate_many(emails, concurrency=3, mx_resolver=MXHostResolver()))
+        assert [r.email for r in results] == emails
+        assert [r.provider for r in results] == [
+            "google", None, OTHER_PROVIDER, OTHER_PROVIDER, "google"]
+        assert results[2].status is Status.MX_UNRESOLVED
+
+    def test_summary_groups_by_provider(self):
+        """Test RunSummary counts providers, merges and survives a round trip"""
+        summary = RunSummary()
+        for provider in ["google", "google", "yandex", None]:
+            summary.add(EmailResult("u@a.com", "a.com", Status.VALID, provider=provider))
+        other = RunSummary()
+        other.add(EmailResult("u@b.com", "b.com", Status.VALID, provider="yandex"))
+        summary.merge(other)
+        assert summary.providers == {"google": 2, "yandex": 2}
+        assert summary.lines()[-1] == "По провайдерам: google 2, yandex 2"
+        assert summary.stats_record()['providers'] == {"google": 2, "yandex": 2}
+        assert RunSummary.from_dict(summary.to_dict()).providers == summary.providers
+
+    def test_summary_without_providers(self):
+        """Test the report is unchanged when the stage is off"""
+        summary = RunSummary()
+        summary.add(EmailResult("u@a.com", "a.com", Status.VALID))
+        assert len(summary.lines()) == 4
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_cli_flag(self, mock_resolve, tmp_path, capsys):
+        """Test --mx-hosts prints the provider breakdown and host cache stats"""
+        mock_resolve.side_effect = fake_resolve
+        email_file = tmp_path / "emails.txt"
+        email_file.write_text("a@g1.com\nb@g2.com\nc@own.com\n")
+        original_argv = sys.argv
+        try:
+            sys.argv = ['check_email.py', '--file', str(email_file), '--mx-hosts']
+            summary = check_email_main()
+        finally:
+            sys.argv = original_argv
+
+        out = capsys.readouterr().out
+        assert "По провайдерам: google 2, other 1" in out
+        assert "Кэш адресов MX-хостов: хостов 2" in out
+        assert summary.valid == 3
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
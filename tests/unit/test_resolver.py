@@ -0,0 +1,130 @@
+﻿"""
+Unit tests for resolver configuration
+"""
+import sys
+import pytest
+from unittest.mock import patch, MagicMock
+import dns.resolver
+from benchmarks.fake_dns import FakeDNSServer
+from src.resolver import (
+    load_dns_settings, make_resolver, make_async_resolver, parse_nameservers,
+    ImplicitMX, implicit_mx_error, is_null_mx,
+)
+from src.check_email import check_email, validate_many, Status, main as check_email_main
+
+
+class TestResolverSettings:
+    """Test cases for DNS settings loading"""
+
+    def test_parse_nameservers(self):
+        """Test comma and space separated lists"""
+        assert parse_nameservers("8.8.8.8, 1.1.1.1 9.9.9.9") == ["8.8.8.8", "1.1.1.1", "9.9.9.9"]
+        assert parse_nameservers("") == []
+
+    def test_load_existing_timeout(self, valid_config):
+        """Test the existing [email] timeout becomes the query lifetime"""
+        assert load_dns_settings(valid_config) == {'lifetime': 10.0}
+
+    def test_load_full_section(self, tmp_path):
+        """Test every supported key"""
+        config_file = tmp_path / "config.ini"
+        config_file.write_text("""[email]
+timeout = 4
+server_timeout = 1.5
+nameservers = 8.8.8.8, 1.1.1.1
+rotate = yes
+""")
+        assert load_dns_settings(str(config_file)) == {
+            'lifetime': 4.0,
+            'timeout': 1.5,
+            'nameservers': ["8.8.8.8", "1.1.1.1"],
+            'rotate': True,
+        }
+
+    def test_missing_config(self):
+        """Test a missing file gives no settings"""
+        assert load_dns_settings("nonexistent.ini") == {}
+
+    def test_make_resolver(self):
+        """Test explicit settings are applied"""
+        resolver = make_resolver(["8.8.8.8", "1.1.1.1"], timeout=1.5, lifetime=4, rotate=True)
+        assert resolver.nameservers == ["8.8.8.8", "1.1.1.1"]
+        assert (resolver.timeout, resolver.lifetime, resolver.rotate) == (1.5, 4, True)
+
+    def test_make_async_resolver(self):
+        """Test the async resolver gets the same settings"""
+        resolver = make_async_resolver(["8.8.8.8"], lifetime=3)
+        assert resolver.nameservers == ["8.8.8.8"]
+        assert resolver.lifetime == 3
+
+
+class TestResolverInjection:
+    """Test cases for passing a Resolver into the validator"""
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_injected_resolver_used(self, mock_module_resolve):
+        """Test the given resolver replaces the module-level one"""
+        resolver = MagicMock()
+        resolver.resolve.side_effect = dns.resolver.NXDOMAIN
+
+        results = list(validate_many(["a@x.com", "b@y.com"], concurrency=2, resolver=resolver))
+        assert [r.status for r in results] == [Status.NO_DOMAIN, Status.NO_DOMAIN]
+        assert resolver.resolve.call_count == 2
+        mock_module_resolve.assert_not_called()
+
+    def test_failover_to_next_nameserver(self):
+        """Test an unreachable first server fails over to the second"""
+        with FakeDNSServer() as server:
+            resolver = make_resolver(["127.0.0.2", server.host], timeout=0.5, lifetime=3,
+                                     port=server.port)
+            assert "✅" in check_email("user@example.test", resolver=resolver)
+            assert server.queries == 1
+
+    def test_cli_nameservers(self, tmp_path, capsys):
+        """Test --nameservers and --timeout build the shared resolver"""
+        email_file = tmp_path / "emails.txt"
+        email_file.write_text("a@one.test\nb@two.test\n")
+        original_argv = sys.argv
+
+        with FakeDNSServer() as server:
+            try:
+                sys.argv = ['check_email.py', '--file', str(email_file), '--nameservers',
+                            server.host, '--timeout', '2']
+                with patch('src.check_email.make_resolver',
+                           side_effect=lambda **kw: make_resolver(port=server.port, **kw)) as factory:
+                    summary = check_email_main()
+            finally:
+                sys.argv = original_argv
+
+        assert factory.call_args.kwargs == {'nameservers': [server.host], 'lifetime': 2.0}
+        assert summary.valid == 2
+
+
+class TestMXVerdicts:
+    """Test cases for null MX detection and the address fallback verdict"""
+
+    def test_null_mx_over_stub(self):
+        """Test the "0 ." record from a real response is recognised"""
+        with FakeDNSServer(nullmx_ratio=1.0) as server:
+            answer = server.resolver().resolve("nomail.test", "MX")
+        assert is_null_mx(answer)
+
+    def test_regular_mx_is_not_null(self):
+        """Test ordinary and empty answers are not null MX"""
+        with FakeDNSServer() as server:
+            assert not is_null_mx(server.resolver().resolve("mail.test", "MX"))
+        assert not is_null_mx(MagicMock())
+        assert not is_null_mx(None)
+
+    def test_implicit_mx_error(self):
+        """Test the verdict from A/AAAA outcomes"""
+        no_answer = dns.resolver.NoAnswer()
+        timeout = dns.resolver.LifetimeTimeout(timeout=1.0, errors=[])
+        assert isinstance(implicit_mx_error([no_answer, MagicMock()]), ImplicitMX)
+        assert isinstance(implicit_mx_error([timeout, MagicMock()]), ImplicitMX)
+        assert implicit_mx_error([no_answer, timeout]) is timeout
+        assert implicit_mx_error([no_answer, dns.resolver.NXDOMAIN()]) is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,125 @@
+﻿"""
+Unit tests for the HTTP validation service
+"""
+import sys
+import threading
+import pytest
+import requests
+from unittest.mock import patch
+import dns.resolver
+from src.server import ValidationService, ServiceBusy, make_server
+from src.dns_cache import DomainCache
+from src.domain_index import DomainIndex
+from src.check_email import main as check_email_main
+
+
+def fake_resolve(domain, record_type):
+    if domain.startswith("nx"):
+        raise dns.resolver.NXDOMAIN
+    return []
+
+
+@pytest.fixture
+def service():
+    index = DomainIndex()
+    index.add("mailinator.com", "disposable")
+    return ValidationService(DomainCache(), index=index, workers=2, max_batch=5)
+
+
+@pytest.fixture
+def base_url(service):
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    with patch('src.check_email.dns.resolver.resolve', side_effect=fake_resolve):
+        yield f"http://{host}:{port}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestValidateEndpoint:
+    """Test cases for POST /validate"""
+
+    def test_single_address(self, base_url):
+        """Test a single address returns one structured verdict"""
+        response = requests.post(f"{base_url}/validate", json={"email": "a@ok.com"})
+        assert response.status_code == 200
+        result = response.json()['result']
+        assert result['email'] == "a@ok.com"
+        assert result['status'] == "valid"
+        assert result['elapsed_ms'] >= 0
+
+    def test_batch(self, base_url):
+        """Test a batch keeps input order"""
+        emails = ["a@ok.com", "bad", "b@nx.com", "c@mailinator.com"]
+        response = requests.post(f"{base_url}/validate", json={"emails": emails})
+        body = response.json()
+        assert body['count'] == 4
+        assert [r['status'] for r in body['results']] == [
+            "valid", "invalid_syntax", "no_domain", "disposable"]
+
+    def test_cache_stays_warm(self, base_url, service):
+        """Test repeated requests reuse the shared cache"""
+        for _ in range(3):
+            requests.post(f"{base_url}/validate", json={"email": "a@ok.com"})
+        assert service.cache.stats()['misses'] == 1
+        assert service.cache.stats()['hits'] == 2
+
+    @pytest.mark.parametrize("payload", [{"mail": "x"}, {"emails": [1, 2]}, []])
+    def test_bad_payload(self, base_url, payload):
+        """Test malformed requests are rejected with 400"""
+        response = requests.post(f"{base_url}/validate", json=payload)
+        assert response.status_code == 400
+        assert "error" in response.json()
+
+    def test_invalid_json(self, base_url):
+        """Test non JSON bodies are rejected"""
+        response = requests.post(f"{base_url}/validate", data=b"{oops")
+        assert response.status_code == 400
+
+    def test_batch_limit(self, base_url):
+        """Test batches over max_batch are refused"""
+        response = requests.post(f"{base_url}/validate", json={"emails": ["a@ok.com"] * 6})
+        assert response.status_code == 413
+
+    def test_unknown_path(self, base_url):
+        """Test unknown paths return 404"""
+        assert requests.get(f"{base_url}/nope").status_code == 404
+        assert requests.post(f"{base_url}/nope", json={}).status_code == 404
+
+
+class TestServiceEndpoints:
+    """Test cases for health, metrics and concurrency limits"""
+
+    def test_health(self, base_url):
+        """Test /health reports counters and cache state"""
+        requests.post(f"{base_url}/validate", json={"emails": ["a@ok.com", "b@ok.com"]})
+        health = requests.get(f"{base_url}/health").json()
+        assert health['status'] == "ok"
+        assert health['requests'] == 1
+        assert health['addresses'] == 2
+        assert health['cache']['misses'] == 1
+
+    def test_metrics(self, base_url):
+        """Test /metrics exposes Prometheus text"""
+        requests.post(f"{base_url}/validate", json={"email": "a@ok.com"})
+        response = requests.get(f"{base_url}/metrics")
+        assert response.headers['Content-Type'].startswith("text/plain")
+        assert 'email_validator_stage_seconds_count{stage="resolve"} 1' in response.text
+        assert "email_validator_requests_total 1" in response.text
+
+    def test_busy_rejected(self):
+        """Test requests beyond max_requests wait and then fail"""
+        service = ValidationService(max_requests=1, queue_timeout=0.01)
+        service._slots.acquire()
+        with pytest.raises(ServiceBusy):
+            service.validate(["a@ok.com"])
+        assert service.health()['rejected'] == 1
+
+    def test_serve_subcommand(self):
+        """Test `email-validator serve` is dispatched to the server"""
+        with patch('src.server.main') as mock_serve, \
+                patch.object(sys, 'argv', ['email-validator', 'serve', '--port', '9000']):
+            check_email_main()
+        mock_serve.assert_called_once_with(['--port', '9000'])
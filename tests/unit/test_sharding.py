@@ -0,0 +1,165 @@
+﻿"""
+Unit tests for multi-process sharded validation
+"""
+import multiprocessing
+import sys
+import pytest
+from unittest.mock import patch, MagicMock
+import dns.resolver
+from src.sharding import shard_of, run_sharded
+from src.adaptive import AIMDController
+from src.check_email import (
+    check_email, format_result, validate_email, Status, main as check_email_main,
+)
+
+requires_fork = pytest.mark.skipif(
+    'fork' not in multiprocessing.get_all_start_methods(),
+    reason="Mocks reach worker processes only with fork",
+)
+
+
+def fake_resolve(domain, record_type, **kwargs):
+    if domain.startswith("nx"):
+        raise dns.resolver.NXDOMAIN
+    return MagicMock()
+
+
+class TestShardOf:
+    """Test cases for domain-hash sharding"""
+
+    def test_same_domain_same_shard(self):
+        """Test all addresses of a domain land in one shard"""
+        shards = {shard_of(f"user{i}@Gmail.com", 4) for i in range(20)}
+        shards |= {shard_of("x@gmail.com.", 4)}
+        assert len(shards) == 1
+
+    def test_domains_spread_over_shards(self):
+        """Test different domains use every shard"""
+        shards = {shard_of(f"user@domain{i}.com", 4) for i in range(100)}
+        assert shards == {0, 1, 2, 3}
+
+
+@requires_fork
+class TestRunSharded:
+    """Test cases for run_sharded"""
+
+    @pytest.fixture
+    def email_file(self, tmp_path):
+        emails = []
+        for i in range(60):
+            emails.append(f"user{i}@domain{i % 7}.com")
+            if i % 10 == 0:
+                emails.append(f"bad-{i}")
+                emails.append(f"user{i}@nx{i % 3}.com")
+        path = tmp_path / "emails.txt"
+        path.write_text("\n".join(emails) + "\n")
+        return str(path), emails
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_merged_output_matches_sequential(self, mock_dns_resolve, email_file, capsys):
+        """Test merged results keep input order and totals"""
+        mock_dns_resolve.side_effect = fake_resolve
+        path, emails = email_file
+        results = []
+
+        summary, stats = run_sharded(path, 3, results.append, progress_every=5,
+                                     start_method='fork')
+
+        assert [format_result(result) for result in results] == [
+            check_email(email) for email in emails]
+        assert all(result.elapsed_ms is not None for result in results)
+        assert summary.total == len(emails)
+        assert summary.valid == 60
+        assert len(summary.domains) == 10
+        assert stats['misses'] == 10
+        assert "[шард 1/3] обработано: 5" in capsys.readouterr().err
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_adaptive_stats_merged(self, mock_dns_resolve, email_file):
+        """Test every shard adapts on its own and the levels are summed"""
+        mock_dns_resolve.side_effect = fake_resolve
+        path, emails = email_file
+        controller = AIMDController(initial=2, maximum=4)
+
+        summary, _ = run_sharded(path, 2, lambda result: None, workers=4,
+                                 start_method='fork', controller=controller)
+
+        assert summary.total == len(emails)
+        stats = controller.stats()
+        assert stats['low'] == 4
+        assert stats['limit'] <= 8
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_providers_merged(self, mock_dns_resolve, email_file):
+        """Test per-process MX host stages feed the provider breakdown"""
+        def resolve(domain, record_type, **kwargs):
+            if record_type != 'MX':
+                return [MagicMock(**{'to_text.return_value': "192.0.2.1"})]
+            if domain.startswith("nx"):
+                raise dns.resolver.NXDOMAIN
+            host = "aspmx.l.google.com" if domain.endswith(("0.com", "1.com")) else "mx.own.com"
+            return [MagicMock(preference=10, exchange=MagicMock(**{'to_text.return_value': host}))]
+
+        mock_dns_resolve.side_effect = resolve
+        path, emails = email_file
+        results = []
+
+        summary, _ = run_sharded(path, 2, results.append, start_method='fork',
+                                 mx_hosts=True)
+
+        valid = [r for r in results if r.status is Status.VALID]
+        assert len(valid) == 60
+        google = sum(r.domain.endswith(("0.com", "1.com")) for r in valid)
+        assert summary.providers == {'google': google, 'other': 60 - google}
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_no_mx_no_address_after_parent_lookup(self, mock_dns_resolve, tmp_path):
+        """Test forked shards resolve A/AAAA after the parent used the fallback pool"""
+        mock_dns_resolve.side_effect = dns.resolver.NoAnswer
+        # Родитель уже запрашивал AAAA в пуле до запуска процессов
+        assert validate_email("a@first.com").status is Status.NO_MX
+        path = tmp_path / "emails.txt"
+        path.write_text("".join(f"user@empty{i}.com\n" for i in range(6)))
+        results = []
+
+        summary, _ = run_sharded(str(path), 2, results.append, start_method='fork')
+
+        assert summary.total == 6
+        assert all(r.status is Status.NO_MX for r in results)
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_worker_error_reported(self, mock_dns_resolve, tmp_path):
+        """Test a failing shard raises in the parent"""
+        path = tmp_path / "emails.txt"
+        path.write_text("a@gmail.com\n")
+
+        with patch('src.sharding.validate_many', side_effect=ValueError("boom")):
+            with pytest.raises(RuntimeError, match="boom"):
+                run_sharded(str(path), 2, print, start_method='fork')
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_cli_processes_flag(self, mock_dns_resolve, email_file, tmp_path, capsys):
+        """Test --processes writes merged results and summary"""
+        mock_dns_resolve.side_effect = fake_resolve
+        path, emails = email_file
+        output_file = tmp_path / "results.txt"
+        original_argv = sys.argv
+
+        try:
+            sys.argv = ['check_email.py', '--file', path, '--processes', '2',
+                        '--output', str(output_file)]
+            fork_context = multiprocessing.get_context('fork')
+            with patch('src.sharding.multiprocessing.get_context',
+                       lambda method=None: fork_context):
+                summary = check_email_main()
+        finally:
+            sys.argv = original_argv
+
+        content = output_file.read_text(encoding='utf-8').splitlines()
+        assert content[:len(emails)] == [check_email(email) for email in emails]
+        assert summary.total == len(emails)
+        assert f"Всего проверено: {len(emails)}" in capsys.readouterr().out
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,165 @@
+﻿"""
+Unit tests for in-flight lookup coalescing
+"""
+import asyncio
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import dns.resolver
+from src.singleflight import SingleFlight, AsyncSingleFlight
+from src.check_email import check_email, resolve_mx
+from src.async_check import check_email_async
+from src.dns_cache import DomainCache
+
+
+class TestSingleFlight:
+    """Test cases for the threaded SingleFlight"""
+
+    def test_concurrent_calls_share_result(self):
+        """Test one execution serves every concurrent caller"""
+        group = SingleFlight()
+        calls = []
+        barrier = threading.Barrier(10)
+
+        def slow(value):
+            calls.append(value)
+            time.sleep(0.1)
+            return value * 2
+
+        def worker():
+            barrier.wait()
+            return group.do("key", slow, 21)
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            results = list(executor.map(lambda _: worker(), range(10)))
+        assert results == [42] * 10
+        assert calls == [21]
+        assert group.stats() == {'leaders': 1, 'shared': 9, 'in_flight': 0}
+
+    def test_error_shared(self):
+        """Test waiters receive the leader's exception"""
+        group = SingleFlight()
+        started = threading.Event()
+
+        def failing():
+            started.set()
+            time.sleep(0.05)
+            raise ValueError("boom")
+
+        errors = []
+
+        def waiter():
+            started.wait()
+            try:
+                group.do("key", failing)
+            except ValueError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        with pytest.raises(ValueError):
+            group.do("key", failing)
+        thread.join()
+        assert len(errors) == 1
+
+    def test_sequential_calls_not_cached(self):
+        """Test finished calls are forgotten"""
+        group = SingleFlight()
+        assert group.do("key", lambda: 1) == 1
+        assert group.do("key", lambda: 2) == 2
+
+
+class TestAsyncSingleFlight:
+    """Test cases for the asyncio SingleFlight"""
+
+    def test_gather_coalesced(self):
+        """Test concurrent coroutines share one execution"""
+        group = AsyncSingleFlight()
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def run():
+            return await asyncio.gather(*(group.do("key", slow) for _ in range(20)))
+
+        assert asyncio.run(run()) == ["done"] * 20
+        assert len(calls) == 1
+        assert group.stats()['shared'] == 19
+
+    def test_waiter_cancel_keeps_leader(self):
+        """Test cancelling a waiter does not cancel the shared call"""
+        group = AsyncSingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def run():
+            leader = asyncio.ensure_future(group.do("key", slow))
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(group.do("key", slow))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            return await leader, waiter.cancelled()
+
+        assert asyncio.run(run()) == ("done", True)
+
+
+class TestResolverCoalescing:
+    """Test cases for coalescing in resolve_mx and resolve_mx_async"""
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_thread_pool_burst(self, mock_resolve):
+        """Test a burst of identical lookups sends a single query"""
+        def slow_resolve(domain, record_type):
+            time.sleep(0.1)
+            return []
+        mock_resolve.side_effect = slow_resolve
+
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            results = list(executor.map(check_email, [f"user{i}@gmail.com" for i in range(50)]))
+        assert all("✅" in result for result in results)
+        # Без кэша каждая новая волна задач отправляет свой запрос, но внутри волны он один
+        assert mock_resolve.call_count <= 3
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_nxdomain_shared(self, mock_resolve):
+        """Test negative answers reach every waiter and the cache once"""
+        def slow_nx(domain, record_type):
+            time.sleep(0.1)
+            raise dns.resolver.NXDOMAIN
+        mock_resolve.side_effect = slow_nx
+        cache = DomainCache()
+
+        def lookup(_):
+            try:
+                resolve_mx("nx.example", cache)
+            except dns.resolver.NXDOMAIN:
+                return "nx"
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            assert list(executor.map(lookup, range(10))) == ["nx"] * 10
+        assert mock_resolve.call_count == 1
+
+    def test_async_burst(self):
+        """Test asyncio callers share one in-flight query"""
+        calls = []
+
+        async def slow_resolve(domain, record_type, **kwargs):
+            calls.append(domain)
+            await asyncio.sleep(0.05)
+            return []
+
+        async def run():
+            return await asyncio.gather(
+                *(check_email_async(f"u{i}@gmail.com") for i in range(100)))
+
+        with patch('src.async_check.dns.asyncresolver.resolve', side_effect=slow_resolve):
+            results = asyncio.run(run())
+        assert len(results) == 100
+        assert calls == ["gmail.com"]
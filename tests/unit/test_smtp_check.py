@@ -0,0 +1,197 @@
+﻿"""
+Unit tests for the SMTP mailbox verification stage
+"""
+import smtplib
+import socket
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from src.smtp_check import SMTPVerifier
+from src.check_email import EmailResult, Status, validate_email, validate_many
+
+
+class FakeSMTP:
+    """smtplib.SMTP stand-in recording sessions and commands"""
+
+    mailboxes = {"alice@ok.com", "bob@ok.com", "anyone@any.com"}
+    catch_all_domains = {"any.com"}
+
+    def __init__(self, registry, timeout=None):
+        self.registry = registry
+        self.commands = []
+        registry['sessions'].append(self)
+
+    def connect(self, host, port):
+        self.commands.append(("connect", host, port))
+        return 220, b"ready"
+
+    def ehlo(self, name):
+        self.commands.append(("ehlo", name))
+        return 250, b"hello"
+
+    def helo(self, name):
+        return 250, b"hello"
+
+    def mail(self, sender):
+        self.commands.append(("mail", sender))
+        return 250, b"ok"
+
+    def rcpt(self, address):
+        self.commands.append(("rcpt", address))
+        with self.registry['lock']:
+            self.registry['active'] += 1
+            self.registry['peak'] = max(self.registry['peak'], self.registry['active'])
+        time.sleep(self.registry.get('delay', 0))
+        with self.registry['lock']:
+            self.registry['active'] -= 1
+        domain = address.rpartition("@")[2]
+        if address in self.mailboxes or domain in self.catch_all_domains:
+            return 250, b"ok"
+        return 550, b"no such user"
+
+    def rset(self):
+        return 250, b"ok"
+
+    def quit(self):
+        self.commands.append(("quit",))
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def registry():
+    return {'sessions': [], 'lock': threading.Lock(), 'active': 0, 'peak': 0}
+
+
+@pytest.fixture
+def verifier(registry):
+    verifier = SMTPVerifier(helo="checker.test", timeout=1,
+                            smtp_factory=lambda timeout: FakeSMTP(registry, timeout))
+    yield verifier
+    verifier.close()
+
+
+def mx_result(email, hosts=("mx1.ok.com", "mx2.ok.com")):
+    domain = email.rpartition("@")[2]
+    return EmailResult(email, domain, Status.VALID, hosts)
+
+
+class TestSMTPVerifier:
+    """Test cases for SMTPVerifier verdicts and pooling"""
+
+    def test_mailbox_verdicts(self, verifier):
+        """Test existing, missing and catch-all mailboxes"""
+        assert verifier.apply(mx_result("alice@ok.com")).status is Status.MAILBOX_OK
+        missing = verifier.apply(mx_result("nobody@ok.com"))
+        assert missing.status is Status.NO_MAILBOX
+        assert missing.error.startswith("550")
+        assert not missing.status.is_valid
+        assert verifier.apply(mx_result("x@any.com", ("mx.any.com",))).status is Status.CATCH_ALL
+
+    def test_top_priority_host_only(self, verifier, registry):
+        """Test only the first MX host is contacted"""
+        verifier.apply(mx_result("alice@ok.com"))
+        assert registry['sessions'][0].commands[0] == ("connect", "mx1.ok.com", 25)
+        assert ("ehlo", "checker.test") in registry['sessions'][0].commands
+
+    def test_session_reused_per_host(self, verifier, registry):
+        """Test one SMTP session serves many recipients"""
+        for email in ("alice@ok.com", "bob@ok.com", "nobody@ok.com"):
+            verifier.apply(mx_result(email))
+        assert len(registry['sessions']) == 1
+        rcpts = [c[1] for c in registry['sessions'][0].commands if c[0] == "rcpt"]
+        assert "alice@ok.com" in rcpts and "nobody@ok.com" in rcpts
+
+    def test_catch_all_cached(self, verifier, registry):
+        """Test catch-all probing happens once per domain"""
+        for email in ("alice@ok.com", "bob@ok.com"):
+            verifier.apply(mx_result(email))
+        rcpts = [c[1] for c in registry['sessions'][0].commands if c[0] == "rcpt"]
+        assert len(rcpts) == 3
+
+    def test_session_recycled(self, registry):
+        """Test sessions are closed after max_rcpt_per_session recipients"""
+        verifier = SMTPVerifier(helo="h", max_rcpt_per_session=2, detect_catch_all=False,
+                                smtp_factory=lambda timeout: FakeSMTP(registry, timeout))
+        for _ in range(4):
+            verifier.apply(mx_result("alice@ok.com"))
+        assert len(registry['sessions']) == 2
+        assert ("quit",) in registry['sessions'][0].commands
+
+    def test_per_host_concurrency_cap(self, registry):
+        """Test no more than max_per_host sessions talk to one host at once"""
+        registry['delay'] = 0.02
+        verifier = SMTPVerifier(helo="h", max_per_host=2, detect_catch_all=False,
+                                smtp_factory=lambda timeout: FakeSMTP(registry, timeout))
+        results = list(verifier.verify_results(
+            (mx_result(f"user{i}@ok.com") for i in range(12)), concurrency=8))
+        assert len(results) == 12
+        assert registry['peak'] <= 2
+        assert len(registry['sessions']) <= 2
+
+    def test_non_mx_results_untouched(self, verifier, registry):
+        """Test results without MX hosts skip the SMTP stage"""
+        result = EmailResult("bad", None, Status.INVALID_SYNTAX)
+        assert verifier.apply(result) is result
+        assert registry['sessions'] == []
+
+    def test_connection_failure_is_inconclusive(self):
+        """Test network errors keep the MX verdict"""
+        def refuse(timeout):
+            raise ConnectionRefusedError("refused")
+        verifier = SMTPVerifier(helo="h", smtp_factory=refuse)
+        result = mx_result("alice@ok.com")
+        assert verifier.apply(result) == result
+        assert verifier.verify("alice@ok.com", "ok.com", ("mx1.ok.com",))[0] == "unknown"
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_pipeline_integration(self, mock_resolve, verifier):
+        """Test validate_email and validate_many run the SMTP stage after MX"""
+        class MX:
+            preference = 10
+            exchange = type("Name", (), {"to_text": lambda self, omit_final_dot: "mx.ok.com"})()
+        mock_resolve.return_value = [MX()]
+        assert validate_email("alice@ok.com", smtp=verifier).status is Status.MAILBOX_OK
+        statuses = [r.status for r in validate_many(
+            ["alice@ok.com", "bad", "nobody@ok.com"], 3, smtp=verifier)]
+        assert statuses == [Status.MAILBOX_OK, Status.INVALID_SYNTAX, Status.NO_MAILBOX]
+
+
+class TestWithAiosmtpd:
+    """End-to-end checks against a local aiosmtpd server"""
+
+    @pytest.fixture
+    def smtp_server(self):
+        controller_module = pytest.importorskip("aiosmtpd.controller")
+
+        class Handler:
+            async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+                if address == "real@example.test":
+                    envelope.rcpt_tos.append(address)
+                    return "250 OK"
+                return "550 5.1.1 User unknown"
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        controller = controller_module.Controller(Handler(), hostname="127.0.0.1", port=port)
+        controller.start()
+        yield port
+        controller.stop()
+
+    def test_real_smtp_dialog(self, smtp_server):
+        """Test verdicts and session reuse over a real SMTP dialog"""
+        verifier = SMTPVerifier(helo="checker.test", port=smtp_server, timeout=5)
+        try:
+            hosts = ("127.0.0.1",)
+            ok = verifier.apply(EmailResult("real@example.test", "example.test",
+                                            Status.VALID, hosts))
+            missing = verifier.apply(EmailResult("ghost@example.test", "example.test",
+                                                 Status.VALID, hosts))
+        finally:
+            verifier.close()
+        assert ok.status is Status.MAILBOX_OK
+        assert missing.status is Status.NO_MAILBOX
+        assert verifier.sessions_opened == 1
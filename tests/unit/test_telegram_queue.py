@@ -0,0 +1,152 @@
+﻿"""
+Unit tests for the background Telegram delivery queue
+"""
+import sys
+import pytest
+from unittest.mock import patch, MagicMock
+import requests
+from src.telegram_sender import split_message
+from src.telegram_queue import TelegramQueue, retry_after, send_to_telegram_async, close_queues
+from src.check_email import main as check_email_main
+
+
+def http_error(status, body=None, headers=None):
+    """Build an HTTPError carrying a fake response"""
+    response = MagicMock()
+    response.status_code = status
+    response.json.return_value = body or {}
+    response.headers = headers or {}
+    return requests.exceptions.HTTPError(f"{status} error", response=response)
+
+
+@pytest.fixture
+def client():
+    client = MagicMock()
+    client.is_configured.return_value = True
+    return client
+
+
+class TestSplitMessage:
+    """Test cases for splitting long texts"""
+
+    def test_short_text_untouched(self):
+        """Test texts within the limit stay whole"""
+        assert split_message("hello", 10) == ["hello"]
+
+    def test_split_on_lines(self):
+        """Test chunks break at line boundaries"""
+        text = "\n".join(["abcd"] * 5)
+        chunks = split_message(text, 10)
+        assert chunks == ["abcd\nabcd", "abcd\nabcd", "abcd"]
+        assert all(len(chunk) <= 10 for chunk in chunks)
+
+    def test_long_line_cut(self):
+        """Test a single oversized line is cut into fixed pieces"""
+        assert split_message("x" * 25, 10) == ["x" * 10, "x" * 10, "x" * 5]
+
+
+class TestTelegramQueue:
+    """Test cases for TelegramQueue delivery"""
+
+    def test_messages_merged(self, client):
+        """Test small messages queued together go out as one"""
+        delivery = TelegramQueue(client, linger=0.2)
+        for i in range(3):
+            delivery.put(f"msg {i}")
+        delivery.close()
+        client.send_message.assert_called_once_with("msg 0\n\nmsg 1\n\nmsg 2")
+        assert delivery.stats() == {'sent': 1, 'failed': 0, 'pending': 0}
+
+    def test_merge_respects_limit(self, client):
+        """Test merged messages never exceed max_length"""
+        delivery = TelegramQueue(client, max_length=12, linger=0.2)
+        for text in ("aaaaa", "bbbbb", "ccccc"):
+            delivery.put(text)
+        delivery.close()
+        sent = [c.args[0] for c in client.send_message.call_args_list]
+        assert sent == ["aaaaa\n\nbbbbb", "ccccc"]
+
+    def test_retry_after_on_429(self, client):
+        """Test 429 waits for the server supplied retry_after"""
+        client.send_message.side_effect = [
+            http_error(429, {'ok': False, 'parameters': {'retry_after': 7}}), None]
+        sleep = MagicMock()
+        delivery = TelegramQueue(client, linger=0, sleep=sleep)
+        delivery.put("report")
+        delivery.close()
+        sleep.assert_called_once_with(7.0)
+        assert delivery.sent == 1
+
+    def test_backoff_on_network_errors(self, client):
+        """Test network errors back off exponentially and give up"""
+        client.send_message.side_effect = requests.exceptions.ConnectionError("down")
+        sleep = MagicMock()
+        delivery = TelegramQueue(client, max_retries=3, backoff=1.0, linger=0, sleep=sleep)
+        delivery.put("report")
+        delivery.close()
+        assert [c.args[0] for c in sleep.call_args_list] == [1.0, 2.0, 4.0]
+        assert client.send_message.call_count == 4
+        assert delivery.failed == 1
+
+    def test_bad_request_not_retried(self, client):
+        """Test client errors other than 429 are dropped at once"""
+        client.send_message.side_effect = http_error(400)
+        sleep = MagicMock()
+        delivery = TelegramQueue(client, linger=0, sleep=sleep)
+        delivery.put("bad")
+        delivery.close()
+        assert client.send_message.call_count == 1
+        sleep.assert_not_called()
+
+    def test_put_does_not_block(self, client):
+        """Test put returns while delivery is still in progress"""
+        import threading
+        release = threading.Event()
+        client.send_message.side_effect = lambda text: release.wait(5)
+        delivery = TelegramQueue(client, linger=0)
+        delivery.put("first")
+        delivery.put("second")
+        assert not delivery.flush(timeout=0.05)
+        release.set()
+        assert delivery.flush(timeout=5)
+        delivery.close()
+
+    def test_put_after_close(self, client):
+        """Test the queue rejects messages once closed"""
+        delivery = TelegramQueue(client)
+        delivery.close()
+        with pytest.raises(RuntimeError):
+            delivery.put("late")
+
+    def test_retry_after_header(self):
+        """Test the Retry-After header fallback"""
+        response = MagicMock()
+        response.json.side_effect = ValueError
+        response.headers = {'Retry-After': '3'}
+        assert retry_after(response) == 3.0
+        assert retry_after(None) is None
+
+
+class TestSendAsync:
+    """Test cases for the module level asynchronous sender"""
+
+    def test_unconfigured(self, tmp_path):
+        """Test placeholder tokens are rejected without queuing"""
+        config_file = tmp_path / "config.ini"
+        config_file.write_text("[telegram]\nbot_token = ваш_токен_бота_здесь\nchat_id = 1\n",
+                               encoding="utf-8")
+        assert send_to_telegram_async("text", str(config_file)) is False
+
+    @patch('src.telegram_sender.requests.Session.post')
+    def test_cli_summary(self, mock_post, tmp_path):
+        """Test --telegram queues the run summary"""
+        config_file = tmp_path / "config.ini"
+        config_file.write_text("[telegram]\nbot_token = token\nchat_id = 1\n")
+        with patch('src.check_email.dns.resolver.resolve', return_value=[]), \
+                patch.object(sys, 'argv', ['check_email', '-e', 'a@example.com',
+                                           '-c', str(config_file), '--telegram']):
+            check_email_main()
+        close_queues()
+        text = mock_post.call_args.kwargs['json']['text']
+        assert text.startswith("📊 ИТОГИ ПРОВЕРКИ EMAIL")
+        assert "Валидных: 1" in text
@@ -4,7 +4,11 @@ Unit tests for Telegram sender functionality
 import pytest
 from unittest.mock import patch, MagicMock, mock_open
 import requests
-from src.telegram_sender import send_to_telegram, send_file_to_telegram, load_config
+import gzip
+from src.telegram_sender import (
+    send_to_telegram, send_file_to_telegram, load_config, get_client, TelegramClient,
+    MultipartFile, iter_file_chunks, MAX_MESSAGE_LENGTH, DOCUMENT_THRESHOLD,
+)
 
 
 class TestTelegramSender:
@@ -52,7 +56,7 @@ key = value
             load_config(invalid_config)
     
     # Тесты для отправки сообщений
-    @patch('src.telegram_sender.requests.post')
+    @patch('src.telegram_sender.requests.Session.post')
     def test_send_to_telegram_success(self, mock_post, valid_config):
         """Test successful message sending"""
         # Настраиваем мок
@@ -71,7 +75,7 @@ key = value
         assert kwargs['json']['chat_id'] == '123456789'
         assert kwargs['json']['text'] == 'Test message'
     
-    @patch('src.telegram_sender.requests.post')
+    @patch('src.telegram_sender.requests.Session.post')
     def test_send_to_telegram_network_error(self, mock_post, valid_config):
         """Test network error when sending message"""
         mock_post.side_effect = requests.exceptions.ConnectionError("Network error")
@@ -79,7 +83,7 @@ key = value
         result = send_to_telegram("Test message", valid_config)
         assert result is False
     
-    @patch('src.telegram_sender.requests.post')
+    @patch('src.telegram_sender.requests.Session.post')
     def test_send_to_telegram_api_error(self, mock_post, valid_config):
         """Test Telegram API error"""
         mock_response = MagicMock()
@@ -143,7 +147,7 @@ chat_id = ваш_chat_id_здесь
         mock_send.assert_not_called()
     
     # Тесты граничных случаев
-    @patch('src.telegram_sender.requests.post')
+    @patch('src.telegram_sender.requests.Session.post')
     def test_send_to_telegram_empty_message(self, mock_post, valid_config):
         """Test sending empty message"""
         mock_response = MagicMock()
@@ -155,7 +159,7 @@ chat_id = ваш_chat_id_здесь
         # Проверяем хотя бы что функция не падает
         assert isinstance(result, bool)
     
-    @patch('src.telegram_sender.requests.post')
+    @patch('src.telegram_sender.requests.Session.post')
     def test_send_to_telegram_long_message(self, mock_post, valid_config):
         """Test sending very long message"""
         long_message = "A" * 4096  # Длинное сообщение
@@ -172,12 +176,122 @@ chat_id = ваш_chat_id_здесь
         assert kwargs['json']['text'] == long_message
 
 
+class TestTelegramClient:
+    """Test cases for the reusable Telegram client"""
+
+    @pytest.fixture
+    def valid_config(self, tmp_path):
+        config_file = tmp_path / "config.ini"
+        config_file.write_text("[telegram]\nbot_token = test_token_12345\nchat_id = 123456789\n")
+        return str(config_file)
+
+    def test_config_loaded_once(self, valid_config):
+        """Test repeated sends reuse one client and one config parse"""
+        with patch('src.telegram_sender.load_config', wraps=load_config) as mock_load, \
+                patch('src.telegram_sender.requests.Session.post') as mock_post:
+            assert send_to_telegram("first", valid_config) is True
+            assert send_to_telegram("second", valid_config) is True
+        assert mock_load.call_count == 1
+        assert mock_post.call_count == 2
+        assert get_client(valid_config) is get_client(valid_config)
+
+    def test_session_reused(self, valid_config):
+        """Test all calls go through the same pooled session"""
+        client = TelegramClient(valid_config)
+        with patch.object(client.session, 'post') as mock_post:
+            client.send("one")
+            client.send("two")
+        assert mock_post.call_count == 2
+        assert client.session.get_adapter("https://api.telegram.org").poolmanager is not None
+        client.close()
+
+    def test_api_call_url_and_timeout(self, valid_config):
+        """Test the method URL and the configured timeout"""
+        client = TelegramClient(valid_config, timeout=3)
+        with patch.object(client.session, 'post') as mock_post:
+            client.api_call('getMe')
+        args, kwargs = mock_post.call_args
+        assert args[0] == "https://api.telegram.org/bottest_token_12345/getMe"
+        assert kwargs['timeout'] == 3
+
+    def test_missing_section_not_cached(self, tmp_path):
+        """Test a broken config is reported and retried on the next call"""
+        config_file = tmp_path / "config.ini"
+        config_file.write_text("[other]\n")
+        assert send_to_telegram("text", str(config_file)) is False
+        config_file.write_text("[telegram]\nbot_token = t\nchat_id = 1\n")
+        with patch('src.telegram_sender.requests.Session.post'):
+            assert send_to_telegram("text", str(config_file)) is True
+
+
+class TestLargeFiles:
+    """Test cases for chunked and document uploads of result files"""
+
+    @pytest.fixture
+    def valid_config(self, tmp_path):
+        config_file = tmp_path / "config.ini"
+        config_file.write_text("[telegram]\nbot_token = test_token_12345\nchat_id = 123456789\n")
+        return str(config_file)
+
+    def test_iter_file_chunks(self, tmp_path):
+        """Test chunks are line aligned and within the limit"""
+        path = tmp_path / "report.txt"
+        path.write_text("".join(f"user{i}@example.com: ok\n" for i in range(100)),
+                        encoding="utf-8")
+        chunks = list(iter_file_chunks(str(path), 100))
+        assert all(len(chunk) <= 100 for chunk in chunks)
+        assert "\n".join(chunks) == path.read_text(encoding="utf-8").rstrip("\n")
+
+    @patch('src.telegram_sender.send_to_telegram')
+    def test_medium_file_split(self, mock_send, tmp_path, valid_config):
+        """Test a file over one message goes out as several messages"""
+        path = tmp_path / "report.txt"
+        path.write_text("".join(f"line {i:05d}\n" for i in range(1000)))
+        mock_send.return_value = True
+
+        assert send_file_to_telegram(str(path), valid_config) is True
+        messages = [c.args[0] for c in mock_send.call_args_list]
+        assert len(messages) > 1
+        assert all(len(message) <= MAX_MESSAGE_LENGTH for message in messages)
+        assert messages[0].startswith("📄 Файл: report.txt")
+        assert "line 00999" in messages[-1]
+
+    @patch('src.telegram_sender.requests.Session.post')
+    def test_large_file_as_document(self, mock_post, tmp_path, valid_config):
+        """Test a large file is streamed to sendDocument with Content-Length"""
+        path = tmp_path / "report.txt"
+        path.write_bytes(b"x@example.com: ok\n" * (DOCUMENT_THRESHOLD // 10))
+
+        assert send_file_to_telegram(str(path), valid_config) is True
+        args, kwargs = mock_post.call_args
+        assert args[0].endswith("/sendDocument")
+        upload = kwargs['data']
+        assert isinstance(upload, MultipartFile)
+        body = b"".join(upload)
+        assert len(body) == len(upload)
+        assert kwargs['headers']['Content-Type'] == upload.content_type
+        assert path.read_bytes() in body
+
+    def test_gzip_upload(self, tmp_path):
+        """Test on the fly compression produces a valid gzip part"""
+        path = tmp_path / "report.txt"
+        content = b"user@example.com: ok\n" * 5000
+        path.write_bytes(content)
+        upload = MultipartFile(str(path), {'chat_id': '1'}, compress=True, chunk_size=1024)
+        assert upload.length is None
+        body = b"".join(upload.body())
+        assert b'filename="report.txt.gz"' in body
+        start = body.index(b"\r\n\r\n", body.index(b'name="document"')) + 4
+        end = body.rindex(b"\r\n--" + upload.boundary.encode())
+        assert gzip.decompress(body[start:end]) == content
+
+
 class TestTelegramSenderIntegration:
     """Integration tests for Telegram sender"""
     
     @pytest.mark.integration
     @pytest.mark.slow
-    @patch('src.telegram_sender.requests.post')
+    @patch('src.telegram_sender.requests.Session.post')
     def test_real_telegram_api_call(self, mock_post):
         """Integration test with mocked Telegram API"""
         # Здесь можно протестировать с реальным токеном (осторожно!)
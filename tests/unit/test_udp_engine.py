@@ -0,0 +1,266 @@
+﻿"""
+Unit tests for the pipelined UDP resolution engine
+"""
+import socket
+import sys
+import pytest
+from unittest.mock import patch, MagicMock
+import dns.exception
+import dns.message
+import dns.rcode
+import dns.resolver
+from benchmarks.fake_dns import FakeDNSServer
+from src.udp_engine import UDPEngine, engine_from_settings
+from src.check_email import validate_many, Status, main as check_email_main
+from src.dns_cache import DomainCache
+
+
+class ServfailServer(FakeDNSServer):
+    """Stub server answering SERVFAIL to every query"""
+
+    def make_response(self, query, tcp=False):
+        response = super().make_response(query, tcp)
+        response.answer = []
+        response.set_rcode(dns.rcode.SERVFAIL)
+        return response
+
+
+def make_engine(server, **kwargs):
+    options = {'sockets': 3, 'timeout': 0.5, 'retries': 2}
+    options.update(kwargs)
+    return UDPEngine([server.host], server.port, **options)
+
+
+class TestUDPEngine:
+    """Test cases for UDPEngine.resolve_many"""
+
+    def test_outcomes_match_server(self):
+        """Test every domain gets the answer or error the server gives it"""
+        domains = [f"d{i}.test" for i in range(300)]
+        with FakeDNSServer(nxdomain_ratio=0.2, noanswer_ratio=0.2) as server:
+            with make_engine(server, max_outstanding=50) as engine:
+                results = engine.resolve_many(domains)
+
+        assert set(results) == set(domains)
+        for domain, (answer, error, elapsed) in results.items():
+            outcome = server.outcome(domain)
+            if outcome == 'mx':
+                assert error is None
+                assert [r.exchange.to_text() for r in answer] == [f"mx.{domain}."]
+                assert answer.rrset.ttl == 300
+            elif outcome == 'nxdomain':
+                assert isinstance(error, dns.resolver.NXDOMAIN)
+            else:
+                assert isinstance(error, dns.resolver.NoAnswer)
+            assert elapsed >= 0
+        # Каждый домен запрошен ровно один раз
+        assert server.queries == len(domains)
+
+    def test_duplicates_resolved_once(self):
+        """Test repeated domains in the input share one query"""
+        with FakeDNSServer() as server:
+            with make_engine(server) as engine:
+                results = engine.resolve_many(["a.test", "a.test", "b.test"])
+        assert set(results) == {"a.test", "b.test"}
+        assert server.queries == 2
+
+    def test_dropped_queries_retransmitted(self):
+        """Test a query without a reply is sent again after the timeout"""
+        domains = [f"d{i}.test" for i in range(20)]
+        with FakeDNSServer(drop_ratio=1.0) as server:
+            with make_engine(server, timeout=0.2) as engine:
+                results = engine.resolve_many(domains)
+                stats = engine.stats()
+
+        assert all(error is None for _, error, _ in results.values())
+        assert stats['retransmits'] == len(domains)
+        assert stats['timeouts'] == 0
+
+    def test_timeout_after_retries(self):
+        """Test a silent server yields Timeout once retries are exhausted"""
+        silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        silent.bind(('127.0.0.1', 0))
+        try:
+            host, port = silent.getsockname()
+            with UDPEngine([host], port, timeout=0.1, retries=1) as engine:
+                results = engine.resolve_many(["a.test"])
+                stats = engine.stats()
+        finally:
+            silent.close()
+
+        answer, error, _ = results["a.test"]
+        assert answer is None
+        assert isinstance(error, dns.exception.Timeout)
+        assert stats['sent'] == 2
+        assert stats['timeouts'] == 1
+
+    def test_truncated_reply_falls_back_to_tcp(self):
+        """Test a TC reply is re-queried over TCP"""
+        domains = [f"d{i}.test" for i in range(10)]
+        with FakeDNSServer(truncate_ratio=1.0) as server:
+            with make_engine(server) as engine:
+                results = engine.resolve_many(domains)
+                stats = engine.stats()
+
+        for domain in domains:
+            answer, error, _ = results[domain]
+            assert error is None
+            assert [r.exchange.to_text() for r in answer] == [f"mx.{domain}."]
+        assert stats['truncated'] == len(domains)
+        assert server.tcp_queries == len(domains)
+
+    def test_servfail_tries_next_server(self):
+        """Test SERVFAIL moves the query to the next nameserver"""
+        with ServfailServer() as bad:
+            # Движок использует один порт для всех серверов
+            with FakeDNSServer(host='127.0.0.2', port=bad.port) as good:
+                with UDPEngine([bad.host, good.host], bad.port, timeout=0.5,
+                               retries=1) as engine:
+                    results = engine.resolve_many(["a.test"])
+        answer, error, _ = results["a.test"]
+        assert error is None
+        assert [r.exchange.to_text() for r in answer] == ["mx.a.test."]
+        assert (bad.queries, good.queries) == (1, 1)
+
+    def test_servfail_everywhere(self):
+        """Test SERVFAIL from every attempt yields NoNameservers"""
+        with ServfailServer() as server:
+            with make_engine(server, retries=1) as engine:
+                results = engine.resolve_many(["a.test"])
+        answer, error, _ = results["a.test"]
+        assert answer is None
+        assert isinstance(error, dns.resolver.NoNameservers)
+        assert "SERVFAIL" in str(error)
+        assert server.queries == 2
+
+    def test_unmatched_reply_ignored(self):
+        """Test a reply with an unknown ID is counted and dropped"""
+        with FakeDNSServer(latency=0.2) as server:
+            with make_engine(server, sockets=1) as engine:
+                sock = engine._sockets[socket.AF_INET][0]
+                # Сокет получает адрес при первой отправке; сервер мусор игнорирует
+                sock.sendto(b"\x00", (server.host, server.port))
+                local = sock.getsockname()
+                stray = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                try:
+                    query = dns.message.make_query("a.test", "MX")
+                    stray.sendto(dns.message.make_response(query).to_wire(), local)
+                    results = engine.resolve_many(["a.test"])
+                finally:
+                    stray.close()
+                stats = engine.stats()
+        assert results["a.test"][1] is None
+        assert stats['unmatched'] == 1
+
+
+class TestEngineSettings:
+    """Test cases for engine_from_settings"""
+
+    def test_retries_from_lifetime(self):
+        """Test the overall timeout is split into per-server attempts"""
+        with engine_from_settings({'nameservers': ['127.0.0.1'], 'timeout': 1.0,
+                                   'lifetime': 3.0}, sockets=2, max_outstanding=10) as engine:
+            assert engine.timeout == 1.0
+            assert engine.retries == 2
+            assert engine.max_outstanding == 10
+            assert engine.nameservers == ['127.0.0.1']
+
+    def test_defaults(self):
+        """Test the system nameservers are used without settings"""
+        with patch('src.udp_engine.dns.resolver.get_default_resolver') as default:
+            default.return_value.nameservers = ['127.0.0.53']
+            with engine_from_settings() as engine:
+                assert engine.nameservers == ['127.0.0.53']
+                assert engine.retries == 2
+
+
+class TestValidateWithEngine:
+    """Test cases for validate_many(engine=...)"""
+
+    def test_statuses_and_order(self):
+        """Test engine answers feed the usual classification"""
+        emails = [f"user{i}@d{i % 30}.test" for i in range(90)] + ["broken"]
+        with FakeDNSServer(nxdomain_ratio=0.3, noanswer_ratio=0.2) as server:
+            with make_engine(server) as engine:
+                results = list(validate_many(emails, engine=engine, timed=True))
+
+        assert [r.email for r in results] == emails
+        expected = {'mx': Status.VALID, 'nxdomain': Status.NO_DOMAIN, 'noanswer': Status.NO_MX}
+        for result in results[:-1]:
+            assert result.status is expected[server.outcome(result.domain)]
+            assert result.elapsed_ms is not None
+        assert results[-1].status is Status.INVALID_SYNTAX
+        # Домены без MX дополнительно проверяются запросами A и AAAA
+        noanswer = sum(server.outcome(f"d{i}.test") == 'noanswer' for i in range(30))
+        assert server.queries == 30 + 2 * noanswer
+
+    def test_null_and_implicit_mx(self):
+        """Test the engine path applies null MX and the A/AAAA fallback"""
+        emails = [f"user@d{i}.test" for i in range(60)]
+        with FakeDNSServer(noanswer_ratio=0.2, nullmx_ratio=0.2,
+                           implicit_ratio=0.2) as server:
+            with make_engine(server) as engine:
+                results = list(validate_many(emails, engine=engine))
+                stats = engine.stats()
+
+        expected = {'mx': Status.VALID, 'noanswer': Status.NO_MX, 'nullmx': Status.NULL_MX,
+                    'implicit': Status.IMPLICIT_MX}
+        fallback = 0
+        for result in results:
+            outcome = server.outcome(result.domain)
+            assert result.status is expected[outcome]
+            if outcome == 'implicit':
+                assert result.mx_hosts == (result.domain,)
+            fallback += outcome in ('noanswer', 'implicit')
+        # A и AAAA запрашиваются только для доменов без MX
+        assert stats['sent'] == len(emails) + 2 * fallback
+
+    def test_cache_skips_engine(self):
+        """Test cached domains are not sent to the engine"""
+        cache = DomainCache()
+        cache.store("cached.test", hosts=("mx.cached.test",))
+        cache.store("gone.test", error=dns.resolver.NXDOMAIN)
+        engine = MagicMock()
+        engine.resolve_many.return_value = {}
+        results = list(validate_many(["a@cached.test", "b@gone.test"], cache=cache,
+                                     engine=engine))
+        assert [r.status for r in results] == [Status.VALID, Status.NO_DOMAIN]
+        assert results[0].mx_hosts == ("mx.cached.test",)
+        engine.resolve_many.assert_called_once_with({})
+
+    def test_answers_stored_in_cache(self):
+        """Test engine answers and negative verdicts land in the cache"""
+        cache = DomainCache()
+        with FakeDNSServer(nxdomain_ratio=0.5) as server:
+            domains = [f"d{i}.test" for i in range(10)]
+            with make_engine(server) as engine:
+                list(validate_many([f"u@{d}" for d in domains], cache=cache, engine=engine))
+                list(validate_many([f"v@{d}" for d in domains], cache=cache, engine=engine))
+        assert server.queries == len(domains)
+
+    def test_cli_engine_flag(self, tmp_path):
+        """Test --engine udp routes the run through UDPEngine"""
+        email_file = tmp_path / "emails.txt"
+        email_file.write_text("a@one.test\nb@two.test\nc@one.test\n")
+        original_argv = sys.argv
+
+        with FakeDNSServer() as server:
+            try:
+                sys.argv = ['check_email.py', '--file', str(email_file), '--engine', 'udp',
+                            '--max-outstanding', '8']
+                with patch('src.check_email.engine_from_settings',
+                           side_effect=lambda settings, **kw: make_engine(server, **kw)) as factory, \
+                     patch('src.check_email.dns.resolver.resolve') as mock_resolve:
+                    summary = check_email_main()
+            finally:
+                sys.argv = original_argv
+
+        assert factory.call_args.kwargs == {'sockets': 4, 'max_outstanding': 8,
+                                            'controller': None}
+        mock_resolve.assert_not_called()
+        assert summary.valid == 3
+        assert server.queries == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
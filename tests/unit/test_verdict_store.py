@@ -0,0 +1,150 @@
+﻿"""
+Unit tests for the persistent domain verdict store
+"""
+import sys
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+import dns.resolver
+from src.verdict_store import VerdictStore
+from src.resolver import ImplicitMX, NullMX
+from src.dns_cache import DomainCache
+from src.check_email import main as check_email_main
+
+
+class FakeClock:
+    """Manually advanced wall clock"""
+
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestVerdictStore:
+    """Test cases for VerdictStore"""
+
+    @pytest.fixture
+    def db_path(self, tmp_path):
+        return str(tmp_path / "verdicts.db")
+
+    def test_put_and_get(self, db_path):
+        """Test positive verdicts round-trip with their MX hosts"""
+        with VerdictStore(db_path) as store:
+            store.put("gmail.com", ("mx1.gmail.com", "mx2.gmail.com"))
+            hosts, error, ttl = store.get("gmail.com")
+            assert hosts == ("mx1.gmail.com", "mx2.gmail.com")
+            assert error is None
+            assert 0 < ttl <= store.ttl
+
+    def test_negative_verdict(self, db_path):
+        """Test NXDOMAIN and NoAnswer are restored as exception classes"""
+        with VerdictStore(db_path) as store:
+            store.put("nope.com", error=dns.resolver.NXDOMAIN)
+            store.put("nomx.com", error=dns.resolver.NoAnswer)
+            assert store.get("nope.com")[:2] == (None, dns.resolver.NXDOMAIN)
+            assert store.get("nomx.com")[:2] == (None, dns.resolver.NoAnswer)
+            assert store.get("unknown.com") is None
+
+    def test_null_and_implicit_mx_verdicts(self, db_path):
+        """Test null MX and implicit MX verdicts survive a round trip"""
+        with VerdictStore(db_path) as store:
+            store.put("nomail.com", error=NullMX)
+            store.put("bare.com", error=ImplicitMX)
+            assert store.get("nomail.com")[:2] == (None, NullMX)
+            assert store.get("bare.com")[:2] == (None, ImplicitMX)
+
+    def test_expired_verdict_ignored_and_purged(self, db_path):
+        """Test expired rows are skipped and removed by purge"""
+        clock = FakeClock()
+        with VerdictStore(db_path, ttl=100, negative_ttl=10, clock=clock) as store:
+            store.put("gmail.com", ("mx.gmail.com",))
+            store.put("nope.com", error=dns.resolver.NXDOMAIN)
+            clock.now += 50
+            assert store.get("nope.com") is None
+            assert store.get("gmail.com") is not None
+
+            assert store.purge() == 1
+            store.compact()
+            assert store.count() == 1
+
+    def test_persists_across_instances(self, db_path):
+        """Test a second process-like instance sees earlier verdicts"""
+        with VerdictStore(db_path) as store:
+            store.put("gmail.com", ("mx.gmail.com",))
+        with VerdictStore(db_path) as store:
+            assert store.get("gmail.com")[0] == ("mx.gmail.com",)
+
+    def test_concurrent_writers(self, db_path):
+        """Test several connections can write to the same file"""
+        def writer(n):
+            with VerdictStore(db_path) as store:
+                for i in range(50):
+                    store.put(f"d{n}-{i}.com", ("mx.example.com",))
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with VerdictStore(db_path) as store:
+            assert store.count() == 200
+
+
+class TestDomainCacheWithStore:
+    """Test cases for DomainCache backed by VerdictStore"""
+
+    def test_store_consulted_on_miss(self, tmp_path):
+        """Test a cold memory cache is filled from the store"""
+        db_path = str(tmp_path / "verdicts.db")
+        with VerdictStore(db_path) as store:
+            DomainCache(verdict_store=store).store("Gmail.com", hosts=("mx.gmail.com",))
+
+            cache = DomainCache(verdict_store=store)
+            assert cache.lookup("gmail.com") == (("mx.gmail.com",), None)
+            assert cache.lookup("gmail.com") == (("mx.gmail.com",), None)
+            assert cache.stats() == {'size': 1, 'hits': 2, 'misses': 0, 'store_hits': 1}
+
+
+class TestCacheDbCli:
+    """Test cases for the --cache-db CLI options"""
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_second_run_skips_dns(self, mock_dns_resolve, tmp_path, capsys):
+        """Test repeat runs reuse verdicts from the database"""
+        mock_dns_resolve.return_value = MagicMock()
+        db_path = str(tmp_path / "verdicts.db")
+        email_file = tmp_path / "emails.txt"
+        email_file.write_text("a@gmail.com\nb@mail.ru\n")
+        original_argv = sys.argv
+
+        try:
+            sys.argv = ['check_email.py', '--file', str(email_file), '--cache-db', db_path]
+            check_email_main()
+            check_email_main()
+        finally:
+            sys.argv = original_argv
+
+        assert mock_dns_resolve.call_count == 2
+        assert f"Из базы {db_path}: 2" in capsys.readouterr().out
+
+    def test_purge_command(self, tmp_path, capsys):
+        """Test --cache-purge removes expired verdicts and exits"""
+        db_path = str(tmp_path / "verdicts.db")
+        with VerdictStore(db_path, ttl=-1) as store:
+            store.put("old.com", ("mx.old.com",))
+        original_argv = sys.argv
+
+        try:
+            sys.argv = ['check_email.py', '--cache-db', db_path, '--cache-purge']
+            assert check_email_main() is None
+        finally:
+            sys.argv = original_argv
+
+        assert "Удалено устаревших вердиктов: 1, осталось: 0" in capsys.readouterr().out
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,146 @@
+﻿"""
+Unit tests for machine-readable output formats
+"""
+import csv
+import io
+import json
+import sys
+import pytest
+from unittest.mock import patch, MagicMock
+import dns.resolver
+from src.check_email import (
+    EmailResult, Status, RunSummary, validate_many, result_record, result_from_record,
+    main as check_email_main,
+)
+from src.writers import FIELDS, PROVIDER_FIELDS, make_writer, stats_path
+
+
+def fake_resolve(domain, record_type):
+    """MX for every domain except nx*.com"""
+    if domain.startswith("nx"):
+        raise dns.resolver.NXDOMAIN
+    mx = MagicMock(preference=10)
+    mx.exchange.to_text.return_value = f"mx.{domain}"
+    return [mx]
+
+
+def run_cli(*args):
+    with patch.object(sys, 'argv', ['check_email', *args]):
+        return check_email_main()
+
+
+class TestRecords:
+    """Test cases for result records and writers"""
+
+    def test_record_round_trip(self):
+        """Test a result survives conversion to a record and back"""
+        result = EmailResult("a@b.com", "b.com", Status.VALID, ("mx.b.com",), None, 1.5,
+                             "google")
+        record = result_record(result)
+        assert record == {'email': "a@b.com", 'domain': "b.com", 'status': "valid",
+                          'mx_hosts': ["mx.b.com"], 'error': None, 'elapsed_ms': 1.5,
+                          'provider': "google"}
+        assert result_from_record(json.loads(json.dumps(record))) == result
+        # Записи, сохранённые до появления провайдера, тоже читаются
+        del record['provider']
+        assert result_from_record(record) == result._replace(provider=None)
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_timed_results(self, mock_resolve):
+        """Test elapsed_ms is filled only on request"""
+        mock_resolve.side_effect = fake_resolve
+        emails = ["a@ok.com", "bad", "b@ok.com"]
+        assert all(r.elapsed_ms is None for r in validate_many(emails, 1))
+        timed = list(validate_many(emails, 2, timed=True))
+        assert timed[1].elapsed_ms == 0.0
+        assert timed[0].elapsed_ms == timed[2].elapsed_ms >= 0
+
+    def test_csv_writer(self):
+        """Test the CSV header and row layout"""
+        stream = io.StringIO()
+        writer = make_writer('csv', stream)
+        writer.write(EmailResult("a@b.com", "b.com", Status.VALID, ("mx1.b.com", "mx2.b.com")))
+        writer.write_summary(RunSummary())
+        rows = list(csv.reader(io.StringIO(stream.getvalue())))
+        assert rows[0] == list(FIELDS)
+        assert rows[1][:4] == ["a@b.com", "b.com", "valid", "mx1.b.com mx2.b.com"]
+        assert len(rows) == 2
+
+    def test_csv_provider_column(self):
+        """Test the provider column is written only when requested"""
+        result = EmailResult("a@b.com", "b.com", Status.VALID, ("aspmx.l.google.com",),
+                             provider="google")
+        stream = io.StringIO()
+        make_writer('csv', stream, fields=PROVIDER_FIELDS).write(result)
+        rows = list(csv.reader(io.StringIO(stream.getvalue())))
+        assert rows[0] == list(PROVIDER_FIELDS)
+        assert rows[1][-1] == "google"
+        # Без --mx-hosts набор колонок прежний
+        stream = io.StringIO()
+        make_writer('csv', stream).write(result)
+        assert len(list(csv.reader(io.StringIO(stream.getvalue())))[1]) == len(FIELDS)
+        stream = io.StringIO()
+        make_writer('jsonl', stream).write(result)
+        assert 'provider' not in json.loads(stream.getvalue())
+
+    def test_csv_writer_without_header(self):
+        """Test appended CSV files do not repeat the header"""
+        stream = io.StringIO()
+        make_writer('csv', stream, header=False)
+        assert stream.getvalue() == ""
+
+
+class TestOutputFormats:
+    """Test cases for --format in the CLI"""
+
+    @pytest.fixture
+    def emails_file(self, tmp_path):
+        path = tmp_path / "emails.txt"
+        path.write_text("a@ok.com\nbad-address\nb@nx1.com\nc@ok.com\n", encoding="utf-8")
+        return str(path)
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_jsonl_output(self, mock_resolve, emails_file, tmp_path):
+        """Test one JSON record per address and a separate stats file"""
+        mock_resolve.side_effect = fake_resolve
+        output = tmp_path / "out.jsonl"
+        run_cli('-f', emails_file, '-o', str(output), '--format', 'jsonl',
+                '-c', str(tmp_path / "none.ini"))
+
+        records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+        assert [r['status'] for r in records] == ["valid", "invalid_syntax", "no_domain", "valid"]
+        assert records[0]['mx_hosts'] == ["mx.ok.com"]
+        assert all(isinstance(r['elapsed_ms'], float) for r in records)
+
+        stats = json.loads((tmp_path / "out.jsonl.stats.json").read_text(encoding="utf-8"))
+        assert stats['total'] == 4
+        assert stats['valid'] == 2
+        assert stats['unique_domains'] == 2
+        assert stats['statuses'] == {"valid": 2, "invalid_syntax": 1, "no_domain": 1}
+        assert stats['cache']['misses'] == 2
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_csv_output(self, mock_resolve, emails_file, tmp_path):
+        """Test CSV rows load back without string parsing"""
+        mock_resolve.side_effect = fake_resolve
+        output = tmp_path / "out.csv"
+        run_cli('-f', emails_file, '-o', str(output), '--format', 'csv',
+                '-c', str(tmp_path / "none.ini"))
+
+        with open(output, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        assert [row['email'] for row in rows] == ["a@ok.com", "bad-address", "b@nx1.com",
+                                                  "c@ok.com"]
+        assert rows[2]['status'] == "no_domain"
+        assert (tmp_path / "out.csv.stats.json").exists()
+
+    @patch('src.check_email.dns.resolver.resolve')
+    def test_text_output_unchanged(self, mock_resolve, emails_file, tmp_path):
+        """Test the default text format keeps the summary in the file"""
+        mock_resolve.side_effect = fake_resolve
+        output = tmp_path / "out.txt"
+        run_cli('-f', emails_file, '-o', str(output), '-c', str(tmp_path / "none.ini"))
+        content = output.read_text(encoding="utf-8")
+        assert content.startswith("a@ok.com: ✅")
+        assert content.endswith("Невалидных: 2")
+        assert not (tmp_path / stats_path("out.txt")).exists()